@@ -0,0 +1,124 @@
+# bench_hash_algorithms.py
+"""
+Benchmark of the content hashes mama can use, behind keeping SHA-256 as the default.
+
+Usage: python scripts/bench_hash_algorithms.py [--size <MiB>] [--files <n>] [--rounds <n>]
+                                               [--dir <directory>] [--keep]
+
+Every algorithm in HASH_ALGORITHMS is timed on the same data, the way mama hashes it:
+  large  one <size> MiB file (default 512) through pipeline.digest_file
+  small  <files> files of 4 KiB (default 5000) through file_digest, as dekho does
+  memory a 64 MiB buffer, with no file I/O at all
+Each case runs <rounds> times (default 3) and the best run is kept, after one untimed
+pass to warm the page cache. Each line gives MB/s per algorithm and the ratio to
+sha256. The first line says whether the CPU reports SHA instructions, which decide
+most of the difference; on such CPUs SHA-256 is the faster of the two.
+"""
+
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from pipeline import digest_file  # noqa: E402
+from repository import HASH_ALGORITHMS, file_digest  # noqa: E402
+
+
+def sha_instructions():
+    """Whether the CPU advertises SHA extensions, or None if that cannot be told here."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return None
+    return " sha_ni " in flags or " sha2 " in flags
+
+
+def best_of(rounds, function, *args):
+    times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def hash_large(path, algorithm):
+    digest_file(path, HASH_ALGORITHMS[algorithm]())
+
+
+def hash_small(paths, algorithm):
+    for path in paths:
+        file_digest(path, algorithm)
+
+
+def hash_memory(data, algorithm):
+    digest = HASH_ALGORITHMS[algorithm]()
+    digest.update(data)
+    digest.hexdigest()
+
+
+def main():
+    args = sys.argv[1:]
+    size, files, rounds, directory, keep = 512, 5000, 3, None, False
+    while args:
+        option = args.pop(0)
+        if option == "--size" and args:
+            size = int(args.pop(0))
+        elif option == "--files" and args:
+            files = int(args.pop(0))
+        elif option == "--rounds" and args:
+            rounds = int(args.pop(0))
+        elif option == "--dir" and args:
+            directory = args.pop(0)
+        elif option == "--keep":
+            keep = True
+        else:
+            print(__doc__)
+            sys.exit(2)
+
+    work_dir = tempfile.mkdtemp(prefix="mama-bench-", dir=directory)
+    try:
+        large = os.path.join(work_dir, "large")
+        with open(large, 'wb') as f:
+            for _ in range(size):
+                f.write(os.urandom(1024 * 1024))
+        small = []
+        for i in range(files):
+            path = os.path.join(work_dir, "small", f"d{i % 64}", f"f{i}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(os.urandom(4096))
+            small.append(path)
+        memory = os.urandom(64 * 1024 * 1024)
+
+        cases = [
+            (f"large {size} MiB", hash_large, large, size * 1024 * 1024),
+            (f"small {files} x 4 KiB", hash_small, small, files * 4096),
+            ("memory 64 MiB", hash_memory, memory, len(memory)),
+        ]
+        sha = sha_instructions()
+        print(f"{platform.machine()}, SHA instructions: {'unknown' if sha is None else 'yes' if sha else 'no'}")
+        for label, function, data, total in cases:
+            speeds = {}
+            for algorithm in HASH_ALGORITHMS:
+                function(data, algorithm)  # Warm the page cache and the code paths
+                speeds[algorithm] = total / best_of(rounds, function, data, algorithm) / 1e6
+            line = "  ".join(
+                f"{algorithm} {speed:7.0f} MB/s ({speed / speeds['sha256']:.2f}x)" for algorithm, speed in speeds.items()
+            )
+            print(f"  {label:<22} {line}")
+    finally:
+        if keep:
+            print(f"Files: {work_dir}")
+        else:
+            shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
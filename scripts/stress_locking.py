@@ -0,0 +1,164 @@
+# stress_locking.py
+"""
+Stress test for the repository lock: many mama processes writing to one repository at once.
+
+Usage: python scripts/stress_locking.py [--workers <n>] [--rounds <n>] [--keep]
+
+Runs three checks against a fresh repository in a temporary directory:
+  1. <workers> processes each stage and commit their own files <rounds> times, all at
+     once. Every file must end up in HEAD with its last contents, the log must form one
+     parent chain, fsck must pass and no lock file may be left behind.
+  2. A process holds the lock far longer than LOCK_STALE_AFTER while another waits for
+     it; the waiter must not get the lock before the holder releases it.
+  3. A process dies while holding the lock; the next writer must take it over.
+Exits with status 1 on the first failed check. --keep leaves the repository behind
+for inspection.
+"""
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from repository import Repository, file_digest  # noqa: E402
+
+
+MAMA = [sys.executable, os.path.join(SRC_DIR, "mama.py")]
+
+
+def mama(repo_dir, *args):
+    """Run one mama command in the repository and fail on a crash."""
+    result = subprocess.run(MAMA + list(args), cwd=repo_dir, capture_output=True, text=True)
+    if result.returncode != 0 or "Traceback" in result.stderr:
+        raise AssertionError(f"mama {' '.join(args)} crashed:\n{result.stdout}{result.stderr}")
+    return result.stdout
+
+
+def writer(repo_dir, worker, rounds):
+    """Stage and commit this worker's own files, one round at a time."""
+    for round_number in range(rounds):
+        path = os.path.join(f"w{worker}", f"f{round_number % 3}.txt")
+        os.makedirs(os.path.join(repo_dir, f"w{worker}"), exist_ok=True)
+        with open(os.path.join(repo_dir, path), 'w') as f:
+            f.write(f"worker {worker} round {round_number}\n")
+        mama(repo_dir, "dekho", path)
+        mama(repo_dir, "rakho", f"worker {worker} round {round_number}")
+
+
+def check_concurrent_commits(repo_dir, workers, rounds):
+    mama(repo_dir, "shuru")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(writer, repo_dir, worker, rounds) for worker in range(workers)]:
+            future.result()
+    elapsed = time.monotonic() - started
+
+    os.chdir(repo_dir)
+    repo = Repository()
+    log_data = repo.load_commit_log()
+    for previous, entry in zip(log_data, log_data[1:]):
+        assert entry.get("parent") == previous["commit_id"], f"{entry['commit_id']} er parent bhul"
+    assert repo.get_head() == log_data[-1]["commit_id"], "HEAD log er sesh commit na"
+
+    tree = repo.get_commit_tree(repo.get_head())
+    for worker in range(workers):
+        for name in sorted(os.listdir(f"w{worker}")):
+            path = os.path.join(f"w{worker}", name)
+            assert tree.get(path) == file_digest(path, repo.hash_algorithm), f"{path} HEAD e nai ba purono"
+    result = repo.fsck(jobs=1)
+    assert not result["missing"] and not result["corrupt"], f"fsck: {result}"
+    assert not os.path.exists(repo.LOCK_FILE), "lock file theke gese"
+    assert not repo.interrupted_commits(), "adhura commit marker theke gese"
+    print(f"ok: {workers} writers x {rounds} rounds, {len(log_data)} commits, {elapsed:.1f}s")
+
+
+def hold_lock(repo_dir, acquired, released_at, seconds):
+    os.chdir(repo_dir)
+    with Repository().lock():
+        acquired.set()
+        time.sleep(seconds)
+        released_at.value = time.time()
+
+
+def check_long_holder(repo_dir):
+    acquired = multiprocessing.Event()
+    released_at = multiprocessing.Value('d', 0.0)
+    holder = multiprocessing.Process(target=hold_lock, args=(repo_dir, acquired, released_at, 2.0))
+    holder.start()
+    assert acquired.wait(10), "holder lock pay nai"
+
+    os.chdir(repo_dir)
+    repo = Repository()
+    repo.LOCK_STALE_AFTER = 0  # Age alone must not be enough to break a live holder's lock
+    with repo.lock():
+        got_it = time.time()
+    holder.join()
+    assert holder.exitcode == 0, "holder lock charte giye crash korse"
+    assert released_at.value and got_it >= released_at.value, "live holder er lock bhenge felse"
+    assert not os.path.exists(repo.LOCK_FILE), "lock file theke gese"
+    print("ok: a live holder keeps the lock past LOCK_STALE_AFTER")
+
+
+def die_holding_lock(repo_dir):
+    os.chdir(repo_dir)
+    held = Repository().lock()
+    held.__enter__()
+    os._exit(0)  # Without releasing, as if the process were killed
+
+
+def check_crashed_holder(repo_dir):
+    holder = multiprocessing.Process(target=die_holding_lock, args=(repo_dir,))
+    holder.start()
+    holder.join()
+
+    os.chdir(repo_dir)
+    repo = Repository()
+    assert os.path.exists(repo.LOCK_FILE), "mora process er lock file nai"
+    repo.LOCK_TIMEOUT = 5
+    started = time.monotonic()
+    with repo.lock():
+        pass
+    assert not os.path.exists(repo.LOCK_FILE), "lock file theke gese"
+    print(f"ok: a dead holder's lock is taken over in {time.monotonic() - started:.3f}s")
+
+
+def main():
+    args = sys.argv[1:]
+    workers, rounds, keep = 8, 5, False
+    while args:
+        option = args.pop(0)
+        if option == "--workers" and args:
+            workers = int(args.pop(0))
+        elif option == "--rounds" and args:
+            rounds = int(args.pop(0))
+        elif option == "--keep":
+            keep = True
+        else:
+            print(__doc__)
+            sys.exit(2)
+
+    repo_dir = tempfile.mkdtemp(prefix="mama-stress-")
+    try:
+        check_concurrent_commits(repo_dir, workers, rounds)
+        check_long_holder(repo_dir)
+        check_crashed_holder(repo_dir)
+    except AssertionError as exc:
+        print(f"FAIL: {exc}")
+        sys.exit(1)
+    finally:
+        os.chdir(tempfile.gettempdir())
+        if keep:
+            print(f"Repository: {repo_dir}")
+        else:
+            shutil.rmtree(repo_dir)
+
+
+if __name__ == "__main__":
+    main()
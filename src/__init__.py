@@ -1,7 +1,9 @@
 # mama/__init__.py
 
 # Import relevant modules or functions for easy access
-from .commands import InitCommand, AddCommand, CommitCommand, StatusCommand, LogCommand, DiffCommand, RollbackCommand, CommitDetailsCommand, PullRepoCommand
+from .commands import InitCommand, AddCommand, CommitCommand, StatusCommand, LogCommand, DiffCommand, RollbackCommand, CommitDetailsCommand, PullRepoCommand, ImportCommand, ExportCommand, BlameCommand
+from .commands import SearchCommand, RestoreCommand, SparseCommand, WorktreeCommand, FsckCommand, RehashCommand, ArchiveCommand, ConfigCommand
+from .commands import PushCommand, PullCommand, ServeCommand
 from .repository import Repository
 from .command_factory import CommandFactory
 
@@ -17,5 +19,19 @@ __all__ = [
     "DiffCommand",
     "RollbackCommand",
     "CommitDetailsCommand",
-    "PullRepoCommand"
+    "PullRepoCommand",
+    "ImportCommand",
+    "ExportCommand",
+    "BlameCommand",
+    "SearchCommand",
+    "RestoreCommand",
+    "SparseCommand",
+    "WorktreeCommand",
+    "FsckCommand",
+    "RehashCommand",
+    "ArchiveCommand",
+    "ConfigCommand",
+    "PushCommand",
+    "PullCommand",
+    "ServeCommand"
 ]
@@ -1,7 +1,9 @@
 # command_factory.py
 
 from commands import InitCommand, AddCommand, CommitCommand, StatusCommand, LogCommand, DiffCommand
-from commands import RollbackCommand, CommitDetailsCommand, PullRepoCommand
+from commands import RollbackCommand, CommitDetailsCommand, PullRepoCommand, ImportCommand, ExportCommand, BlameCommand
+from commands import SearchCommand, RestoreCommand, SparseCommand, WorktreeCommand, FsckCommand, RehashCommand, ArchiveCommand, ConfigCommand
+from commands import PushCommand, PullCommand, ServeCommand
 
 class CommandFactory:
     """Factory to create command objects based on user input."""
@@ -18,13 +20,27 @@ class CommandFactory:
         Raises:
             ValueError: If the command_name is not recognized.
         Commands:
-            - "shuru": InitCommand (no arguments)
+            - "shuru": InitCommand (optional arguments)
             - "dekho": AddCommand (requires arguments)
             - "rakho": CommitCommand (requires arguments)
             - "ki_obostha": StatusCommand (no arguments)
-            - "itihas": LogCommand (no arguments)
+            - "itihas": LogCommand (optional arguments)
             - "alada_ki": DiffCommand (requires arguments)
             - "fire_jao": RollbackCommand (requires arguments)
+            - "import": ImportCommand (requires arguments)
+            - "export": ExportCommand (requires arguments)
+            - "blame": BlameCommand (requires arguments)
+            - "khojo": SearchCommand (requires arguments)
+            - "restore": RestoreCommand (requires arguments)
+            - "sparse": SparseCommand (requires arguments)
+            - "worktree": WorktreeCommand (requires arguments)
+            - "fsck": FsckCommand (optional arguments)
+            - "rehash": RehashCommand (requires arguments)
+            - "archive": ArchiveCommand (requires arguments)
+            - "config": ConfigCommand (optional arguments)
+            - "push": PushCommand (requires arguments)
+            - "pull": PullCommand (requires arguments)
+            - "serve": ServeCommand (optional arguments)
         """
         
         
@@ -38,6 +54,20 @@ class CommandFactory:
             "alada_ki": DiffCommand,
             "fire_jao": RollbackCommand,
             "niye_aso": PullRepoCommand,
+            "import": ImportCommand,
+            "export": ExportCommand,
+            "blame": BlameCommand,
+            "khojo": SearchCommand,
+            "restore": RestoreCommand,
+            "sparse": SparseCommand,
+            "worktree": WorktreeCommand,
+            "fsck": FsckCommand,
+            "rehash": RehashCommand,
+            "archive": ArchiveCommand,
+            "config": ConfigCommand,
+            "push": PushCommand,
+            "pull": PullCommand,
+            "serve": ServeCommand,
         }
 
         if command_name not in commands:
@@ -45,7 +75,7 @@ class CommandFactory:
 
         # Handle commands with and without arguments
         command_class = commands[command_name]
-        if command_name == "shuru" or command_name == "ki_obostha" or command_name == "itihas":
+        if command_name == "ki_obostha":
             return command_class()  # No arguments needed
         else:
             return command_class(args)  # Pass args for commands that need them
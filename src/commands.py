@@ -4,8 +4,11 @@ import difflib
 import os
 import subprocess
 import shutil
+import sys
+import tempfile
 
 from repository import Repository
+from sync import PROTOCOL_VERSION, connect, serve_socket, stdio_connection
 
 
 
@@ -16,11 +19,21 @@ class InitCommand:
     """
     Class to handle the initialization of a repository.
 
+    Usage: mama shuru [--hash sha256|blake2b]
+
     Methods:
         execute: Initializes the repository by calling the Repository.init() method.
     """
+    def __init__(self, args=None):
+        args = list(args or [])
+        self.hash_algorithm = None
+        if args:
+            if len(args) != 2 or args[0] != "--hash":
+                raise ValueError("Usage: mama shuru [--hash sha256|blake2b]")
+            self.hash_algorithm = args[1]
+
     def execute(self):
-        Repository.init()
+        Repository.init(self.hash_algorithm)
 
 
 
@@ -148,18 +161,48 @@ class StatusCommand:
 
 
 class LogCommand:
-    """Display the commit history."""
-    
-    
+    """
+    Display the commit history.
+
+    Usage: mama itihas [--path <path>] [--stat] [--reindex] [--backfill-stats]
+    """
+
+    def __init__(self, args=None):
+        args = list(args or [])
+        self.path = None
+        self.reindex = False
+        self.stat = False
+        self.backfill = False
+        while args:
+            arg = args.pop(0)
+            if arg == "--path" and args:
+                self.path = args.pop(0)
+            elif arg == "--reindex":
+                self.reindex = True
+            elif arg == "--stat":
+                self.stat = True
+            elif arg == "--backfill-stats":
+                self.backfill = True
+            else:
+                raise ValueError("Usage: mama itihas [--path <path>] [--stat] [--reindex] [--backfill-stats]")
+
     def execute(self):
         """
         Executes the command to show the repository log.
 
         This method creates an instance of the Repository class and calls its
-        show_log method to display the log of the repository.
+        show_log method to display the log of the repository, or show_path_history
+        when only the commits touching one path are wanted.
         """
         repo = Repository()
-        repo.show_log()
+        if self.reindex:
+            repo.rebuild_path_index()
+        if self.backfill:
+            repo.backfill_stats()
+        if self.path:
+            repo.show_path_history(self.path)
+        else:
+            repo.show_log(self.stat)
         
 
 
@@ -168,18 +211,69 @@ class LogCommand:
 
 
 class DiffCommand:
-    """Compare two commits and display the differences."""
+    """
+    Compare two commits, or the working directory with a commit, and display the differences.
+
+    Usage: mama alada_ki <commit_id_1> <commit_id_2> [--name-only | --name-status | --stat]
+                         [--rename-threshold <percent>] [--rename-limit <pairs>]
+           mama alada_ki [<commit_id>] [<path>...] [--name-only | --name-status]
+           mama alada_ki --cache-stats
+    Without two commits the working directory is compared with <commit_id>, or with
+    HEAD, optionally only under the given paths.
+    """
+
+    USAGE = (
+        "Usage: mama alada_ki <commit_id_1> <commit_id_2> [--name-only | --name-status | --stat] "
+        "[--rename-threshold <percent>] [--rename-limit <pairs>] | "
+        "alada_ki [<commit_id>] [<path>...] [--name-only | --name-status] | --cache-stats"
+    )
 
     def __init__(self, args):
-        if len(args) != 2:
-            raise ValueError("Usage: mama alada_ki <commit_id_1> <commit_id_2>")
-        self.commit_id_1 = args[0]
-        self.commit_id_2 = args[1]
+        args = list(args)
+        targets = []
+        self.rename_threshold = None
+        self.rename_limit = None
+        self.cache_stats = False
+        self.mode = "patch"
+        while args:
+            arg = args.pop(0)
+            if arg == "--rename-threshold" and args:
+                self.rename_threshold = float(args.pop(0)) / 100
+            elif arg == "--rename-limit" and args:
+                self.rename_limit = int(args.pop(0))
+            elif arg == "--cache-stats":
+                self.cache_stats = True
+            elif arg in ("--name-only", "--name-status", "--stat"):
+                self.mode = arg[2:]
+            else:
+                targets.append(arg)
+        if self.cache_stats and targets:
+            raise ValueError(self.USAGE)
+
+        # Two arguments that are not paths are two commits; anything else compares the working directory
+        self.working_tree = not self.cache_stats and not (len(targets) == 2 and not any(map(os.path.exists, targets)))
+        if self.working_tree:
+            self.commit_id_1 = targets.pop(0) if targets and not os.path.exists(targets[0]) else None
+            self.paths = targets
+            if self.mode == "stat":
+                raise ValueError("--stat shudhu duita commit er moddhe cholbe mama.")
+        else:
+            self.commit_id_1, self.commit_id_2 = targets or (None, None)
 
     def execute(self):
-        """Execute the comparison between two commits."""
+        """Execute the comparison, or show the diff cache counters."""
         repo = Repository()
-        repo.compare_commits(self.commit_id_1, self.commit_id_2)
+        if self.cache_stats:
+            stats = repo.diff_cache_stats()
+            print(
+                f"Diff cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+                f"{stats['entries']} entries, {stats['bytes']} bytes"
+            )
+            return
+        if self.working_tree:
+            repo.compare_with_commit(self.commit_id_1, self.paths, self.mode)
+            return
+        repo.compare_commits(self.commit_id_1, self.commit_id_2, self.rename_threshold, self.rename_limit, self.mode)
 
 
 
@@ -193,8 +287,15 @@ class DiffCommand:
 
 
 class RollbackCommand:
-    """Rollback to a specific commit."""
+    """
+    Rollback to a specific commit.
+
+    Usage: mama fire_jao <commit_id> [-v | --verbose]
+    --verbose lists every deleted and restored file instead of a summary.
+    """
     def __init__(self, args):
+        self.verbose = any(arg in ("-v", "--verbose") for arg in args)
+        args = [arg for arg in args if arg not in ("-v", "--verbose")]
         if not args:
             raise ValueError("Commit ID is required for rollback.")
         self.commit_id = args[0]
@@ -202,7 +303,7 @@ class RollbackCommand:
     def execute(self):
         """Execute the rollback to the specified commit."""
         repo = Repository()
-        repo.rollback(self.commit_id)
+        repo.rollback(self.commit_id, self.verbose)
 
 
 
@@ -229,39 +330,621 @@ class CommitDetailsCommand:
 
 
 class PullRepoCommand:
-    """Command to pull the latest files from a GitHub repository."""
+    """
+    Command to pull a Git repository into a new mama repository.
+
+    A local working copy, a bare repository, a fast-export file or "-" (stdin) is
+    imported with its full first-parent history through `git fast-export`. A remote
+    URL is first cloned bare into a temporary folder.
+
+    Usage: mama niye_aso <source> [<folder>]
+    """
 
     def __init__(self, args):
         if not args:
             raise ValueError("Repository link is required.")
         self.repo_url = args[0]
+        self.folder_name = args[1] if len(args) > 1 else None
 
     def execute(self):
-        """Execute the command to pull the latest files."""
+        """Execute the command to import the repository history."""
+        temp_clone = None
         try:
             # Ask the user for a folder name
-            folder_name = input("Enter the name of the new folder to store the files: ").strip()
+            folder_name = self.folder_name or input("Enter the name of the new folder to store the files: ").strip()
             if not folder_name:
                 raise ValueError("Folder name cannot be empty.")
 
-            # Step 1: Clone the repository with depth 1 into a temporary folder
-            subprocess.run(
-                ["git", "clone", "--depth", "1", self.repo_url, "mama_repo"],
-                check=True
-            )
+            source = self.repo_url
+            if source != "-" and not os.path.exists(source):
+                # Step 1: Remote repositories are cloned bare, without a checkout
+                temp_clone = tempfile.mkdtemp(prefix="mama_repo_")
+                subprocess.run(["git", "clone", "--bare", "--quiet", source, temp_clone], check=True)
+                source = temp_clone
+            source = source if source == "-" else os.path.abspath(source)
 
-            # Step 2: Create the user-specified folder
+            # Step 2: Create the user-specified folder as a new mama repository
             os.makedirs(folder_name, exist_ok=True)
-
-            # Step 3: Move the files from mama_repo to the new folder
-            for item in os.listdir("mama_repo"):
-                shutil.move(os.path.join("mama_repo", item), folder_name)
-
-            # Step 4: Clean up the temporary repository folder
-            shutil.rmtree("mama_repo")
+            cwd = os.getcwd()
+            os.chdir(folder_name)
+            try:
+                Repository.init()
+                repo = Repository()
+
+                # Step 3: Stream the history straight into the object store
+                if source == "-":
+                    tree = repo.import_fast_export(sys.stdin.buffer)
+                elif os.path.isfile(source):
+                    with open(source, 'rb') as stream:
+                        tree = repo.import_fast_export(stream)
+                else:
+                    export = subprocess.Popen(
+                        ["git", "-C", source, "fast-export", "--first-parent", "--signed-tags=strip",
+                         "--tag-of-filtered-object=drop", "--reencode=yes", "HEAD"],
+                        stdout=subprocess.PIPE,
+                    )
+                    try:
+                        tree = repo.import_fast_export(export.stdout)
+                    finally:
+                        export.stdout.close()
+                        if export.wait() != 0:
+                            raise subprocess.CalledProcessError(export.returncode, "git fast-export")
+
+                # Step 4: Write the latest files out of the object store
+                repo.materialize_tree(tree)
+            finally:
+                os.chdir(cwd)
             print(f"Files successfully pulled into '{folder_name}', mama.")
 
         except subprocess.CalledProcessError:
             print("Git cloning failed. Check the repository link.")
         except Exception as e:
-            print(f"Error: {e}")
\ No newline at end of file
+            print(f"Error: {e}")
+        finally:
+            # Step 5: Clean up the temporary bare clone
+            if temp_clone:
+                shutil.rmtree(temp_clone, ignore_errors=True)
+
+
+
+
+
+
+
+
+
+class ImportCommand:
+    """
+    Import an ordered list of snapshot directories or tarballs as consecutive commits.
+
+    Usage: mama import [-m <message>] <source>... | @<file listing sources>
+    """
+
+    def __init__(self, args):
+        self.message = None
+        self.sources = []
+        args = list(args)
+        while args:
+            arg = args.pop(0)
+            if arg == "-m" and args:
+                self.message = args.pop(0)
+            elif arg.startswith("@"):
+                with open(arg[1:], 'r') as f:
+                    self.sources.extend(line.strip() for line in f if line.strip())
+            else:
+                self.sources.append(arg)
+        if not self.sources:
+            raise ValueError("Usage: mama import [-m <message>] <source>... | @<file listing sources>")
+
+    def execute(self):
+        """Execute the import of all snapshots in one batch."""
+        repo = Repository()
+        commit_ids = repo.import_snapshots(self.sources, self.message)
+        print(f"{len(commit_ids)} ta snapshot import korsi, mama.")
+
+
+
+
+
+
+
+
+
+class ExportCommand:
+    """
+    Stream the full tree of a commit as a tar, tar.gz, tar.xz or zip archive.
+
+    Usage: mama export <commit_id> [--format tar|tar.gz|tar.xz|zip] [--prefix <dir/>] [-o <file>]
+    Without -o the archive is written to stdout.
+    """
+
+    USAGE = "Usage: mama export <commit_id> [--format tar|tar.gz|tar.xz|zip] [--prefix <dir/>] [-o <file>]"
+
+    def __init__(self, args):
+        args = list(args)
+        self.commit_id = None
+        self.archive_format = None
+        self.prefix = ""
+        self.output = None
+        while args:
+            arg = args.pop(0)
+            if arg in ("--format", "--prefix", "-o") and not args:
+                raise ValueError(self.USAGE)
+            if arg == "--format":
+                self.archive_format = args.pop(0)
+            elif arg == "--prefix":
+                self.prefix = args.pop(0)
+            elif arg == "-o":
+                self.output = args.pop(0)
+            else:
+                self.commit_id = arg
+        if not self.commit_id:
+            raise ValueError(self.USAGE)
+        if self.archive_format is None:
+            self.archive_format = self.format_from_name(self.output)
+
+    @staticmethod
+    def format_from_name(filename):
+        """Guess the archive format from the output file name, defaulting to plain tar."""
+        if filename:
+            for suffix, archive_format in ((".zip", "zip"), (".tar.gz", "tar.gz"), (".tgz", "tar.gz"),
+                                           (".tar.xz", "tar.xz"), (".txz", "tar.xz")):
+                if filename.endswith(suffix):
+                    return archive_format
+        return "tar"
+
+    def execute(self):
+        """Execute the export to the output file or stdout."""
+        repo = Repository()
+        if self.output:
+            with open(self.output, 'wb') as out:
+                count = repo.export_commit(self.commit_id, out, self.archive_format, self.prefix)
+            if count is not None:
+                print(f"{count} ta file {self.output} e export korsi, mama.")
+        else:
+            repo.export_commit(self.commit_id, sys.stdout.buffer, self.archive_format, self.prefix)
+            sys.stdout.buffer.flush()
+
+
+
+
+
+
+
+
+
+class BlameCommand:
+    """
+    Show which commit last changed each line of a file.
+
+    Usage: mama blame <filename> [<commit_id>]
+    """
+
+    def __init__(self, args):
+        if not args:
+            raise ValueError("Usage: mama blame <filename> [<commit_id>]")
+        self.filename = os.path.normpath(args[0])
+        self.commit_id = args[1] if len(args) > 1 else None
+
+    def execute(self):
+        """Execute the blame for the file."""
+        repo = Repository()
+        repo.show_blame(self.filename, self.commit_id)
+
+
+
+
+
+
+
+
+
+class SearchCommand:
+    """
+    Search every version of every file in history for a regular expression.
+
+    Usage: mama khojo <pattern> [-i] [--index] [--jobs <n>]
+    --index builds the trigram index on first use; once it exists it is kept up to date automatically.
+    """
+
+    USAGE = "Usage: mama khojo <pattern> [-i] [--index] [--jobs <n>]"
+
+    def __init__(self, args):
+        args = list(args)
+        self.pattern = None
+        self.ignore_case = False
+        self.build_index = False
+        self.jobs = None
+        while args:
+            arg = args.pop(0)
+            if arg == "-i":
+                self.ignore_case = True
+            elif arg == "--index":
+                self.build_index = True
+            elif arg == "--jobs" and args:
+                self.jobs = int(args.pop(0))
+            elif self.pattern is None:
+                self.pattern = arg
+            else:
+                raise ValueError(self.USAGE)
+        if self.pattern is None and not self.build_index:
+            raise ValueError(self.USAGE)
+
+    def execute(self):
+        """Execute the search, building the trigram index first if asked to."""
+        repo = Repository()
+        if self.build_index:
+            added = repo.update_trigram_index()
+            print(f"Trigram index e {added} ta notun blob dhukaisi, mama.")
+        if self.pattern is not None:
+            repo.show_search(self.pattern, self.ignore_case, self.jobs)
+
+
+
+
+
+
+
+
+
+class RestoreCommand:
+    """
+    Restore only some paths to their state in a commit, leaving history and everything else alone.
+
+    Usage: mama restore <commit_id> <path_or_glob>...
+    """
+
+    def __init__(self, args):
+        if len(args) < 2:
+            raise ValueError("Usage: mama restore <commit_id> <path_or_glob>...")
+        self.commit_id = args[0]
+        self.patterns = args[1:]
+
+    def execute(self):
+        """Execute the path-scoped restore."""
+        repo = Repository()
+        repo.restore_paths(self.commit_id, self.patterns)
+
+
+
+
+
+
+
+
+
+class SparseCommand:
+    """
+    Manage the sparse checkout: only paths matching its patterns are written to disk.
+
+    Usage: mama sparse set <pattern>... | mama sparse add <pattern>... | mama sparse list | mama sparse clear
+    """
+
+    USAGE = "Usage: mama sparse set <pattern>... | add <pattern>... | list | clear"
+
+    def __init__(self, args):
+        if not args or args[0] not in ("set", "add", "list", "clear"):
+            raise ValueError(self.USAGE)
+        if args[0] in ("set", "add") and len(args) < 2:
+            raise ValueError(self.USAGE)
+        self.action = args[0]
+        self.patterns = args[1:]
+
+    def execute(self):
+        """Execute the sparse checkout action."""
+        repo = Repository()
+        if self.action == "list":
+            patterns = repo.load_sparse_patterns()
+            if not patterns:
+                print("Sparse checkout bondho, shob file ache.")
+            for pattern in patterns:
+                print(pattern)
+        elif self.action == "clear":
+            repo.set_sparse_patterns([])
+        elif self.action == "add":
+            repo.set_sparse_patterns(repo.load_sparse_patterns() + self.patterns)
+        else:
+            repo.set_sparse_patterns(self.patterns)
+
+
+
+
+
+
+
+
+
+class WorktreeCommand:
+    """
+    Manage extra working directories that share this repository's object store.
+
+    Usage: mama worktree add <directory> <commit_id> | mama worktree list
+    """
+
+    USAGE = "Usage: mama worktree add <directory> <commit_id> | mama worktree list"
+
+    def __init__(self, args):
+        if not args or args[0] not in ("add", "list"):
+            raise ValueError(self.USAGE)
+        if args[0] == "add" and len(args) != 3:
+            raise ValueError(self.USAGE)
+        self.action = args[0]
+        self.args = args[1:]
+
+    def execute(self):
+        """Execute the worktree action."""
+        repo = Repository()
+        if self.action == "add":
+            repo.add_worktree(*self.args)
+            return
+        worktrees = repo.list_worktrees()
+        if not worktrees:
+            print("Kono worktree nai mama.")
+        for worktree in worktrees:
+            print(f"{worktree['commit_id'][:Repository.SHORT_ID_LENGTH]}  {worktree['path']}")
+
+
+
+
+
+
+
+
+
+class FsckCommand:
+    """
+    Verify that every stored object still matches the hash recorded in the history.
+
+    Usage: mama fsck [--quick [n]] [--jobs <n>] [--restart]
+    An interrupted run resumes from its checkpoint unless --restart is given.
+    --quick checks a random sample of n objects (1000 by default).
+    """
+
+    USAGE = "Usage: mama fsck [--quick [n]] [--jobs <n>] [--restart]"
+
+    def __init__(self, args=None):
+        args = list(args or [])
+        self.quick = None
+        self.jobs = None
+        self.restart = False
+        while args:
+            arg = args.pop(0)
+            if arg == "--quick":
+                self.quick = Repository.FSCK_QUICK_SAMPLE
+                if args and args[0].isdigit():
+                    self.quick = int(args.pop(0))
+            elif arg == "--jobs" and args:
+                self.jobs = int(args.pop(0))
+            elif arg == "--restart":
+                self.restart = True
+            else:
+                raise ValueError(self.USAGE)
+
+    def execute(self):
+        """Execute the integrity check."""
+        repo = Repository()
+        repo.show_fsck(self.quick, self.jobs, self.restart)
+
+
+
+
+
+
+
+
+
+class RehashCommand:
+    """
+    Switch the repository to another content hash, rewriting every recorded hash.
+
+    Usage: mama rehash <sha256|blake2b>
+    """
+
+    def __init__(self, args):
+        if len(args) != 1:
+            raise ValueError("Usage: mama rehash <sha256|blake2b>")
+        self.algorithm = args[0]
+
+    def execute(self):
+        """Execute the hash migration."""
+        repo = Repository()
+        repo.migrate_hash(self.algorithm)
+
+
+
+
+
+
+
+
+
+class ArchiveCommand:
+    """
+    Move old history into the compressed cold pack, keeping recent commits hot.
+
+    Usage: mama archive <commit_id> | mama archive --keep <n>
+    Commits older than <commit_id>, or all but the newest <n>, are archived.
+    """
+
+    USAGE = "Usage: mama archive <commit_id> | mama archive --keep <n>"
+
+    def __init__(self, args):
+        self.cutoff = None
+        self.keep = None
+        if len(args) == 2 and args[0] == "--keep" and args[1].isdigit() and int(args[1]) > 0:
+            self.keep = int(args[1])
+        elif len(args) == 1 and not args[0].startswith("-"):
+            self.cutoff = args[0]
+        else:
+            raise ValueError(self.USAGE)
+
+    def execute(self):
+        """Execute the archive."""
+        repo = Repository()
+        cutoff = self.cutoff
+        if self.keep is not None:
+            commit_ids = repo.get_commit_ids()
+            if len(commit_ids) <= self.keep:
+                print("Archive korar moto purono commit nai, mama.")
+                return
+            cutoff = commit_ids[-self.keep]
+        repo.archive(cutoff)
+
+
+
+
+
+
+
+
+
+class ConfigCommand:
+    """
+    Show or change repository settings.
+
+    Usage: mama config [<key> [<value>]]
+    With no arguments every setting is listed; with a key, that setting is shown.
+    """
+
+    USAGE = "Usage: mama config [<key> [<value>]]"
+
+    def __init__(self, args):
+        if len(args) > 2:
+            raise ValueError(self.USAGE)
+        self.key = args[0] if args else None
+        self.value = args[1] if len(args) == 2 else None
+
+    def execute(self):
+        """Execute the config command."""
+        repo = Repository()
+        if self.value is not None:
+            repo.set_config(self.key, self.value)
+            print(f"{self.key} = {self.value}")
+            return
+        config = repo.load_config()
+        if self.key is not None and self.key not in config:
+            raise ValueError(f"Config '{self.key}' chini na mama. Choose from: {', '.join(config)}")
+        for key, value in config.items():
+            if self.key in (None, key):
+                print(f"{key} = {value}")
+
+
+
+
+
+
+
+
+
+
+class PushCommand:
+    """
+    Send the commits another mama repository is missing, and fast-forward it.
+
+    Usage: mama push <repository_path | unix:<socket>>
+    """
+
+    def __init__(self, args):
+        if len(args) != 1:
+            raise ValueError("Usage: mama push <repository_path | unix:<socket>>")
+        self.remote = args[0]
+
+    def execute(self):
+        """Execute the push."""
+        repo = Repository()
+        conn = connect(self.remote)
+        try:
+            conn.send(command="push", version=PROTOCOL_VERSION)
+            sent = repo.send_history(conn)
+        finally:
+            conn.close()
+        print(f"{sent} ta commit pathano holo, mama." if sent else "Oi pashe shob ache, kichu pathano lagbe na mama.")
+
+
+
+
+
+
+
+
+
+class PullCommand:
+    """
+    Fetch the commits this repository is missing from another mama repository, and fast-forward.
+
+    Usage: mama pull <repository_path | unix:<socket>>
+    """
+
+    def __init__(self, args):
+        if len(args) != 1:
+            raise ValueError("Usage: mama pull <repository_path | unix:<socket>>")
+        self.remote = args[0]
+
+    def execute(self):
+        """Execute the pull."""
+        repo = Repository()
+        conn = connect(self.remote)
+        try:
+            conn.send(command="pull", version=PROTOCOL_VERSION)
+            received = repo.receive_history(conn)
+        finally:
+            conn.close()
+        if not received:
+            print("Already up to date, mama.")
+
+
+
+
+
+
+
+
+
+class ServeCommand:
+    """
+    Serve this repository to `mama push` and `mama pull`.
+
+    Usage: mama serve [--socket <path>]
+    Without --socket one exchange is served over stdin and stdout; this is how a
+    push or pull to a repository path talks to it.
+    """
+
+    def __init__(self, args):
+        self.socket_path = None
+        if len(args) == 2 and args[0] == "--socket":
+            self.socket_path = args[1]
+        elif args:
+            raise ValueError("Usage: mama serve [--socket <path>]")
+
+    def execute(self):
+        """Execute the server."""
+        if self.socket_path:
+            serve_socket(self.socket_path, self.handle)
+            return
+        conn = stdio_connection()
+        try:
+            self.handle(conn)
+        except Exception:
+            pass  # Already sent to the client, which reports it
+        finally:
+            conn.close()
+
+    @staticmethod
+    def handle(conn):
+        """Answer one push or pull on an open connection. Errors are sent to the client and re-raised."""
+        try:
+            request = conn.receive()
+            if request.get("version") != PROTOCOL_VERSION:
+                raise ValueError(f"Protocol version {request.get('version')} support kori na mama.")
+            repo = Repository()
+            if request["command"] == "pull":
+                repo.send_history(conn)
+            elif request["command"] == "push":
+                repo.receive_history(conn)
+            else:
+                raise ValueError(f"Unknown command: {request['command']}")
+        except ConnectionError:
+            raise
+        except Exception as e:
+            conn.send(error=str(e))
+            raise
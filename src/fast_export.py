@@ -0,0 +1,302 @@
+# fast_export.py
+
+import os
+import re
+import tempfile
+from collections import namedtuple
+
+
+FastExportCommit = namedtuple(
+    "FastExportCommit", ["ref", "mark", "author", "committer", "timestamp_ns", "message", "parent", "merges", "changes"]
+)
+
+
+class MarkTable:
+    """
+    Maps fast-export marks to 32-byte digests.
+
+    The table lives in an unnamed temporary file at offset mark * 32, so a stream with
+    millions of marks costs no Python memory beyond the page cache.
+    """
+
+    WIDTH = 32
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+
+    def __setitem__(self, mark, hex_digest):
+        self._file.seek(mark * self.WIDTH)
+        self._file.write(bytes.fromhex(hex_digest))
+
+    def __getitem__(self, mark):
+        self._file.seek(mark * self.WIDTH)
+        digest = self._file.read(self.WIDTH)
+        if len(digest) != self.WIDTH or not any(digest):
+            raise KeyError(mark)
+        return digest.hex()
+
+    def close(self):
+        self._file.close()
+
+
+
+
+
+
+class _DataReader:
+    """File-like view of the next `size` bytes of a stream, used to hand blob data on without buffering it."""
+
+    def __init__(self, stream, size):
+        self.stream = stream
+        self.remaining = size
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        chunk = self.stream.read(size)
+        if not chunk:
+            raise ValueError("fast-export stream sesh hoye gese data er majhe.")
+        self.remaining -= len(chunk)
+        return chunk
+
+    def drain(self):
+        while self.read(1024 * 1024):
+            pass
+
+
+
+
+
+
+class FastExportReader:
+    """
+    Incremental parser for `git fast-export` streams.
+
+    Blob data is never held in memory: every blob, inline or marked, is handed to
+    `store_blob` as a bounded reader, and marks are resolved through a MarkTable.
+    Commits are yielded one at a time with their file changes resolved to hashes.
+
+    Changes are tuples:
+        ("M", path, hash), ("D", path), ("C", source, destination),
+        ("R", source, destination), ("deleteall",)
+    """
+
+    def __init__(self, stream, store_blob, marks):
+        """
+        Args:
+            stream: A binary stream positioned at the start of the fast-export output.
+            store_blob (callable): Takes a readable stream, stores it and returns its hash.
+            marks (MarkTable): Table that receives blob marks and resolves commit marks.
+        """
+        self.stream = stream
+        self.store_blob = store_blob
+        self.marks = marks
+        self._pending = None
+
+    def _readline(self):
+        if self._pending is not None:
+            line, self._pending = self._pending, None
+            return line
+        line = self.stream.readline()
+        if not line:
+            return None
+        return line.rstrip(b"\n")
+
+    def _unread(self, line):
+        self._pending = line
+
+    def _read_data(self, header):
+        """Return a reader over the data announced by a `data` header line."""
+        if not header.startswith(b"data "):
+            raise ValueError(f"'data' ashar kotha chilo, pailam: {header!r}")
+        spec = header[5:]
+        if spec.startswith(b"<<"):
+            delimiter = spec[2:]
+            lines = []
+            while (line := self.stream.readline()).rstrip(b"\n") != delimiter:
+                if not line:
+                    raise ValueError(f"fast-export stream sesh hoye gese, {delimiter!r} pai nai.")
+                lines.append(line.rstrip(b"\n") + b"\n")
+            return _BytesReader(b"".join(lines))
+        return _DataReader(self.stream, int(spec))
+
+    def _read_message(self, header):
+        reader = self._read_data(header)
+        chunks = []
+        while chunk := reader.read():
+            chunks.append(chunk)
+        return b"".join(chunks).decode("utf-8", "replace")
+
+    def _skip_optional_newline(self):
+        line = self._readline()
+        if line not in (None, b""):
+            self._unread(line)
+
+
+
+
+
+
+    def commits(self):
+        """Parse the stream and yield a FastExportCommit for every commit command."""
+        while (line := self._readline()) is not None:
+            if line == b"blob":
+                self._parse_blob()
+            elif line.startswith(b"commit "):
+                yield self._parse_commit(line[7:].decode("utf-8", "replace"))
+            elif line.startswith(b"tag "):
+                self._skip_tag()
+            elif line == b"done":
+                return
+            # reset, progress, feature, option, checkpoint and blank lines carry no content
+
+    def _parse_blob(self):
+        line = self._readline()
+        mark = None
+        if line.startswith(b"mark :"):
+            mark = int(line[6:])
+            line = self._readline()
+        if line.startswith(b"original-oid "):
+            line = self._readline()
+        reader = self._read_data(line)
+        file_hash = self.store_blob(reader)
+        reader.drain()
+        if mark is not None:
+            self.marks[mark] = file_hash
+        self._skip_optional_newline()
+
+    def _skip_tag(self):
+        while (line := self._readline()) is not None:
+            if line.startswith(b"data "):
+                self._read_message(line)
+                self._skip_optional_newline()
+                return
+
+    def _parse_commit(self, ref):
+        mark = author = committer = parent = None
+        timestamp_ns = 0
+        message = ""
+        merges = []
+        changes = []
+
+        while (line := self._readline()) is not None:
+            if line.startswith(b"mark :"):
+                mark = int(line[6:])
+            elif line.startswith(b"original-oid "):
+                continue
+            elif line.startswith(b"author "):
+                author = line[7:].decode("utf-8", "replace")
+            elif line.startswith(b"committer "):
+                committer = line[10:].decode("utf-8", "replace")
+                timestamp_ns = int(committer.rsplit(" ", 2)[-2]) * 1_000_000_000
+            elif line.startswith(b"encoding "):
+                continue
+            elif line.startswith(b"data "):
+                message = self._read_message(line)
+            elif line.startswith(b"from "):
+                parent = line[5:].decode()
+            elif line.startswith(b"merge "):
+                merges.append(line[6:].decode())
+            elif line.startswith(b"M "):
+                change = self._parse_modify(line[2:])
+                if change:
+                    changes.append(change)
+            elif line.startswith(b"D "):
+                changes.append(("D", _unquote(line[2:])))
+            elif line.startswith(b"C ") or line.startswith(b"R "):
+                source, destination = _split_paths(line[2:])
+                changes.append((line[:1].decode(), source, destination))
+            elif line == b"deleteall":
+                changes.append(("deleteall",))
+            elif line == b"":
+                break
+            else:
+                self._unread(line)
+                break
+
+        return FastExportCommit(ref, mark, author, committer, timestamp_ns, message.rstrip("\n"), parent, merges, changes)
+
+    def _parse_modify(self, rest):
+        mode, dataref, path = rest.split(b" ", 2)
+        path = _unquote(path)
+        if dataref == b"inline":
+            reader = self._read_data(self._readline())
+            file_hash = self.store_blob(reader)
+            reader.drain()
+        elif dataref.startswith(b":"):
+            file_hash = self.marks[int(dataref[1:])]
+        else:
+            file_hash = None
+        if mode in (b"160000", b"040000"):
+            return None  # Submodules and directories have no content of their own
+        if file_hash is None:
+            raise ValueError(f"{path} er content stream e nai (--no-data diye export kora?).")
+        return ("M", path, file_hash)
+
+
+
+
+
+
+class _BytesReader:
+    """Reader over an in-memory `data <<delimiter` block."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def read(self, size=-1):
+        if size < 0:
+            size = len(self.data)
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+    def drain(self):
+        self.data = b""
+
+
+_ESCAPES = {b"n": b"\n", b"t": b"\t", b'"': b'"', b"\\": b"\\", b"a": b"\a", b"b": b"\b", b"f": b"\f", b"r": b"\r", b"v": b"\v"}
+
+
+def _unquote(raw):
+    """
+    Decode a fast-export path, undoing C-style quoting, into a native path.
+    Raises:
+        ValueError: If the path is empty, absolute or climbs out of the tree with "..".
+    """
+    if raw.startswith(b'"') and raw.endswith(b'"'):
+        raw = raw[1:-1]
+        out = bytearray()
+        i = 0
+        while i < len(raw):
+            if raw[i:i + 1] == b"\\":
+                nxt = raw[i + 1:i + 2]
+                if nxt.isdigit():
+                    out.append(int(raw[i + 1:i + 4], 8))
+                    i += 4
+                    continue
+                out += _ESCAPES.get(nxt, nxt)
+                i += 2
+            else:
+                out.append(raw[i])
+                i += 1
+        raw = bytes(out)
+    path = os.path.normpath(raw.decode("utf-8", "surrogateescape"))
+    if not raw or path == "." or os.path.isabs(path) or os.path.splitdrive(path)[0] or ".." in re.split(r"[\\/]", path):
+        raise ValueError(f"fast-export e '{path}' path ta tree r baire jay, mama.")
+    return path
+
+
+def _split_paths(rest):
+    """Split the `source destination` operands of a C or R command."""
+    if rest.startswith(b'"'):
+        i = 1
+        while True:
+            i = rest.index(b'"', i)
+            if rest[i - 1:i] != b"\\" or rest[i - 2:i] == b"\\\\":
+                break
+            i += 1
+        return _unquote(rest[:i + 1]), _unquote(rest[i + 2:])
+    source, destination = rest.split(b" ", 1)
+    return _unquote(source), _unquote(destination)
@@ -0,0 +1,254 @@
+# index.py
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+
+IndexEntry = namedtuple("IndexEntry", ["path", "hash", "mtime_ns", "size", "flags"])
+
+
+class Index:
+    """
+    Read-only view of the binary staging index.
+
+    The file is laid out as:
+        header   : magic, version, hash size, entry count, offset-table position
+        entries  : hash (fixed width), mtime_ns, size, flags, path length, path bytes
+        offsets  : one unsigned 64-bit offset per entry, in path order
+
+    Entries are sorted by their UTF-8 encoded path, so a single path can be found
+    by bisecting the offset table without parsing or allocating the rest of the file.
+    The file is mapped with mmap, so even a very large index costs little memory.
+
+    Attributes:
+        MAGIC (bytes): File signature.
+        VERSION (int): Current format version.
+        STAGED (int): Flag bit set on entries that are staged for the next commit.
+    """
+
+    MAGIC = b"MIDX"
+    VERSION = 1
+    STAGED = 1
+
+    HEADER = struct.Struct(">4sHHQQ")
+    OFFSET = struct.Struct(">Q")
+    ENTRY_TAIL = struct.Struct(">qQHH")  # mtime_ns, size, flags, path length
+
+    def __init__(self, path):
+        """
+        Opens the index at the given path. A missing or empty file is an empty index.
+
+        Raises:
+            ValueError: If the file is not a mama index or has an unsupported version.
+        """
+        self.path = path
+        self.count = 0
+        self.hash_size = 32
+        self._file = None
+        self._map = None
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.hash_size, self.count, self._table = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError(f"{path} mama index na.")
+        if version != self.VERSION:
+            self.close()
+            raise ValueError(f"Index version {version} support kori na mama.")
+
+
+
+
+
+
+    def close(self):
+        """Release the memory map and the underlying file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+
+
+
+
+
+    def _offset(self, i):
+        return self.OFFSET.unpack_from(self._map, self._table + i * self.OFFSET.size)[0]
+
+    def _path_at(self, i):
+        """Return the encoded path of entry i without decoding the rest of the entry."""
+        pos = self._offset(i) + self.hash_size
+        path_len = self.ENTRY_TAIL.unpack_from(self._map, pos)[3]
+        start = pos + self.ENTRY_TAIL.size
+        return self._map[start:start + path_len]
+
+    def _entry_at(self, i):
+        pos = self._offset(i)
+        digest = self._map[pos:pos + self.hash_size]
+        mtime_ns, size, flags, path_len = self.ENTRY_TAIL.unpack_from(self._map, pos + self.hash_size)
+        start = pos + self.hash_size + self.ENTRY_TAIL.size
+        path = self._map[start:start + path_len].decode("utf-8")
+        return IndexEntry(path, digest.hex(), mtime_ns, size, flags)
+
+
+
+
+
+
+    def find(self, path):
+        """
+        Look up a single path by bisecting the offset table.
+        Args:
+            path (str): The path to look up.
+        Returns:
+            IndexEntry or None: The entry for the path, or None if it is not in the index.
+        """
+        if not self.count:
+            return None
+        key = path.encode("utf-8")
+        i = bisect.bisect_left(_PathView(self), key)
+        if i < self.count and self._path_at(i) == key:
+            return self._entry_at(i)
+        return None
+
+    def __contains__(self, path):
+        return self.find(path) is not None
+
+    def __iter__(self):
+        """Yield every entry in path order."""
+        for i in range(self.count):
+            yield self._entry_at(i)
+
+    def staged(self):
+        """Yield only the entries that are staged for the next commit."""
+        for entry in self:
+            if entry.flags & self.STAGED:
+                yield entry
+
+
+
+
+
+
+    @classmethod
+    def write(cls, path, entries, hash_size=32):
+        """
+        Write an index file from entries that are already sorted by encoded path.
+
+        The file is written to a temporary name next to `path` and renamed into
+        place, so readers always see either the old or the new index.
+        Args:
+            path (str): Destination of the index file.
+            entries (iterable): IndexEntry items, sorted by path.
+            hash_size (int): Width in bytes of every stored hash.
+        """
+        os.replace(cls.write_temp(path, entries, hash_size), path)
+
+
+
+
+
+
+    @classmethod
+    def write_temp(cls, path, entries, hash_size=32):
+        """
+        Write the index to a temporary file next to `path` and return its name.
+        The caller renames it into place once any reader of the old index is closed.
+        """
+        offsets = array("Q")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, hash_size, 0, 0))
+            pos = cls.HEADER.size
+            for entry in entries:
+                digest = bytes.fromhex(entry.hash)
+                if len(digest) != hash_size:
+                    raise ValueError(f"{entry.path} er hash {hash_size} byte na.")
+                encoded = entry.path.encode("utf-8")
+                record = digest + cls.ENTRY_TAIL.pack(entry.mtime_ns, entry.size, entry.flags, len(encoded)) + encoded
+                f.write(record)
+                offsets.append(pos)
+                pos += len(record)
+            if sys.byteorder == "little":
+                offsets.byteswap()
+            offsets.tofile(f)
+            f.seek(0)
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, hash_size, len(offsets), pos))
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+
+
+
+
+
+
+    @staticmethod
+    def merge(existing, updates, clear_staged=False, removed=()):
+        """
+        Merge sorted updates into an existing sorted stream of entries.
+        Args:
+            existing (iterable): Current IndexEntry items in path order.
+            updates (dict): New IndexEntry items keyed by path; they replace existing entries.
+            clear_staged (bool): Drop the staged flag from every entry that is not in `updates`.
+            removed (iterable): Paths to drop from the index.
+        Yields:
+            IndexEntry: The merged entries in path order.
+        """
+        removed = set(removed)
+        pending = sorted(updates.values(), key=lambda e: e.path.encode("utf-8"))
+        j = 0
+        for entry in existing:
+            key = entry.path.encode("utf-8")
+            while j < len(pending) and pending[j].path.encode("utf-8") < key:
+                if pending[j].path not in removed:
+                    yield pending[j]
+                j += 1
+            if j < len(pending) and pending[j].path == entry.path:
+                entry = pending[j]
+                j += 1
+            elif clear_staged and entry.flags & Index.STAGED:
+                entry = entry._replace(flags=entry.flags & ~Index.STAGED)
+            if entry.path not in removed:
+                yield entry
+        for entry in pending[j:]:
+            if entry.path not in removed:
+                yield entry
+
+
+
+
+
+
+class _PathView:
+    """Sequence of encoded paths backed by an Index, used as the bisect target."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.count
+
+    def __getitem__(self, i):
+        return self.index._path_at(i)
@@ -1,6 +1,7 @@
 # mama.py
 
 import sys
+import multiprocessing
 from command_factory import CommandFactory
 
 def main():
@@ -15,6 +16,7 @@ def main():
     Raises:
         ValueError: If the command is not found or invalid.
     """
+    multiprocessing.freeze_support()  # Worker processes of a frozen executable start here too
     if len(sys.argv) < 2:
         print("Usage: mama <command> [<args>]")
         return
@@ -0,0 +1,352 @@
+# pipeline.py
+
+import errno
+import mmap
+import os
+import queue
+import shutil
+import threading
+
+
+BLOCK_SIZE = 1024 * 1024
+MIN_BLOCK_SIZE = 64 * 1024
+MAX_BLOCK_SIZE = 8 * 1024 * 1024
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+_OPEN, _DATA, _END, _FAIL = range(4)
+_local = threading.local()
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+
+class CopyPipeline:
+    """
+    Copies many files through three overlapped stages connected by bounded queues:
+
+        readers -> read each source file in chunks
+        hashers -> feed every chunk to the digest of its file
+        writers -> write the chunks to the destination file
+
+    Several files are in flight at once, so high-latency storage is kept busy while
+    earlier files are still being hashed or written. The bounded queues apply
+    backpressure: a stage that falls behind blocks the one before it, so memory stays
+    around (readers + depth * (hashers + writers)) chunks whatever the file sizes.
+    All chunks of one file go to the same hasher and writer, so they stay in order.
+    Chunks are read with readinto into a bounded pool of buffers that the writers
+    hand back, so no per-chunk objects are allocated. The read size follows the file
+    (see block_size), up to chunk_size, the size of the pooled buffers.
+
+    Only files that span several chunks are worth splitting across stages. A file
+    that fits in one chunk is copied and hashed by its reader alone, so the reader
+    pool is a plain worker pool for trees of many small files, without queue hops.
+    Files of MMAP_THRESHOLD bytes or more are also handled by their reader: it copies
+    them inside the kernel with copy_range and hashes the finished destination through
+    mmap. Hashing the destination rather than the source means the digest always
+    describes exactly the bytes that were written.
+
+    With readers set to 0 the files are copied one after another on the calling
+    thread, which is the plain sequential path.
+    """
+
+    def __init__(self, new_hash, readers=4, hashers=1, writers=2, depth=16, chunk_size=BLOCK_SIZE):
+        """
+        Args:
+            new_hash (callable): Returns a fresh hashlib-style digest object.
+            readers (int): Reader threads; 0 copies sequentially.
+            hashers (int): Hasher threads.
+            writers (int): Writer threads.
+            depth (int): Capacity, in chunks, of every queue between stages.
+            chunk_size (int): Bytes read at a time.
+        """
+        self.new_hash = new_hash
+        self.readers = readers
+        self.hashers = max(1, hashers)
+        self.writers = max(1, writers)
+        self.depth = max(1, depth)
+        self.chunk_size = chunk_size
+
+    def run(self, jobs, progress=None, done=None):
+        """
+        Copy every (source, destination) pair and hash the source on the way.
+        A destination that could not be completed is removed.
+        Args:
+            jobs (list): (source, destination) path pairs.
+            progress (callable): Called with the number of finished jobs each time one finishes.
+            done (callable): Called with (job index, digest or exception) as soon as a job
+                finishes, on the thread that finished it, so the caller can act on each
+                destination without waiting for the whole run.
+        Returns:
+            list: For every job, in order, the hex digest of the source or the OSError raised for it.
+        Raises:
+            Exception: The first failure that is not an OSError, once every stage has
+                stopped; such a failure is a bug rather than a file that could not be copied.
+        """
+        results = [None] * len(jobs)
+        errors = []
+        finished = 0
+        finished_lock = threading.Lock()
+
+        def finish(i, result):
+            nonlocal finished
+            results[i] = result
+            if isinstance(result, Exception) and not isinstance(result, OSError):
+                errors.append(result)
+            try:
+                if done is not None:
+                    done(i, result)
+                if progress is not None:
+                    with finished_lock:
+                        finished += 1
+                        progress(finished)
+            except Exception as exc:
+                errors.append(exc)
+
+        if self.readers <= 0 or len(jobs) < 2:
+            for i, (source, destination) in enumerate(jobs):
+                finish(i, self._copy_one(source, destination))
+                if errors:
+                    raise errors[0]
+            return results
+
+        pending = queue.SimpleQueue()
+        for i in range(len(jobs)):
+            pending.put(i)
+        hash_queues = [queue.Queue(self.depth) for _ in range(self.hashers)]
+        write_queues = [queue.Queue(self.depth) for _ in range(self.writers)]
+        reader_count = min(self.readers, len(jobs))
+
+        # Every buffer is either free, held by one thread, or waiting in a queue, so
+        # this many buffers means a reader never waits for one while a queue has room.
+        # They are allocated on first use, so runs of small files allocate none.
+        buffers = queue.SimpleQueue()
+        buffer_limit = reader_count + self.hashers + self.writers + self.depth * (self.hashers + self.writers)
+        allocated = 0
+        allocated_lock = threading.Lock()
+
+        def take_buffer():
+            nonlocal allocated
+            try:
+                return buffers.get_nowait()
+            except queue.Empty:
+                pass
+            with allocated_lock:
+                if allocated < buffer_limit:
+                    allocated += 1
+                    return bytearray(self.chunk_size)
+            return buffers.get()
+
+        def read():
+            while True:
+                try:
+                    i = pending.get_nowait()
+                except queue.Empty:
+                    return
+                source, destination = jobs[i]
+                out = hash_queues[i % self.hashers]
+                try:
+                    with open(source, 'rb', buffering=0) as f:
+                        size = os.fstat(f.fileno()).st_size
+                        if size <= self.chunk_size or size >= MMAP_THRESHOLD:
+                            finish(i, self._copy_open(f, size, destination))
+                            continue
+                        block = min(block_size(size), self.chunk_size)
+                        out.put((i, _OPEN, None))
+                        while True:
+                            buffer = take_buffer()
+                            n = 0
+                            try:
+                                n = f.readinto(memoryview(buffer)[:block])
+                            finally:
+                                if not n:
+                                    buffers.put(buffer)  # End of file, or the read failed
+                            if not n:
+                                break
+                            out.put((i, _DATA, (buffer, n)))
+                    out.put((i, _END, None))
+                except Exception as exc:
+                    out.put((i, _FAIL, exc))
+
+        def hash_chunks(inbox):
+            digests = {}
+            while (message := inbox.get()) is not None:
+                i, kind, payload = message
+                try:
+                    if kind == _OPEN:
+                        digests[i] = self.new_hash()
+                    elif kind == _DATA:
+                        buffer, n = payload
+                        digests[i].update(memoryview(buffer)[:n])
+                    elif kind == _END:
+                        payload = digests.pop(i).hexdigest()
+                    else:
+                        digests.pop(i, None)
+                except Exception as exc:
+                    if kind == _DATA:
+                        buffers.put(payload[0])
+                    digests.pop(i, None)
+                    kind, payload = _FAIL, exc  # Later chunks of this file fail too, and are dropped
+                write_queues[i % self.writers].put((i, kind, payload))
+
+        def write(inbox):
+            files = {}
+            while (message := inbox.get()) is not None:
+                i, kind, payload = message
+                if kind == _DATA:
+                    buffer, n = payload
+                    payload = memoryview(buffer)[:n]
+                try:
+                    if isinstance(results[i], Exception):
+                        continue  # Already failed; drop the rest of this file
+                    if kind == _OPEN:
+                        files[i] = open(jobs[i][1], 'wb', buffering=0)
+                    elif kind == _DATA:
+                        _write_all(files[i], payload)
+                    elif kind == _END:
+                        files.pop(i).close()
+                        finish(i, payload)
+                    else:
+                        raise payload
+                except Exception as exc:
+                    _discard(files.pop(i, None), jobs[i][1])
+                    finish(i, exc)
+                finally:
+                    if kind == _DATA:
+                        payload.release()
+                        buffers.put(buffer)
+
+        stages = []
+        for target, inboxes, count in ((hash_chunks, hash_queues, self.hashers), (write, write_queues, self.writers)):
+            threads = [threading.Thread(target=target, args=(inboxes[k],), daemon=True) for k in range(count)]
+            stages.append((threads, inboxes))
+            for thread in threads:
+                thread.start()
+        readers = [threading.Thread(target=read, daemon=True) for _ in range(reader_count)]
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        for threads, inboxes in stages:
+            for inbox in inboxes:
+                inbox.put(None)
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def _copy_one(self, source, destination):
+        try:
+            with open(source, 'rb', buffering=0) as src:
+                return self._copy_open(src, os.fstat(src.fileno()).st_size, destination)
+        except OSError as exc:
+            return exc
+
+    def _copy_open(self, src, size, destination):
+        """Copy and hash an open source on the calling thread; returns the digest or the OSError."""
+        digest = self.new_hash()
+        try:
+            if size >= MMAP_THRESHOLD:
+                copy_range(src, destination)
+                return digest_file(destination, digest)
+            view = memoryview(_buffer(block_size(size)))[:block_size(size)]
+            with open(destination, 'wb', buffering=0) as dst:
+                while n := src.readinto(view):
+                    digest.update(view[:n])
+                    _write_all(dst, view[:n])
+        except OSError as exc:
+            _discard(None, destination)
+            return exc
+        return digest.hexdigest()
+
+
+
+
+
+
+def digest_file(path, digest):
+    """
+    Feed a file's contents to a hashlib-style digest and return the hex digest.
+    Large files are hashed straight from an mmap, one MMAP_THRESHOLD window at a time,
+    releasing each window's pages once hashed so memory stays bounded; smaller ones
+    are read with readinto, in blocks sized by block_size, into a buffer reused by
+    every call on the same thread.
+    """
+    with open(path, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for start in range(0, size, MMAP_THRESHOLD):
+                        digest.update(view[start:start + MMAP_THRESHOLD])
+                        if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+                            mapped.madvise(mmap.MADV_DONTNEED, start, min(MMAP_THRESHOLD, size - start))
+                finally:
+                    view.release()
+        else:
+            view = memoryview(_buffer(block_size(size)))[:block_size(size)]
+            while n := f.readinto(view):
+                digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def copy_range(src, destination):
+    """
+    Copy an open source file to a new destination without passing the data through Python.
+    Uses copy_file_range, which can share extents on copy-on-write filesystems, then
+    sendfile, and falls back to a buffered copy where neither is available.
+    """
+    with open(destination, 'wb', buffering=0) as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        for kernel_copy in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+            if kernel_copy is None:
+                continue
+            try:
+                while remaining > 0:
+                    if kernel_copy is os.sendfile:
+                        sent = kernel_copy(dst.fileno(), src.fileno(), None, min(remaining, 1 << 30))
+                    else:
+                        sent = kernel_copy(src.fileno(), dst.fileno(), min(remaining, 1 << 30))
+                    if not sent:
+                        break
+                    remaining -= sent
+                return
+            except OSError as exc:
+                if dst.tell() or src.tell():
+                    raise  # Failed part way; the data written so far cannot be trusted
+                if exc.errno not in _UNSUPPORTED:
+                    raise
+        shutil.copyfileobj(src, dst, BLOCK_SIZE)
+
+
+def block_size(size):
+    """
+    Read size for a file of `size` bytes, a power of two between MIN_BLOCK_SIZE and
+    MAX_BLOCK_SIZE. A file of up to BLOCK_SIZE bytes is read in one call, without a
+    buffer larger than it needs; a bigger one in blocks of an eighth of the file, large
+    enough that per-call overhead disappears while memory per thread stays bounded.
+    """
+    target = max(size // 8, min(size, BLOCK_SIZE))
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, 1 << max(0, target - 1).bit_length()))
+
+
+def _buffer(size=BLOCK_SIZE):
+    """The read buffer of the current thread, grown to at least `size` bytes."""
+    if len(getattr(_local, "buffer", b"")) < size:
+        _local.buffer = bytearray(size)
+    return _local.buffer
+
+
+def _write_all(f, view):
+    """Write a whole buffer to an unbuffered file, which may accept less per call."""
+    while view:
+        view = view[f.write(view):]
+
+
+def _discard(f, path):
+    """Close and remove a partially written destination."""
+    if f is not None:
+        f.close()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,45 +1,134 @@
 # repository.py
 
 import os
+import re
+import fnmatch
 import shutil
+import sqlite3
 import hashlib
 import difflib
 from datetime import datetime
+import io
 import json
+import tarfile
+import time
+import zipfile
+import heapq
+import zlib
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, contextmanager
 from colorama import Fore, Style, init
 
+from fast_export import FastExportReader, MarkTable
+from pipeline import CopyPipeline, digest_file
+from index import Index, IndexEntry
+
 class Repository:
     """
     Repository class for managing a simple version control system.
     Attributes:
         EXCLUDED_DIRS (set): Directories to exclude from tracking.
-        COMMITS_DIR (str): Directory to store commits.
-        INDEX_FILE (str): File to store the index of staged files.
+        COMMITS_DIR (str): Directory of commits made before the object store existed.
+        OBJECTS_DIR (str): Content-addressed store of file contents, shared by all commits.
+        INDEX_FILE (str): Binary index of tracked files, their hashes and staged flags.
         LOG_FILE (str): File to store the commit log.
         HEAD_FILE (str): File to store the current HEAD commit.
+        LOCK_FILE (str): Lock file held by writers while they update shared metadata.
     Methods:
         __init__(): Initialize the repository instance.
         init(): Initialize the repository.
         add(filename): Add a single file to the index.
+        add_files(filenames): Stage several files with a single index rewrite.
         add_all(): Stage only modified or new files.
+        open_index(): Open the binary index for lookups.
+        update_index(updates, clear_staged, removed): Merge changes into the index atomically.
+        lock(): Hold the repository write lock for a short critical section.
+        take_stale_lock(owner): Take over a lock file whose holder is no longer running.
+        write_json_atomic(path, data): Write JSON through a temp file and rename.
         is_modified_or_new(filename, commit_id): Check if a file is new or modified compared to the last commit.
         stage_new_files(): Stage all files as new when no prior commits exist.
         is_tracked(filename): Check if a file is already tracked.
         load_exclusions(): Load excluded files.
         is_excluded(path, exclusions): Check if a path matches any excluded directories.
         commit(message): Commit the staged files and show the summary of changes.
-        get_last_commit(): Get the previous commit ID.
-        show_commit_summary(new_commit_id, new_files): Show the summary of additions and deletions compared to the last commit.
+        make_commit_id(files, parent, message, timestamp_ns): Derive a commit ID from the commit contents.
+        get_commit_ids(): List commit IDs from oldest to newest.
+        get_head(): Get the ID of the current HEAD commit.
+        resolve_commit(ref): Resolve a full or abbreviated commit ID.
+        get_last_commit(): Get the most recent commit ID.
+        object_path(file_hash): Path of a stored object in loose storage.
+        object_locations(hashes): Where stored objects can be read, loose or in the cold pack.
+        open_object(file_hash): Open a stored object for reading, wherever it is stored.
+        object_size(file_hash): Size of a stored object's contents.
+        copy_object(file_hash, destination): Write a stored object's contents to a file.
+        store_object(filename, file_hash): Copy a file into the object store unless already stored.
+        store_objects_checked(files): Copy files into the object store through the pipeline, verifying their hashes.
+        copy_pipeline(): The read/hash/write pipeline, sized by the repository config.
+        load_config(): Repository settings, with defaults for anything not set.
+        set_config(key, value): Change one repository setting.
+        finish_pending_commit(): Complete or clear the bookkeeping of interrupted commits.
+        pending_marker(): Path of this process's unfinished-commit marker.
+        interrupted_commits(): Unfinished-commit markers whose process is gone.
+        recover_object_temps(staged): Keep or remove the temporary object files of dead processes.
+        store_object_stream(fileobj): Hash and store a stream in one pass.
+        migrate_legacy_commits(): Move old per-commit folders into the object store.
+        get_commit_entry(commit_id): Log entry of a commit.
+        get_commit_tree(commit_id): Full path -> hash mapping of a commit.
+        archive(cutoff): Move commits older than a cutoff, and objects only they use, into the cold pack.
+        load_archive_base(): The tree at the newest archived commit, where the hot log starts.
+        cold_commit_entry(commit_id): Read an archived log entry from the cold pack.
+        cold_commit_entries(commit_id): Read the archived log entries in history order.
+        cold_entries_before(log_data): The archived entries that precede the log.
+        history_entries(): Every log entry, archived ones first.
+        import_snapshots(sources): Import directories or tarballs as consecutive commits.
+        import_fast_export(stream): Build history from a `git fast-export` stream.
+        scan_working_tree(): Paths of all candidate files, reusing cached listings of unchanged directories.
+        materialize_tree(tree, patterns, base_tree): Write a tree's files from the object store into the working directory.
+        restore_paths(commit_id, patterns): Restore only the matching paths from a commit.
+        use_common_dir(): Point a worktree at the object store of the repository it was created from.
+        add_worktree(directory, commit_id): Create another working directory that shares the object store.
+        list_worktrees(): Worktrees created from this repository.
+        has_object(file_hash): Whether an object is stored, loose or archived.
+        send_history(conn): Offer missing commits to another repository and stream the objects it wants.
+        receive_history(conn): Fast-forward to another repository's HEAD, fetching only missing objects.
+        locally_changed(paths, old_tree, new_tree): Paths whose working copy matches neither tree.
+        load_sparse_patterns(): Patterns of the sparse checkout, empty when everything is checked out.
+        set_sparse_patterns(patterns): Change the sparse checkout and apply it to the working directory.
+        export_commit(commit_id, out, archive_format, prefix): Stream a commit's tree as tar or zip.
+        blame(filename, commit_id): Attribute each line of a file to the commit that last changed it.
+        show_blame(filename, commit_id): Print blame output.
+        search_history(pattern, ignore_case, jobs): Search every stored file version with a regex.
+        update_trigram_index(): Add blobs that are not yet in the trigram index.
+        path_history(path): Commits that touched a path or anything under it, from the path index.
+        rebuild_path_index(): Rebuild the path -> commits index from log.json.
+        change_stats(old_hash, new_hash): Lines added and removed and the byte delta between two stored versions.
+        commit_stats(hashes, base_tree, deleted): Per-file change statistics of a commit.
+        backfill_stats(): Add change statistics to old log entries that have none.
+        show_commit_summary(entry): Show the files changed, lines added and removed and byte delta of a commit.
         clear_index(): Clear the staging area by emptying the index file.
-        hash_file(filename): Generate a SHA-256 hash of the file's contents.
-        show_log(): Display the commit history from the log file.
+        hash_file(filename): Hash the file's contents with the repository's hash algorithm.
+        load_format(): Read the repository format file.
+        migrate_hash(algorithm): Rehash every stored object and rewrite the recorded hashes.
+        remap_hashes(mapping): Rewrite the hashes recorded in the log, index and archive base.
+        show_log(stat): Display the commit history from the log file, optionally with change statistics.
         status(): Show the status of the repository.
-        rollback(commit_id): Rollback to a specific commit.
+        fsck(quick, jobs, restart): Verify stored objects against the hashes recorded in the log.
+        show_fsck(quick, jobs, restart): Run fsck and print its findings.
+        rollback(commit_id, verbose): Rollback to a specific commit.
+        progress_printer(label, total): Callback that shows a done/total counter on the terminal.
         rollback_to_previous(): Rollback to the previous commit.
-        compare_with_commit(commit_id): Compare working directory with the given commit.
+        compare_with_commit(commit_id, paths, mode): Compare the working directory with a commit, diffing only changed files.
         compare_latest_with_previous(): Compare the latest and previous commits.
         print_diff(file1, file2): Print the unified diff between two files.
+        open_diff_cache(): Open the on-disk cache of diffs between stored objects.
+        blob_diff(db, hash1, hash2): Diff hunks between two stored objects, served from the cache when possible.
+        print_blob_diff(db, hash1, hash2, label1, label2): Print the cached or computed diff between two stored objects.
+        evict_diff_cache(db): Record cache use and drop least recently used diffs until the cache fits its size cap.
+        diff_cache_stats(): Hit and miss counters and size of the diff cache.
         compare_commits(commit1, commit2): Compare files between two commits.
+        detect_renames(tree1, tree2, new_files, deleted_files): Pair added files with their rename or copy sources.
     """
     
     
@@ -48,10 +137,53 @@ class Repository:
     
     EXCLUDED_DIRS = {"venv/", "mama/", ".mama/", "node_modules/"}
     COMMITS_DIR = ".mama/commits"
-    INDEX_FILE = ".mama/index.txt"
+    EXPORT_FORMATS = ("tar", "tar.gz", "tar.xz", "zip")
+    OBJECTS_DIR = ".mama/objects"
+    BLAME_DIR = ".mama/blame"
+    TRIGRAM_INDEX = ".mama/trigrams.db"
+    PATH_INDEX = ".mama/paths.db"
+    SPARSE_FILE = ".mama/sparse"
+    COMMON_DIR_FILE = ".mama/commondir"
+    DIR_CACHE = ".mama/dircache.json"
+    FORMAT_FILE = ".mama/format.json"
+    DIFF_CACHE = ".mama/diffcache.db"
+    DIFF_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    DIFF_CACHE_TIMEOUT = 0.5
+    DIFF_CONTEXT_LINES = 3
+    FORMAT_VERSION = 1
+    DEFAULT_HASH = "sha256"
+    FSCK_CHECKPOINT = ".mama/fsck.json"
+    FSCK_BATCH = 512
+    FSCK_QUICK_SAMPLE = 1000
+    DIR_CACHE_RACY_NS = 2_000_000_000
+    WORKTREES_FILE = "worktrees.json"
+    RENAME_THRESHOLD = 0.5
+    RENAME_PAIR_LIMIT = 100000
+    SKETCH_SIZE = 64
+    RENAME_COMMON_LINE_FILES = 16
+    RENAME_CANDIDATES_PER_FILE = 8
+    TRIGRAM_MAX_BLOB = 16 * 1024 * 1024
+    STATS_MAX_DIFF_BYTES = 8 * 1024 * 1024
+    INDEX_FILE = ".mama/index"
     LOG_FILE = ".mama/log.json"
     HEAD_FILE = ".mama/HEAD"
+    PENDING_DIR = ".mama/commit-pending"
+    ARCHIVE_BASE = ".mama/base.json"
+    COLD_PACK = ".mama/cold.pack"
+    COLD_INDEX = ".mama/cold.db"
+    CONFIG_FILE = ".mama/config.json"
+    DEFAULT_CONFIG = {
+        "pipeline.readers": 4,
+        "pipeline.hashers": 1,
+        "pipeline.writers": 2,
+        "pipeline.depth": 16,
+    }
+    SHORT_ID_LENGTH = 12
+    LEGACY_INDEX_FILE = ".mama/index.txt"
     TRACK_FILE = ".mama/track.json"
+    LOCK_FILE = ".mama/lock"
+    LOCK_TIMEOUT = 60
+    LOCK_STALE_AFTER = 600
 
 
 
@@ -67,10 +199,28 @@ class Repository:
         """
         if not os.path.exists(".mama"):
             raise Exception("Repository not initialized. Run 'mama shuru'.")
-        
-        if not os.path.exists(self.LOG_FILE):
-            with open(self.LOG_FILE, 'w') as f:
-                json.dump([], f)  # Initialize with an empty list
+
+        self._lock_depth = 0
+        self.common_dir = ".mama"
+        if os.path.exists(self.COMMON_DIR_FILE):
+            self.use_common_dir()
+        self.hash_algorithm = self.load_format()["hash"]
+        self.has_cold_pack = os.path.exists(self.COLD_INDEX)
+
+        if not os.path.exists(self.LOG_FILE) or not os.path.exists(self.INDEX_FILE):
+            with self.lock():
+                if not os.path.exists(self.LOG_FILE):
+                    self.write_json_atomic(self.LOG_FILE, [])  # Initialize with an empty list
+                if not os.path.exists(self.INDEX_FILE):
+                    self.migrate_legacy_index()
+
+        if not os.path.exists(self.OBJECTS_DIR):
+            with self.lock():
+                self.migrate_legacy_commits()
+
+        if os.path.isdir(self.PENDING_DIR) and os.listdir(self.PENDING_DIR):
+            with self.lock():
+                self.finish_pending_commit()
 
 
 
@@ -80,7 +230,7 @@ class Repository:
 
 
     @staticmethod
-    def init():
+    def init(hash_algorithm=None):
         """
             Initializes a new repository.
             This method checks if a repository is already initialized by looking for the 
@@ -88,15 +238,21 @@ class Repository:
             indicating that the repository is already initialized and returns. Otherwise, 
             it creates the necessary directories and files for the repository and prints 
             a message indicating that the repository has been successfully initialized.
+        Args:
+            hash_algorithm (str): Content hash recorded in the format file; one of HASH_ALGORITHMS.
         Raises:
             OSError: If there is an error creating the directories or files.
         """
         if os.path.exists(".mama"):
             print("Repository already initialized.")
             return
-        os.makedirs(Repository.COMMITS_DIR)
-        open(Repository.INDEX_FILE, 'w').close()
-        open(Repository.LOG_FILE, 'w').close()
+        hash_algorithm = hash_algorithm or Repository.DEFAULT_HASH
+        if hash_algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Hash '{hash_algorithm}' chini na mama. Choose from: {', '.join(HASH_ALGORITHMS)}")
+        os.makedirs(Repository.OBJECTS_DIR)
+        Repository.write_json_atomic(Repository.FORMAT_FILE, {"version": Repository.FORMAT_VERSION, "hash": hash_algorithm})
+        Index.write(Repository.INDEX_FILE, [])
+        Repository.write_json_atomic(Repository.LOG_FILE, [])
         print("Repository toiri hoise. cholen kam shuru kori! \n\n")
 
 
@@ -109,7 +265,7 @@ class Repository:
         """
         Adds a file to the tracking system.
         This method checks if the specified file exists and computes its hash. If the file is already tracked and 
-        unchanged, it skips the addition. Otherwise, it updates the tracking information and adds the file to the index.
+        unchanged, it skips the addition. Otherwise, it updates the index entry and marks the file as staged.
         Args:
             filename (str): The name of the file to be added.
         Returns:
@@ -118,29 +274,55 @@ class Repository:
             None
         Side Effects:
             - Prints messages to the console regarding the status of the file addition.
-            - Updates the tracking information in the tracking file.
-            - Appends the filename to the index file.
+            - Rewrites the index file with the updated entry.
         """
-        
-        tracked_files = self.load_tracked_files()
 
         if not os.path.exists(filename):
             print(f"Ish: {filename} file to khuija pailam na.")
             return
 
-        current_hash = self.hash_file(filename)
-        if filename in tracked_files and tracked_files[filename] == current_hash:
-            # print(f"{filename} unchanged. Skipping.")
-            return
+        self.add_files([filename])
+
+
+
+
+
+
+
 
-        # Update track.json with the new hash
-        tracked_files[filename] = current_hash
-        self.save_tracked_files(tracked_files)
 
-        # Add to index
-        with open(self.INDEX_FILE, 'a') as f:
-            f.write(filename + '\n')
-        print(f"Dekhlam {filename}")
+    def add_files(self, filenames):
+        """
+        Stage several files with a single rewrite of the index.
+        Every file is looked up in the index by bisection; files whose size and mtime
+        still match their entry, or whose hash matches the tracked hash, are skipped,
+        the rest are staged together. A stat match only counts when the entry is older
+        than the index file itself, so a change made in the same clock tick is still hashed.
+
+        Hashing happens without the lock, so several processes can stage disjoint
+        paths in parallel; only the final merge into the index is locked.
+        Args:
+            filenames (iterable): Paths of the files to stage.
+        """
+        updates = {}
+        index_mtime_ns = os.stat(self.INDEX_FILE).st_mtime_ns if os.path.exists(self.INDEX_FILE) else 0
+        with self.open_index() as index:
+            for filename in filenames:
+                entry = index.find(filename)
+                if entry is not None and entry.mtime_ns < index_mtime_ns and self.stat_matches(filename, entry):
+                    continue
+                current_hash = self.hash_file(filename)
+                if entry is not None and entry.hash == current_hash:
+                    # print(f"{filename} unchanged. Skipping.")
+                    continue
+                updates[filename] = self.make_index_entry(filename, current_hash, Index.STAGED)
+
+        if not updates:
+            return
+
+        self.update_index(updates)
+        for filename in updates:
+            print(f"Dekhlam {filename}")
 
 
 
@@ -152,33 +334,321 @@ class Repository:
 
     def add_all(self):
         """Stage all modified or new files."""
-        for root, _, files in os.walk("."):
-            for file in files:
-                relative_path = os.path.relpath(os.path.join(root, file), ".")
-                if not self.is_excluded(relative_path, self.load_exclusions()):
-                    self.add(relative_path)
+        self.add_files(self.scan_working_tree())
 
 
 
 
 
 
-    def load_tracked_files(self):
-        """Load file hashes from track.json."""
+    def scan_working_tree(self):
+        """
+        List every file of the working directory that is not excluded.
+
+        The listing of each directory is cached in DIR_CACHE together with the directory's
+        mtime. Adding, removing or renaming an entry changes that mtime, so a directory
+        whose mtime is unchanged is not listed again; only its subdirectories are checked.
+        Directories modified shortly before a scan are not trusted, because a later change
+        within the same clock tick would leave the mtime as it was. The whole cache is
+        dropped when `.mama_bad_dao` changes.
+        Returns:
+            list: Relative paths of the candidate files.
+        """
+        exclusions = self.load_exclusions()
+        signature = self.file_signature(".mama_bad_dao")
+        cached_dirs = {}
+        if os.path.exists(self.DIR_CACHE):
+            try:
+                with open(self.DIR_CACHE, 'r') as f:
+                    cache = json.load(f)
+                if cache.get("exclusions") == signature:
+                    cached_dirs = cache["dirs"]
+            except (json.JSONDecodeError, KeyError):
+                pass
+
+        racy_after = time.time_ns() - self.DIR_CACHE_RACY_NS
+        scanned = {}
+        candidates = []
+        pending = ["."]
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            cached = cached_dirs.get(directory)
+            if cached and cached[0] == mtime_ns:
+                files, dirs = cached[1], cached[2]
+            else:
+                files, dirs = self.list_directory(directory, exclusions)
+            scanned[directory] = [mtime_ns if mtime_ns < racy_after else None, files, dirs]
+            candidates.extend(os.path.normpath(os.path.join(directory, name)) for name in files)
+            pending.extend(os.path.normpath(os.path.join(directory, name)) for name in dirs)
+
+        if scanned != cached_dirs:
+            self.write_json_atomic(self.DIR_CACHE, {"exclusions": signature, "dirs": scanned})
+        return candidates
+
+
+
+
+
+
+    def list_directory(self, directory, exclusions):
+        """
+        List the files and subdirectories of one directory that are not excluded.
+        Worktrees and other repositories nested in this one track their own files,
+        so a directory holding a `.mama` of its own is empty to the scan.
+        Returns:
+            tuple: (file names, subdirectory names)
+        """
+        files, dirs = [], []
+        with os.scandir(directory) as entries:
+            entries = list(entries)
+        if directory != "." and any(entry.name == ".mama" for entry in entries):
+            return files, dirs
+        for entry in entries:
+            if self.is_excluded(os.path.normpath(entry.path), exclusions):
+                continue
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+        return files, dirs
+
+
+
+
+
+
+    @staticmethod
+    def file_signature(path):
+        """Return [mtime_ns, size] of a file, or None if it does not exist."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_mtime_ns, st.st_size]
+
+
+
+
+
+
+    def open_index(self):
+        """Open the binary index. The caller closes it, usually with a `with` block."""
+        return Index(self.INDEX_FILE)
+
+
+
+
+
+
+    def make_index_entry(self, filename, file_hash, flags=0):
+        """Build an index entry for a file from its hash and current stat data."""
+        try:
+            st = os.stat(filename)
+            mtime_ns, size = st.st_mtime_ns, st.st_size
+        except OSError:
+            mtime_ns, size = 0, 0
+        return IndexEntry(filename, file_hash, mtime_ns, size, flags)
+
+
+
+
+
+
+    def update_index(self, updates, clear_staged=False, removed=()):
+        """
+        Merge changes into the index and replace it atomically.
+        The index is re-read under the repository lock, so updates from other
+        processes that landed in the meantime are kept.
+        Args:
+            updates (dict): IndexEntry items keyed by path to add or replace.
+            clear_staged (bool): Unstage every entry that is not in `updates`.
+            removed (iterable): Paths to drop from the index.
+        """
+        with self.lock():
+            with self.open_index() as index:
+                tmp_path = Index.write_temp(
+                    self.INDEX_FILE,
+                    Index.merge(index, updates, clear_staged=clear_staged, removed=removed),
+                    index.hash_size,
+                )
+            os.replace(tmp_path, self.INDEX_FILE)
+
+
+
+
+
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold the repository write lock.
+
+        The lock is a file created with O_EXCL, so only one writer holds it at a time.
+        Writers keep it only while they merge their changes into the index or the log;
+        readers never take it, because every shared file is replaced atomically.
+        The lock is reentrant within one Repository instance.
+
+        The file records the holder's pid and a token of its own. A lock whose holder is
+        no longer running was left behind by a crash and is taken over in one atomic
+        replace (see take_stale_lock); a live holder keeps it for as long as it needs.
+        A lock file with no readable owner is only treated as stale once it is
+        LOCK_STALE_AFTER seconds old. On release the file is removed only if it still
+        carries this holder's token.
+        Raises:
+            TimeoutError: If the lock cannot be taken within LOCK_TIMEOUT seconds.
+        """
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+
+        owner = f"{os.getpid()} {os.urandom(8).hex()}"
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+        delay = 0.001
+        while True:
+            try:
+                fd = os.open(self.LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self.take_stale_lock(owner):
+                    break
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{self.LOCK_FILE} onek khon dhore lock kora, mama.")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+            else:
+                os.write(fd, owner.encode())
+                os.close(fd)
+                break
+
+        try:
+            self._lock_depth = 1
+            yield
+        finally:
+            self._lock_depth = 0
+            try:
+                with open(self.LOCK_FILE, 'r') as f:
+                    ours = f.read() == owner
+                if ours:
+                    os.remove(self.LOCK_FILE)
+            except FileNotFoundError:
+                pass
+
+
+
+
+
+
+    def take_stale_lock(self, owner):
+        """
+        Take over the lock file if its holder is gone.
+
+        The lock file is never removed, only replaced in one step by a complete lock
+        file written under a unique name, so a writer waiting on O_EXCL can never slip
+        in while it is changing hands. Waiters that find the same stale lock race to
+        hard-link their new file to a claim named after the stale file's inode; only the
+        one that wins checks that the lock file is still the stale file and replaces it.
+        Ownership is assumed only if the lock file then is the new file.
+        Args:
+            owner (str): The pid and token to write into the new lock file.
+        Returns:
+            bool: True if this process now holds the lock.
+        """
+        try:
+            with open(self.LOCK_FILE, 'r') as f:
+                stale = os.fstat(f.fileno())
+                holder = f.read()
+        except FileNotFoundError:
+            return False
+        pid = holder.split()[0] if holder.split() else ""
+        if pid.isdigit():
+            if pid_alive(int(pid)):
+                return False
+        elif time.time() - stale.st_mtime <= self.LOCK_STALE_AFTER:
+            return False  # Its new holder may not have written its pid yet
+
+        new_path = f"{self.LOCK_FILE}.{os.getpid()}.{os.urandom(4).hex()}.new"
+        claim_path = f"{self.LOCK_FILE}.{stale.st_ino}.claim"
+        with open(new_path, 'w') as f:
+            f.write(owner)
+            new = os.fstat(f.fileno())
+        try:
+            try:
+                os.link(new_path, claim_path)
+            except FileExistsError:
+                # Another waiter is taking it over; clear its claim only if it died doing so
+                try:
+                    with open(claim_path, 'r') as f:
+                        claimer = f.read().split()
+                    if claimer and claimer[0].isdigit() and not pid_alive(int(claimer[0])):
+                        os.remove(claim_path)
+                except FileNotFoundError:
+                    pass
+                return False
+            try:
+                # Inode numbers are reused, so the contents and mtime must match as well
+                with open(self.LOCK_FILE, 'r') as f:
+                    current = os.fstat(f.fileno())
+                    if (current.st_ino, current.st_mtime_ns) != (stale.st_ino, stale.st_mtime_ns) or f.read() != holder:
+                        return False
+                os.replace(new_path, self.LOCK_FILE)
+            finally:
+                os.remove(claim_path)
+            return os.stat(self.LOCK_FILE).st_ino == new.st_ino
+        except FileNotFoundError:
+            return False
+        finally:
+            if os.path.exists(new_path):
+                os.remove(new_path)
+
+
+
+
+
+
+    @staticmethod
+    def write_json_atomic(path, data):
+        """Write JSON to a temporary file next to `path` and rename it into place."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+
+
+
+
+    def migrate_legacy_index(self):
+        """Convert an old index.txt + track.json pair into the binary index."""
+        tracked_files = {}
         if os.path.exists(self.TRACK_FILE):
             with open(self.TRACK_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    
-    
-    
-    
-    
+                tracked_files = json.load(f)
+
+        staged = set()
+        if os.path.exists(self.LEGACY_INDEX_FILE):
+            with open(self.LEGACY_INDEX_FILE, 'r') as f:
+                staged = {line.strip() for line in f if line.strip()}
 
-    def save_tracked_files(self, tracked_files):
-        """Save the complete tracked file list with hashes to track.json."""
-        with open(self.TRACK_FILE, 'w') as f:
-            json.dump(tracked_files, f, indent=4)
+        entries = {
+            path: self.make_index_entry(path, file_hash, Index.STAGED if path in staged else 0)
+            for path, file_hash in tracked_files.items()
+        }
+        Index.write(self.INDEX_FILE, Index.merge([], entries))
+
+        for legacy_file in (self.TRACK_FILE, self.LEGACY_INDEX_FILE):
+            if os.path.exists(legacy_file):
+                os.remove(legacy_file)
 
 
 
@@ -186,11 +656,10 @@ class Repository:
 
 
     def load_tracked_files(self):
-        """Load the tracked files and their hashes from track.json."""
-        if os.path.exists(self.TRACK_FILE):
-            with open(self.TRACK_FILE, 'r') as f:
-                return json.load(f)
-        return {}
+        """Load the tracked files and their hashes from the index."""
+        with self.open_index() as index:
+            return {entry.path: entry.hash for entry in index}
+    
     
     
     
@@ -208,12 +677,12 @@ class Repository:
         Returns:
             bool: True if the file is new or modified, False otherwise.
         """
-        commit_file = os.path.join(self.COMMITS_DIR, commit_id, filename)
-        if not os.path.exists(commit_file):
+        commit_hash = self.get_commit_tree(commit_id).get(filename)
+        if commit_hash is None:
             return True  # New file
 
         # Check if the content has changed
-        return self.hash_file(filename) != self.hash_file(commit_file)
+        return self.hash_file(filename) != commit_hash
 
 
 
@@ -237,12 +706,7 @@ class Repository:
             None
         """
 
-        for root, _, files in os.walk("."):
-            for file in files:
-                filepath = os.path.join(root, file)
-                relative_path = os.path.relpath(filepath, ".")
-                if not self.is_excluded(relative_path, self.load_exclusions()):
-                    self.add(relative_path)
+        self.add_all()
 
 
 
@@ -260,11 +724,8 @@ class Repository:
             bool: True if the file is tracked, False otherwise.
         """
 
-        if not os.path.exists(self.INDEX_FILE):
-            return False
-        with open(self.INDEX_FILE, 'r') as f:
-            tracked_files = f.read().splitlines()
-        return filename in tracked_files
+        with self.open_index() as index:
+            return filename in index
 
 
 
@@ -315,48 +776,113 @@ class Repository:
 
 
     def commit(self, message):
-        """Commit staged files and ensure all tracked files are retained in track.json."""
-        staged_files = self.get_staged_files()
-        tracked_files = self.load_tracked_files()
-
-        # Check if any staged file was modified after staging
-        modified_files = [
-            f for f in staged_files if tracked_files.get(f) != self.hash_file(f)
-        ]
+        """
+        Commit staged files and ensure all tracked files are retained in the index.
+
+        Contents go to the object store first, while a marker in PENDING_DIR, named after
+        this process, marks the commit as unfinished. Each object is copied to a temporary
+        name and renamed into place as soon as its hash checks out, so the store only ever
+        holds complete objects. Publishing the log entry is the final step; if the process
+        dies before it, running `rakho` again resumes: files whose object is already
+        stored and whose stat data still matches the index are not read again, and the
+        temporary copies the dead process left behind are kept if they are complete and
+        hash correctly, and removed otherwise (see recover_object_temps). Each remaining
+        file is read once by the copy pipeline, hashed while it is copied, and checked
+        against its staged hash. The change statistics
+        are then taken from the stored objects (see change_stats), which streams new
+        files and only diffs modified files that are small text.
+        """
+        index_mtime_ns = os.stat(self.INDEX_FILE).st_mtime_ns
+        with self.open_index() as index:
+            staged = {entry.path: entry for entry in index.staged()}
+        staged_hashes = {path: entry.hash for path, entry in staged.items()}
+        staged_files = list(staged_hashes)
+
+        marker = self.pending_marker()
+        with self.lock():
+            interrupted = self.interrupted_commits()
+            for path, _ in interrupted:
+                os.remove(path)  # This commit takes over; its stored objects are reused below
+            os.makedirs(self.PENDING_DIR, exist_ok=True)
+            self.write_json_atomic(marker, {"pid": os.getpid(), "message": message, "files": len(staged_files)})
+        if interrupted:
+            recovered = self.recover_object_temps(staged)
+            print("Ager adhura commit ta abar shuru korlam, rakha object gulo skip korbo."
+                  + (f" Ager process er copy theke {recovered} ta object bachano gelo." if recovered else ""))
+
+        # Store contents, and check that no staged file was modified after staging
+        modified_files = []
+        to_store = {}
+        for filename, entry in staged.items():
+            if not os.path.exists(self.object_path(entry.hash)):
+                to_store[filename] = entry.hash
+            elif not (entry.mtime_ns < index_mtime_ns and self.stat_matches(filename, entry)):
+                try:
+                    if self.hash_file(filename) != entry.hash:
+                        modified_files.append(filename)
+                except OSError:
+                    modified_files.append(filename)
+        modified_files += self.store_objects_checked(to_store)
 
         if modified_files:
+            os.remove(marker)
             print("Warning! The following files were modified after staging:")
             for file in modified_files:
                 print(f"  - {file}")
             print("Please re-stage them before committing.")
             return
 
-        # Proceed with commit
-        commit_id = datetime.now().strftime("%Y%m%d%H%M%S")
-        commit_folder = os.path.join(self.COMMITS_DIR, commit_id)
-        os.mkdir(commit_folder)
+        # The ID is only known once the parent is read under the lock
+        timestamp_ns = time.time_ns()
 
-        for filename in staged_files:
-            shutil.copy2(filename, commit_folder)
+        # Change statistics are computed now, while both versions are at hand, and
+        # outside the lock; they are redone only if another commit landed meanwhile
+        base = self.get_head()
+        stats = self.commit_stats(staged_hashes, self.get_commit_tree(base) if base else {})
 
-        # Log the commit with file names and hashes
-        self.log_commit(commit_id, message, staged_files)
+        with self.lock():
+            parent = self.get_head()
+            if parent != base:
+                stats = self.commit_stats(staged_hashes, self.get_commit_tree(parent) if parent else {})
+            commit_id = self.make_commit_id(staged_hashes, parent, message, timestamp_ns)
+            self.write_json_atomic(marker, {"pid": os.getpid(), "message": message, "commit_id": commit_id, "hashes": staged_hashes})
 
-        # Update tracked files: Keep old entries and add new/modified ones
-        for file in staged_files:
-            tracked_files[file] = self.hash_file(file)
+            # Log the commit with file names and hashes; the log write publishes it
+            log_entry = self.log_commit(commit_id, message, staged_files, staged_hashes, parent, timestamp_ns, stats)
 
-        # Save updated tracked files to track.json
-        self.save_tracked_files(tracked_files)
+            # Tracked hashes are already in the index; only the staged flags of the
+            # committed versions are cleared, so files re-staged meanwhile stay staged
+            self.unstage(staged_hashes)
+            os.remove(marker)
+        print(f"Rekhe disi mama {commit_id[:self.SHORT_ID_LENGTH]}. Kono pera nai.")
+        self.show_commit_summary(log_entry)
 
-        # Clear the index
-        self.clear_index()
-        print(f"Rekhe disi mama {commit_id}. Kono pera nai.")
 
 
 
 
 
+    @staticmethod
+    def make_commit_id(hashes, parent, message, timestamp_ns):
+        """
+        Derive a commit ID by hashing the commit contents.
+        Args:
+            hashes (dict): The committed file hashes keyed by path (the manifest).
+            parent (str or None): The ID of the parent commit.
+            message (str): The commit message.
+            timestamp_ns (int): The commit time in nanoseconds.
+        Returns:
+            str: The hexadecimal SHA-256 of the canonical commit description.
+        """
+        payload = json.dumps({
+            "manifest": sorted(hashes.items()),
+            "parent": parent,
+            "message": message,
+            "timestamp_ns": timestamp_ns,
+        }, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 
 
 
@@ -364,26 +890,43 @@ class Repository:
 
 
 
-    def log_commit(self, commit_id, message, files):
-        """Log the commit details with both file names and their hash values to log.json."""
-        log_data = self.load_commit_log()
 
-        # Prepare log entry: List of dictionaries with file name and hash
-        file_entries = [
-            {"file_name": file, "hash": self.hash_file(file)} for file in files
-        ]
 
-        log_entry = {
-            "commit_id": commit_id,
-            "message": message,
-            "files": file_entries,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
 
-        log_data.append(log_entry)
+    def unstage(self, committed_hashes):
+        """
+        Clear the staged flag of files whose staged hash is the one that was committed.
+        Args:
+            committed_hashes (dict): Committed file hashes keyed by path.
+        """
+        with self.lock():
+            updates = {}
+            with self.open_index() as index:
+                for path, file_hash in committed_hashes.items():
+                    entry = index.find(path)
+                    if entry is not None and entry.hash == file_hash:
+                        updates[path] = entry._replace(flags=entry.flags & ~Index.STAGED)
+            self.update_index(updates)
+
+
+
+
+
 
-        with open(self.LOG_FILE, 'w') as f:
-            json.dump(log_data, f, indent=4)
+    def log_commit(self, commit_id, message, files, hashes=None, parent=None, timestamp_ns=None, stats=None):
+        """Log the commit details with both file names and their hash values to log.json, and return the entry."""
+        hashes = hashes or {}
+        hashes = {file: hashes.get(file) or self.hash_file(file) for file in files}
+        log_entry = self.make_log_entry(commit_id, message, hashes, parent, timestamp_ns or time.time_ns(), stats=stats)
+
+        with self.lock():
+            log_data = self.load_commit_log()
+            log_data.append(log_entry)
+            self.write_json_atomic(self.LOG_FILE, log_data)
+            self.write_head(commit_id)
+            with closing_connection(self.PATH_INDEX) as db:
+                self.record_path_history(db, [log_entry], len(log_data) - 1, commit_id)
+        return log_entry
 
 
 
@@ -392,6 +935,40 @@ class Repository:
     
     
     
+    @staticmethod
+    def make_log_entry(commit_id, message, hashes, parent, timestamp_ns, deleted=(), stats=None):
+        """
+        Build a log.json entry.
+        Args:
+            commit_id (str): The commit ID.
+            message (str): The commit message.
+            hashes (dict): Hashes of the files changed by the commit, keyed by path.
+            parent (str or None): The ID of the parent commit.
+            timestamp_ns (int): The commit time in nanoseconds.
+            deleted (iterable): Paths removed by the commit.
+            stats (dict): Change statistics from `commit_stats`, stored with the entry if given.
+        Returns:
+            dict: The log entry.
+        """
+        log_entry = {
+            "commit_id": commit_id,
+            "parent": parent,
+            "message": message,
+            "files": [{"file_name": file, "hash": file_hash} for file, file_hash in hashes.items()],
+            "timestamp": datetime.fromtimestamp(timestamp_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S"),
+            "timestamp_ns": timestamp_ns
+        }
+        if deleted:
+            log_entry["deleted"] = sorted(deleted)
+        if stats is not None:
+            log_entry["stats"] = stats
+        return log_entry
+
+
+
+
+
+
     def load_commit_log(self):
         """Load the commit log from log.json. Return an empty list if the file is empty or missing."""
         if os.path.exists(self.LOG_FILE):
@@ -409,10 +986,8 @@ class Repository:
 
     def get_staged_files(self):
         """Retrieve the list of staged files from the index."""
-        if not os.path.exists(self.INDEX_FILE):
-            return []
-        with open(self.INDEX_FILE, 'r') as f:
-            return [line.strip() for line in f if line.strip()]
+        with self.open_index() as index:
+            return [entry.path for entry in index.staged()]
 
 
 
@@ -421,53 +996,134 @@ class Repository:
 
 
 
-    def get_last_commit(self):
+    def change_stats(self, old_hash, new_hash):
         """
-        Retrieve the previous commit ID from the commits directory.
-        This method sorts the commit IDs in the commits directory in descending order
-        and returns the second most recent commit ID. If there are no commits, it returns None.
+        Count the lines added and removed and the change in size between two stored versions.
+
+        The byte delta comes from the object sizes. A new or deleted file is counted by
+        streaming it; a modified file is only diffed line by line when the first block of
+        both versions shows text and neither is larger than STATS_MAX_DIFF_BYTES, so binary
+        and very large files are never read whole.
+        Args:
+            old_hash (str or None): The previous version, or None for a new file.
+            new_hash (str or None): The new version, or None for a deleted file.
         Returns:
-            str or None: The previous commit ID if available, otherwise None.
+            list: [added, removed, byte_delta]; added and removed are None for binary files
+            and for modified files too large to diff.
         """
-        commits = sorted(os.listdir(self.COMMITS_DIR), reverse=True)
+        sizes = [0 if file_hash is None else self.object_size(file_hash) for file_hash in (old_hash, new_hash)]
+        byte_delta = sizes[1] - sizes[0]
+        if old_hash is None or new_hash is None:
+            lines = self.count_lines(new_hash or old_hash)
+            if lines is None:
+                return [None, None, byte_delta]
+            return [lines, 0, byte_delta] if old_hash is None else [0, lines, byte_delta]
 
-        # Ensure we don't return the current commit, only previous ones
-        return commits[1] if commits else None
+        for file_hash in (old_hash, new_hash):
+            with self.open_object(file_hash) as f:
+                if b"\0" in f.read(8192):
+                    return [None, None, byte_delta]
+        if max(sizes) > self.STATS_MAX_DIFF_BYTES:
+            return [None, None, byte_delta]
 
+        contents = []
+        for file_hash in (old_hash, new_hash):
+            with self.open_object(file_hash) as f:
+                contents.append(f.read().decode("utf-8", "replace").splitlines())
+        old_lines, new_lines = contents
+        added = removed = 0
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+            if tag != "equal":
+                removed += i2 - i1
+                added += j2 - j1
+        return [added, removed, byte_delta]
 
 
 
 
 
 
-
-    def show_commit_summary(self, new_commit_id, new_files):
+    def commit_stats(self, hashes, base_tree, deleted=()):
         """
-        Display a summary of the changes between the last commit and the new commit.
+        Compute the change statistics stored in a log entry.
         Args:
-            new_commit_id (str): The identifier for the new commit.
-            new_files (list): A list of file names included in the new commit.
+            hashes (dict): Hashes of the files changed by the commit, keyed by path.
+            base_tree (dict): The parent commit's tree.
+            deleted (iterable): Paths removed by the commit.
         Returns:
-            None
+            dict: {"files": {path: [added, removed, byte_delta]}, "added": int, "removed": int, "bytes": int}
         """
+        files = {}
+        for path, file_hash in hashes.items():
+            if base_tree.get(path) != file_hash:
+                files[path] = self.change_stats(base_tree.get(path), file_hash)
+        for path in deleted:
+            if path in base_tree:
+                files[path] = self.change_stats(base_tree[path], None)
+        return {
+            "files": files,
+            "added": sum(stat[0] or 0 for stat in files.values()),
+            "removed": sum(stat[1] or 0 for stat in files.values()),
+            "bytes": sum(stat[2] for stat in files.values()),
+        }
 
-        last_commit_id = self.get_last_commit()
 
-        if not last_commit_id:
-            print(f"{len(new_files)} additions, 0 deletions.")
-            return
 
-        # Build the path to the last commit folder correctly
-        last_commit_folder = last_commit_id
 
-        new_files_set = set(new_files)
-        previous_files_set = set(os.listdir(last_commit_folder))
 
-        # Calculate additions and deletions
-        additions = new_files_set - previous_files_set
-        deletions = previous_files_set - new_files_set
 
-        # print(f"{len(additions)} additions, {len(deletions)} deletions.")
+    def backfill_stats(self):
+        """
+        Add change statistics to log entries that were written without them.
+        Entries that already have statistics are left as they are, so the command can be
+        interrupted and run again; the log is rewritten once at the end.
+        Returns:
+            int: The number of entries that got statistics.
+        """
+        with self.lock():
+            log_data = self.load_commit_log()
+            base = self.load_archive_base()
+            tree = dict(base["tree"]) if base else {}
+            filled = 0
+            for entry in log_data:
+                hashes = {file_info["file_name"]: file_info["hash"] for file_info in entry["files"]}
+                deleted = entry.get("deleted", [])
+                if "stats" not in entry:
+                    entry["stats"] = self.commit_stats(hashes, tree, deleted)
+                    filled += 1
+                tree.update(hashes)
+                for path in deleted:
+                    tree.pop(path, None)
+            if filled:
+                self.write_json_atomic(self.LOG_FILE, log_data)
+        print(f"{filled} ta commit er stat hisab korlam, mama.")
+        return filled
+
+
+
+
+
+
+    def show_commit_summary(self, entry, per_file=False):
+        """
+        Print the change statistics stored in a log entry.
+        Args:
+            entry (dict): The log entry.
+            per_file (bool): Also print one line per changed file.
+        """
+        stats = entry.get("stats")
+        if stats is None:
+            print(Fore.WHITE + "  (stat nai, 'mama itihas --backfill-stats' chalan)")
+            return
+        if per_file:
+            for path, (added, removed, byte_delta) in sorted(stats["files"].items()):
+                lines = "binary ba onek boro" if added is None else f"{Fore.GREEN}+{added} {Fore.RED}-{removed}"
+                print(Fore.WHITE + f"  {path} | {lines}{Fore.WHITE} ({byte_delta:+d} bytes)")
+        print(
+            Fore.WHITE + f"  {len(stats['files'])} files changed, "
+            f"{Fore.GREEN}{stats['added']} additions(+), {Fore.RED}{stats['removed']} deletions(-)"
+            f"{Fore.WHITE}, {stats['bytes']:+d} bytes" + Style.RESET_ALL
+        )
 
 
 
@@ -478,13 +1134,11 @@ class Repository:
 
     def clear_index(self):
         """
-        Clears the contents of the index file.
-        This method opens the index file in write mode and writes an empty string to it,
-        effectively clearing any existing content in the file.
+        Clears the staging area.
+        Every entry keeps its tracked hash; only the staged flag is dropped.
         """
 
-        with open(self.INDEX_FILE, 'w') as f:
-            f.write("")  # Empty the index
+        self.update_index({}, clear_staged=True)
         # print("Staging area cleared.")
 
 
@@ -495,156 +1149,2207 @@ class Repository:
 
 
 
-    @staticmethod
-    def hash_file(filename):
+    def hash_file(self, filename):
         """
-        Computes the SHA-256 hash of a file.
+        Computes the hash of a file with the repository's hash algorithm.
         Args:
             filename (str): The path to the file to be hashed.
         Returns:
-            str: The SHA-256 hash of the file in hexadecimal format.
+            str: The hash of the file in hexadecimal format.
         """
+        return file_digest(filename, self.hash_algorithm)
+
+
 
-        sha256 = hashlib.sha256()
-        with open(filename, 'rb') as f:
-            while chunk := f.read(8192):
-                sha256.update(chunk)
-        return sha256.hexdigest()
 
 
 
+    def load_format(self):
+        """
+        Read the repository format file written by `shuru`.
+        Repositories created before the file existed are SHA-256 repositories.
+        Raises:
+            Exception: If the repository was written by a newer mama or uses an unknown hash.
+        """
+        if not os.path.exists(self.FORMAT_FILE):
+            return {"version": self.FORMAT_VERSION, "hash": "sha256"}
+        with open(self.FORMAT_FILE, 'r') as f:
+            repo_format = json.load(f)
+        if repo_format.get("version", 0) > self.FORMAT_VERSION:
+            raise Exception(f"Repository format {repo_format['version']} ei mama bujhe na. Update korun.")
+        if repo_format.get("hash") not in HASH_ALGORITHMS:
+            raise Exception(f"Hash '{repo_format.get('hash')}' chini na mama.")
+        return repo_format
 
 
 
 
 
 
-    def get_last_commit(self):
+    def migrate_hash(self, algorithm):
         """
-        Retrieve the most recent commit from the commits directory.
-        This method sorts the list of commit files in the commits directory in 
-        descending order and returns the path to the latest commit file. If the 
-        commits directory is empty, it returns None.
+        Switch the repository to another content hash.
+
+        Every object is rehashed and linked under its new name, then the log, the index
+        and the archive base of this repository and of every worktree sharing its object
+        store, and finally the format file, are rewritten with the new hashes, and the
+        old names are removed. Hashes that are already in the new form map to themselves, so an
+        interrupted migration can simply be run again. Commit IDs are identifiers and
+        stay as they are; the trigram index, the diff cache and any fsck checkpoint,
+        which are keyed by object hash, are dropped.
+        Args:
+            algorithm (str): One of HASH_ALGORITHMS.
         Returns:
-            str or None: The path to the most recent commit file, or None if the 
-            commits directory is empty.
+            int: The number of objects rehashed.
+        """
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Hash '{algorithm}' chini na mama. Choose from: {', '.join(HASH_ALGORITHMS)}")
+        if algorithm == self.hash_algorithm:
+            print(f"Repository already {algorithm} use kore, mama.")
+            return 0
+        if self.common_dir != ".mama":
+            print("Worktree theke na, main repository theke migrate korun.")
+            return 0
+        if self.has_cold_pack:
+            print("Archive kora history ache; cold pack rehash kora jay na, mama.")
+            return 0
+
+        with self.lock():
+            mapping = {}
+            for root, _, files in os.walk(self.OBJECTS_DIR):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    old_hash = os.path.basename(root) + name
+                    mapping[old_hash] = file_digest(path, algorithm)
+                    target = os.path.join(self.OBJECTS_DIR, mapping[old_hash][:2], mapping[old_hash][2:])
+                    if not os.path.exists(target):
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        os.link(path, target)
+
+            self.remap_hashes(mapping)
+            cwd = os.getcwd()
+            for worktree in self.list_worktrees():
+                os.chdir(worktree["path"])
+                try:
+                    Repository().remap_hashes(mapping)
+                finally:
+                    os.chdir(cwd)
+
+            repo_format = self.load_format()
+            repo_format["hash"] = algorithm
+            self.write_json_atomic(self.FORMAT_FILE, repo_format)
+            self.hash_algorithm = algorithm
+
+            new_hashes = set(mapping.values())
+            for old_hash in mapping:
+                if old_hash not in new_hashes:
+                    os.remove(self.object_path(old_hash))
+            for derived in (self.TRIGRAM_INDEX, self.DIFF_CACHE):
+                if os.path.exists(derived):
+                    os.remove(derived)
+
+        print(f"{len(mapping)} ta object {algorithm} e rehash korlam, mama.")
+        return len(mapping)
+
+
+
+
+
+
+
+
+
+    def remap_hashes(self, mapping):
+        """
+        Replace object hashes in this working directory's log, index and archive base,
+        and drop its fsck checkpoint, which is keyed by the old hashes.
+        Args:
+            mapping (dict): New hashes keyed by old hash; hashes not in it are kept.
         """
+        with self.lock():
+            log_data = self.load_commit_log()
+            for entry in log_data:
+                for file_info in entry["files"]:
+                    file_info["hash"] = mapping.get(file_info["hash"], file_info["hash"])
+            self.write_json_atomic(self.LOG_FILE, log_data)
 
-        commits = sorted(os.listdir(self.COMMITS_DIR), reverse=True)
-        return os.path.join(self.COMMITS_DIR, commits[0]) if commits else None
+            with self.open_index() as index:
+                updates = {entry.path: entry._replace(hash=mapping.get(entry.hash, entry.hash)) for entry in index}
+            self.update_index(updates)
 
+            base = self.load_archive_base()
+            if base:
+                base["tree"] = {path: mapping.get(file_hash, file_hash) for path, file_hash in base["tree"].items()}
+                self.write_json_atomic(self.ARCHIVE_BASE, base)
 
+            # An fsck checkpoint's cursor and verified list are old hashes; resuming from
+            # it would skip or misreport objects under their new names.
+            if os.path.exists(self.FSCK_CHECKPOINT):
+                os.remove(self.FSCK_CHECKPOINT)
 
 
 
 
 
 
-    def show_log(self):
+
+
+
+    def get_last_commit(self):
         """
-        Displays the commit history from log.json in a colorful and clean format.
-        If there are no commits, it will notify the user.
+        Retrieve the most recent commit.
+        The most recent commit is the current HEAD, not the largest commit ID.
+        Returns:
+            str or None: The ID of the most recent commit, or None if there are no commits.
         """
-        log_data = self.load_commit_log()
 
-        if not log_data:
-            print(Fore.RED + "Kono commit nai mama. Kichu commit korun agey!")
-            return
-
-        print(Fore.CYAN + "\n========== Mama Itihas ==========\n")
-        
-        for entry in log_data:
-            print(Fore.GREEN + f"Commit ID   : {Fore.WHITE}{entry['commit_id']}")
-            print(Fore.GREEN + f"Message     : {Fore.WHITE}{entry['message']}")
-            print(Fore.GREEN + f"Date & Time : {Fore.WHITE}{entry['timestamp']}")
-            print(Fore.YELLOW + "-" * 30)
+        return self.get_head()
 
-        print(Style.RESET_ALL + Fore.WHITE + "\nEi hoilo apnar repository er itihas.\n")
 
 
 
 
 
-    def show_commit_details(self, commit_id):
+    def get_commit_ids(self):
         """
-        Displays detailed information for a specific commit based on the given ID.
+        List commit IDs in history order, oldest first.
+        Commits are appended to log.json as they are made, so the log order is the
+        parent chain; IDs are content hashes and say nothing about order.
+        Returns:
+            list: The commit IDs from the first commit to HEAD.
         """
-        log_data = self.load_commit_log()
+        return [entry["commit_id"] for entry in self.load_commit_log()]
 
-        # Find the specific commit
-        commit = next((entry for entry in log_data if entry["commit_id"] == commit_id), None)
-        if not commit:
-            print(Fore.RED + f"Commit ID '{commit_id}' pawa jai nai!")
-            return
-
-        # Display the details of the specific commit
-        print(Fore.CYAN + "\n========== Commit Details ==========\n")
-        print(Fore.GREEN + f"Commit ID   : {Fore.WHITE}{commit['commit_id']}")
-        print(Fore.GREEN + f"Message     : {Fore.WHITE}{commit['message']}")
-        print(Fore.GREEN + f"Date & Time : {Fore.WHITE}{commit['timestamp']}")
-        print(Fore.GREEN + "Files:")
-        for file in commit["files"]:
-            print(Fore.WHITE + f"  - {file['file_name']}")
-        print(Style.RESET_ALL)
 
 
 
 
 
-    def status(self):
+    def get_head(self):
         """
-        Displays the status of the repository by checking the INDEX_FILE.
-        If the INDEX_FILE does not exist or is empty, it prints a message indicating that there are no staged files.
-        Otherwise, it prints the list of staged files and the total count of these files.
-        Messages are printed in Bengali language.
+        Get the ID of the current HEAD commit.
+        Falls back to the last log entry for repositories made before HEAD was written.
         Returns:
-            None
+            str or None: The HEAD commit ID, or None if there are no commits.
         """
-        
-        if not os.path.exists(self.INDEX_FILE):
-            print("Age kichu rakhte bolen nai to mama")
-            return
+        if os.path.exists(self.HEAD_FILE):
+            with open(self.HEAD_FILE, 'r') as f:
+                head = f.read().strip()
+            if head:
+                return head
+        commit_ids = self.get_commit_ids()
+        return commit_ids[-1] if commit_ids else None
 
-        with open(self.INDEX_FILE, 'r') as f:
-            staged_files = f.read().splitlines()
 
-        if not staged_files:
-            print("Age kichu rakhte bolen nai to mama")
-            return
 
-        print("Ei hoilo apnar repository mama ki obostha:")
-        for file in staged_files:
-            print(f"  {file} (rakha ache)")
-        print(f"Total {len(staged_files)} ta file rakha ache mama repository te.")
 
 
 
+    def write_head(self, commit_id):
+        """Point HEAD at the given commit, atomically."""
+        tmp_path = f"{self.HEAD_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(commit_id or "")
+        os.replace(tmp_path, self.HEAD_FILE)
 
 
 
 
 
 
-    def rollback(self, commit_id):
-        """Rollback to a specific commit by restoring files and removing commit history."""
-        if not os.path.exists(os.path.join(self.COMMITS_DIR, commit_id)):
-            print(f"Commit {commit_id} not found.")
-            return
+    def resolve_commit(self, ref):
+        """
+        Resolve a full or abbreviated commit ID.
+        Args:
+            ref (str): A commit ID or a unique prefix of one.
+        Returns:
+            str or None: The full commit ID, or None (with a message) if it is unknown or ambiguous.
+        """
+        commit_ids = self.get_commit_ids()
+        if ref in commit_ids:
+            return ref
 
-        # Step 1: Delete files created after the target commit
-        self.delete_files_after_commit(commit_id)
+        matches = [commit_id for commit_id in commit_ids if commit_id.startswith(ref)]
+        if not matches and self.has_cold_pack:
+            with closing_connection(self.COLD_INDEX) as db:
+                matches = [row[0] for row in db.execute(
+                    "SELECT commit_id FROM commits WHERE commit_id >= ? AND commit_id < ?", (ref, ref + "g")
+                )]
+        if len(matches) == 1:
+            return matches[0]
+        if not matches:
+            print(Fore.RED + f"Commit ID '{ref}' pawa jai nai!" + Style.RESET_ALL)
+        else:
+            print(Fore.RED + f"'{ref}' diye {len(matches)} ta commit mile, aro lamba ID den mama:" + Style.RESET_ALL)
+            for commit_id in matches:
+                print(f"  {commit_id}")
+        return None
 
-        # Step 2: Restore files to their correct paths from relevant commits
-        self.restore_files_to_commit(commit_id)
 
-        # Step 3: Verify restored files
-        self.verify_restored_files()
 
-        # Step 4: Delete commit history after the target commit
-        self.delete_commit_history_after(commit_id)
 
-        # Step 5: Log rollback information
-        self.log_rollback(commit_id)
+
+
+    def object_path(self, file_hash):
+        """
+        Path of the loose object with the given hash, fanned out by its first two characters.
+        An object that was archived into the cold pack is not there; readers go through
+        open_object or object_locations instead.
+        """
+        return os.path.join(self.OBJECTS_DIR, file_hash[:2], file_hash[2:])
+
+
+
+
+
+
+    def object_locations(self, hashes):
+        """
+        Find where stored objects can be read, without unpacking anything.
+        Args:
+            hashes (list): Object hashes.
+        Returns:
+            list: For each hash, its loose path, or (pack path, offset, length) for an object
+            that only exists in the cold pack. A missing object gets its loose path, so
+            reading it fails like reading any missing file.
+        """
+        locations = [self.object_path(file_hash) for file_hash in hashes]
+        missing = [i for i, path in enumerate(locations) if not os.path.exists(path)]
+        if missing and self.has_cold_pack:
+            with closing_connection(self.COLD_INDEX) as db:
+                for i in missing:
+                    row = db.execute("SELECT offset, length FROM objects WHERE hash = ?", (hashes[i],)).fetchone()
+                    if row is not None:
+                        locations[i] = (self.COLD_PACK, row[0], row[1])
+        return locations
+
+
+
+
+
+
+    def open_object(self, file_hash):
+        """Open a stored object for reading in binary mode, streaming it from the cold pack if it was archived."""
+        return open_stored(self.object_locations([file_hash])[0])
+
+
+
+
+
+
+    def object_size(self, file_hash):
+        """Size in bytes of a stored object's contents, loose or archived."""
+        path = self.object_path(file_hash)
+        if self.has_cold_pack and not os.path.exists(path):
+            with closing_connection(self.COLD_INDEX) as db:
+                row = db.execute("SELECT size FROM objects WHERE hash = ?", (file_hash,)).fetchone()
+            if row is not None:
+                return row[0]
+        return os.path.getsize(path)
+
+
+
+
+
+
+    def copy_object(self, file_hash, destination):
+        """Write a stored object's contents to `destination`, decompressing it from the cold pack if it was archived."""
+        location = self.object_locations([file_hash])[0]
+        if isinstance(location, str):
+            shutil.copyfile(location, destination)
+            return
+        with open_stored(location) as src, open(destination, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+
+
+
+
+    def store_object(self, filename, file_hash):
+        """
+        Copy a file into the object store unless an object with that hash is already stored.
+        The copy goes to a temporary name and is renamed into place, so a stored object
+        is always complete.
+        Args:
+            filename (str): The file to store.
+            file_hash (str): The hash of the file's contents.
+        Returns:
+            bool: True if new content was written, False if it was already stored.
+        """
+        target = self.object_path(file_hash)
+        if os.path.exists(target):
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        shutil.copy2(filename, tmp_path)
+        os.replace(tmp_path, target)
+        return True
+
+
+
+
+
+
+    def store_objects_checked(self, files):
+        """
+        Copy files into the object store, hashing them on the way.
+        Every file is read once, through the copy pipeline, into a temporary name next to
+        its object. Each object is renamed into place as soon as its copy finishes and its
+        hash checks out, so a run that is interrupted keeps every object it completed.
+        A file whose contents no longer have the expected hash is discarded, so a file
+        changed since it was staged is never stored under a wrong name.
+        Args:
+            files (dict): Expected hashes keyed by path.
+        Returns:
+            list: Paths that could not be stored because their contents did not match or could not be read.
+        """
+        jobs, targets, duplicates = [], [], []
+        claimed = set()
+        for filename, file_hash in files.items():
+            if file_hash in claimed:
+                duplicates.append(filename)  # Same content as a file already being stored
+                continue
+            claimed.add(file_hash)
+            target = self.object_path(file_hash)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            jobs.append((filename, f"{target}.{os.getpid()}.tmp"))
+            targets.append((filename, file_hash, target))
+
+        failed = set()
+
+        def publish(k, digest):
+            _, file_hash, target = targets[k]
+            tmp_path = jobs[k][1]
+            try:
+                if digest == file_hash:
+                    os.replace(tmp_path, target)
+                    return
+                if not isinstance(digest, OSError):
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+            failed.add(k)
+
+        self.copy_pipeline().run(jobs, done=publish)
+        mismatched = [targets[k][0] for k in sorted(failed)]
+        for filename in duplicates:
+            try:
+                if self.hash_file(filename) != files[filename]:
+                    mismatched.append(filename)
+            except OSError:
+                mismatched.append(filename)
+        return mismatched
+
+
+
+
+
+
+    def copy_pipeline(self):
+        """Build the read/hash/write copy pipeline from the repository config."""
+        config = self.load_config()
+        return CopyPipeline(
+            HASH_ALGORITHMS[self.hash_algorithm],
+            readers=config["pipeline.readers"],
+            hashers=config["pipeline.hashers"],
+            writers=config["pipeline.writers"],
+            depth=config["pipeline.depth"],
+        )
+
+
+
+
+
+
+    def load_config(self):
+        """Return the repository settings from CONFIG_FILE, with DEFAULT_CONFIG for anything not set."""
+        config = dict(self.DEFAULT_CONFIG)
+        if os.path.exists(self.CONFIG_FILE):
+            with open(self.CONFIG_FILE, 'r') as f:
+                config.update(json.load(f))
+        return config
+
+
+
+
+
+
+    def set_config(self, key, value):
+        """
+        Change one repository setting.
+        Args:
+            key (str): One of the DEFAULT_CONFIG keys.
+            value (str): The new value; settings are non-negative integers.
+        Raises:
+            ValueError: If the key is unknown or the value is not a non-negative integer.
+        """
+        if key not in self.DEFAULT_CONFIG:
+            raise ValueError(f"Config '{key}' chini na mama. Choose from: {', '.join(self.DEFAULT_CONFIG)}")
+        if not value.isdigit():
+            raise ValueError(f"{key} er value ekta shonkha hote hobe.")
+        with self.lock():
+            config = {}
+            if os.path.exists(self.CONFIG_FILE):
+                with open(self.CONFIG_FILE, 'r') as f:
+                    config = json.load(f)
+            config[key] = int(value)
+            self.write_json_atomic(self.CONFIG_FILE, config)
+
+
+
+
+
+
+    def finish_pending_commit(self):
+        """
+        Deal with commits whose process died before finishing. Called with the lock held.
+        If the log entry was already written, only HEAD and the staged flags may be
+        behind, so they are brought up to date and the marker is dropped. Otherwise the
+        marker stays, and the next `rakho` resumes storing objects where the last one
+        stopped. Markers of commits that are still running are left alone.
+        """
+        commit_ids = None
+        for path, pending in self.interrupted_commits():
+            commit_id = pending.get("commit_id")
+            if commit_id is None:
+                continue
+            if commit_ids is None:
+                commit_ids = self.get_commit_ids()
+            if commit_id in commit_ids:
+                if commit_ids[-1] == commit_id:
+                    self.write_head(commit_id)
+                self.unstage(pending["hashes"])
+                os.remove(path)
+            else:
+                # Interrupted just before publishing: every object is stored
+                self.write_json_atomic(path, {"pid": pending["pid"], "message": pending["message"]})
+
+
+
+
+
+
+    def recover_object_temps(self, staged):
+        """
+        Deal with the temporary object files that processes which died left in the object store.
+
+        A temporary copy is named after its object and the pid of its writer. One whose
+        size matches the staged version of that object is hashed and renamed into place
+        if it checks out, so its copy is not repeated; any other, such as a copy cut off
+        part way, is removed. Files of writers that are still running are left alone.
+        Args:
+            staged (dict): Index entries of the staged files, keyed by path.
+        Returns:
+            int: The number of objects recovered.
+        """
+        if not os.path.isdir(self.OBJECTS_DIR):
+            return 0
+        sizes = {entry.hash: entry.size for entry in staged.values()}
+        recovered = 0
+        for directory in [self.OBJECTS_DIR] + [item.path for item in os.scandir(self.OBJECTS_DIR) if item.is_dir()]:
+            for item in os.scandir(directory):
+                parts = item.name.split(".")
+                if len(parts) != 3 or parts[2] != "tmp" or not parts[1].isdigit() or not item.is_file():
+                    continue
+                pid = int(parts[1])
+                if pid == os.getpid() or pid_alive(pid):
+                    continue
+                file_hash = os.path.basename(directory) + parts[0]
+                target = os.path.join(directory, parts[0])
+                try:
+                    if (directory != self.OBJECTS_DIR and not os.path.exists(target)
+                            and sizes.get(file_hash) == item.stat().st_size
+                            and file_digest(item.path, self.hash_algorithm) == file_hash):
+                        os.replace(item.path, target)
+                        recovered += 1
+                    else:
+                        os.remove(item.path)
+                except FileNotFoundError:
+                    pass  # Dealt with by another process resuming at the same time
+        return recovered
+
+
+
+
+
+
+    def pending_marker(self):
+        """Path of this process's unfinished-commit marker."""
+        return os.path.join(self.PENDING_DIR, f"{os.getpid()}.json")
+
+
+
+
+
+
+    def interrupted_commits(self):
+        """
+        Markers in PENDING_DIR whose process is no longer running.
+        Returns:
+            list: (path, marker contents) pairs.
+        """
+        interrupted = []
+        if not os.path.isdir(self.PENDING_DIR):
+            return interrupted
+        for name in os.listdir(self.PENDING_DIR):
+            if not name.endswith(".json"):
+                continue  # A marker being written
+            path = os.path.join(self.PENDING_DIR, name)
+            try:
+                with open(path, 'r') as f:
+                    pending = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue  # Finished or replaced meanwhile
+            if pending.get("pid") == os.getpid() or pid_alive(pending.get("pid", 0)):
+                continue
+            interrupted.append((path, pending))
+        return interrupted
+
+
+
+
+
+
+    def store_object_stream(self, fileobj):
+        """
+        Hash a stream and store it in one pass.
+        Args:
+            fileobj: A readable binary stream.
+        Returns:
+            str: The hash of the stored contents.
+        """
+        os.makedirs(self.OBJECTS_DIR, exist_ok=True)
+        tmp_path = os.path.join(self.OBJECTS_DIR, f"incoming.{os.getpid()}.tmp")
+        digest = HASH_ALGORITHMS[self.hash_algorithm]()
+        with open(tmp_path, 'wb') as f:
+            while chunk := fileobj.read(1024 * 1024):
+                digest.update(chunk)
+                f.write(chunk)
+        file_hash = digest.hexdigest()
+        target = self.object_path(file_hash)
+        if os.path.exists(target):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+        return file_hash
+
+
+
+
+
+
+    def migrate_legacy_commits(self):
+        """
+        Move the contents of old per-commit folders into the object store.
+        Old commits kept a flat copy of each file under its basename; a copy whose hash
+        no longer matches the log (two files with the same basename) is reported and skipped.
+        """
+        os.makedirs(self.OBJECTS_DIR, exist_ok=True)
+        for entry in self.load_commit_log():
+            commit_folder = os.path.join(self.COMMITS_DIR, entry["commit_id"])
+            if not os.path.isdir(commit_folder):
+                continue
+            for file_info in entry["files"]:
+                legacy_path = os.path.join(commit_folder, os.path.basename(file_info["file_name"]))
+                if os.path.exists(self.object_path(file_info["hash"])) or not os.path.exists(legacy_path):
+                    continue
+                if self.hash_file(legacy_path) != file_info["hash"]:
+                    print(f"{entry['commit_id']} e {file_info['file_name']} er copy nosto, mama. Skipping.")
+                    continue
+                self.store_object(legacy_path, file_info["hash"])
+            shutil.rmtree(commit_folder)
+
+
+
+
+
+
+    def get_commit_entry(self, commit_id):
+        """Return the log entry of a commit, or None if it is neither in the log nor archived."""
+        entry = next((entry for entry in self.load_commit_log() if entry["commit_id"] == commit_id), None)
+        if entry is None and self.has_cold_pack:
+            entry = self.cold_commit_entry(commit_id)
+        return entry
+
+
+
+
+
+
+    def get_commit_tree(self, commit_id):
+        """
+        Build the full file tree of a commit by replaying the log up to it.
+        Replay starts from the archive base when history has been archived; an archived
+        commit is rebuilt by replaying the cold entries instead.
+        Args:
+            commit_id (str): The commit to build the tree for.
+        Returns:
+            dict: Hashes of every file in the commit, keyed by path.
+        """
+        log_data = self.load_commit_log()
+        base = self.load_archive_base()
+        if base and not any(entry["commit_id"] == commit_id for entry in log_data):
+            log_data = self.cold_commit_entries(commit_id)
+            base = None
+
+        tree = dict(base["tree"]) if base else {}
+        for entry in log_data:
+            for file_info in entry["files"]:
+                tree[file_info["file_name"]] = file_info["hash"]
+            for file_name in entry.get("deleted", []):
+                tree.pop(file_name, None)
+            if entry["commit_id"] == commit_id:
+                break
+        return tree
+
+
+
+
+
+
+    def load_archive_base(self):
+        """
+        Return the archive base, {"commit_id", "tree"}, or None if nothing is archived.
+        The hot log starts right after the base commit, and its tree is where replay begins.
+        """
+        if not os.path.exists(self.ARCHIVE_BASE):
+            return None
+        with open(self.ARCHIVE_BASE, 'r') as f:
+            return json.load(f)
+
+
+
+
+
+
+    def archive(self, cutoff):
+        """
+        Move every commit older than `cutoff` into the cold pack.
+
+        The cold pack is a single append-only file of zlib-compressed records, indexed
+        by COLD_INDEX (SQLite): archived log entries by commit ID, and the objects that
+        no recent commit, the working tree or the index still uses by hash. The log keeps
+        only the recent commits, starting from an archive base that holds the full tree
+        of the newest archived commit, so hot operations no longer depend on the age of
+        the repository. Archived commits stay readable: their entries and trees come from
+        the pack, and their objects are streamed out of it without being unpacked.
+
+        The pack and its index are written first and the log is replaced last, so an
+        interrupted archive leaves history intact and can simply be run again.
+        Args:
+            cutoff (str): A full or abbreviated commit ID; all older commits are archived.
+        Returns:
+            int: The number of commits archived.
+        """
+        cutoff = self.resolve_commit(cutoff)
+        if not cutoff:
+            return 0
+        if self.common_dir != ".mama":
+            print("Worktree theke na, main repository theke archive korun.")
+            return 0
+
+        with self.lock():
+            log_data = self.load_commit_log()
+            ids = [entry["commit_id"] for entry in log_data]
+            if cutoff not in ids:
+                print("Ei commit already archive e ache, mama.")
+                return 0
+            split = ids.index(cutoff)
+            if split == 0:
+                print("Er age archive korar moto kono commit nai, mama.")
+                return 0
+            cold, hot = log_data[:split], log_data[split:]
+            old_base = self.load_archive_base()
+            base = {"commit_id": cold[-1]["commit_id"], "tree": self.get_commit_tree(cold[-1]["commit_id"])}
+
+            keep = set(base["tree"].values())
+            keep.update(file_info["hash"] for entry in hot for file_info in entry["files"])
+            with self.open_index() as index:
+                keep.update(entry.hash for entry in index)
+            candidates = {file_info["hash"] for entry in cold for file_info in entry["files"]}
+            if old_base:
+                candidates.update(old_base["tree"].values())
+            candidates -= keep
+
+            packed = []
+            with closing_connection(self.COLD_INDEX) as db, open(self.COLD_PACK, 'ab') as pack:
+                db.execute("CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, offset INTEGER, length INTEGER, size INTEGER)")
+                db.execute("CREATE TABLE IF NOT EXISTS commits (seq INTEGER PRIMARY KEY, commit_id TEXT UNIQUE, offset INTEGER, length INTEGER)")
+                known = {row[0] for row in db.execute("SELECT hash FROM objects")}
+                for file_hash in sorted(candidates):
+                    loose = os.path.join(self.OBJECTS_DIR, file_hash[:2], file_hash[2:])
+                    if file_hash in known or not os.path.exists(loose):
+                        continue
+                    offset = pack.tell()
+                    compressor = zlib.compressobj()
+                    with open(loose, 'rb') as f:
+                        while chunk := f.read(1024 * 1024):
+                            pack.write(compressor.compress(chunk))
+                    pack.write(compressor.flush())
+                    db.execute("INSERT INTO objects (hash, offset, length, size) VALUES (?, ?, ?, ?)",
+                               (file_hash, offset, pack.tell() - offset, os.path.getsize(loose)))
+                    packed.append(loose)
+                for entry in cold:
+                    record = zlib.compress(json.dumps(entry).encode("utf-8"))
+                    offset = pack.tell()
+                    pack.write(record)
+                    db.execute("INSERT OR IGNORE INTO commits (commit_id, offset, length) VALUES (?, ?, ?)",
+                               (entry["commit_id"], offset, len(record)))
+                pack.flush()
+                os.fsync(pack.fileno())
+                db.commit()
+
+            self.write_json_atomic(self.ARCHIVE_BASE, base)
+            self.write_json_atomic(self.LOG_FILE, hot)
+            self.has_cold_pack = True
+            for loose in packed:
+                os.remove(loose)
+            self.rebuild_path_index()
+
+        print(f"{len(cold)} ta commit ar {len(packed)} ta object archive e pathailam, mama.")
+        return len(cold)
+
+
+
+
+
+
+    def cold_commit_entry(self, commit_id):
+        """Read one archived log entry from the cold pack, or return None if it is not archived."""
+        with closing_connection(self.COLD_INDEX) as db:
+            row = db.execute("SELECT offset, length FROM commits WHERE commit_id = ?", (commit_id,)).fetchone()
+        if row is None:
+            return None
+        with open(self.COLD_PACK, 'rb') as pack:
+            pack.seek(row[0])
+            return json.loads(zlib.decompress(pack.read(row[1])))
+
+
+
+
+
+
+    def cold_commit_entries(self, commit_id=None):
+        """Read the archived log entries in history order, up to and including `commit_id`, or all of them."""
+        entries = []
+        with closing_connection(self.COLD_INDEX) as db, open(self.COLD_PACK, 'rb') as pack:
+            for offset, length in db.execute("SELECT offset, length FROM commits ORDER BY seq"):
+                pack.seek(offset)
+                entries.append(json.loads(zlib.decompress(pack.read(length))))
+                if entries[-1]["commit_id"] == commit_id:
+                    break
+        return entries
+
+
+
+
+
+
+    def cold_entries_before(self, log_data):
+        """
+        The archived entries that precede this working directory's log, in history order.
+
+        A worktree keeps the log it was created with, which may already hold commits the
+        main repository archived later, and does not hold the main repository's commits
+        made after the worktree was created. So only cold entries up to the parent of
+        the log's first commit count, and none whose commit ID is also in the log.
+        Args:
+            log_data (list): The entries of log.json.
+        Returns:
+            list: Log entries read from the cold pack.
+        """
+        if not self.has_cold_pack or (log_data and log_data[0].get("parent") is None):
+            return []
+        hot = {entry["commit_id"] for entry in log_data}
+        parent = log_data[0]["parent"] if log_data else None
+        return [entry for entry in self.cold_commit_entries(parent) if entry["commit_id"] not in hot]
+
+
+
+
+
+
+    def history_entries(self):
+        """
+        Every log entry in history order: the archived entries from the cold pack, then log.json.
+        Walks over the whole history use this; everything else only needs the hot log.
+        """
+        log_data = self.load_commit_log()
+        return self.cold_entries_before(log_data) + log_data
+
+
+
+
+
+
+    def import_snapshots(self, sources, message=None):
+        """
+        Import an ordered list of directories or tarballs as consecutive commits.
+
+        Everything happens in one process: each file is hashed once per inode and
+        modification time, contents already in the object store are not copied again,
+        and every snapshot is diffed against the previous one in memory. The log, HEAD
+        and the index are written once, at the end, under the lock, and the working
+        directory is brought to the last snapshot. Files whose working copy has changes
+        that were never committed stop the import before anything is published.
+        Args:
+            sources (list): Directories or tar archives (optionally compressed), oldest first.
+            message (str): Commit message; defaults to "Import <source>".
+        Returns:
+            list: The IDs of the new commits.
+        Raises:
+            ValueError: If a tarball member would land outside the repository, or another
+                commit was made while the import ran.
+        """
+        if self.get_staged_files():
+            print("Age rakha file gula commit koren, tarpor import korben mama.")
+            return []
+
+        start_head = self.get_head()
+        parent = start_head
+        start_tree = previous_tree = self.get_commit_tree(parent) if parent else {}
+        hash_cache = {}
+        new_entries = []
+
+        for source in sources:
+            if os.path.isdir(source):
+                tree = self.snapshot_directory(source, hash_cache)
+            elif tarfile.is_tarfile(source):
+                tree = self.snapshot_tarball(source)
+            else:
+                print(f"Ish: {source} folder ba tarball na. Skipping.")
+                continue
+
+            changed = {path: file_hash for path, file_hash in tree.items() if previous_tree.get(path) != file_hash}
+            deleted = set(previous_tree) - set(tree)
+            timestamp_ns = time.time_ns()
+            commit_message = message or f"Import {source}"
+            commit_id = self.make_commit_id(changed, parent, commit_message, timestamp_ns)
+            new_entries.append(self.make_log_entry(commit_id, commit_message, changed, parent, timestamp_ns, deleted))
+            print(f"Rekhe disi mama {commit_id[:self.SHORT_ID_LENGTH]} ({source}: {len(changed)} changed, {len(deleted)} deleted).")
+
+            parent = commit_id
+            previous_tree = tree
+
+        if not new_entries:
+            return []
+
+        changed = {path: file_hash for path, file_hash in previous_tree.items() if start_tree.get(path) != file_hash}
+        deleted = set(start_tree) - set(previous_tree)
+        conflicts = self.locally_changed(sorted(set(changed) | deleted), start_tree, previous_tree)
+        if conflicts:
+            raise ValueError("Ei file gulay local change ache, age commit koren mama:\n  - " + "\n  - ".join(conflicts))
+
+        with self.lock():
+            if self.get_head() != start_head:
+                raise ValueError("Import cholar somoy onno keu commit korse. Abar try koren mama.")
+            log_data = self.load_commit_log()
+            first_seq = len(log_data)
+            log_data.extend(new_entries)
+            self.write_json_atomic(self.LOG_FILE, log_data)
+            self.write_head(parent)
+            with closing_connection(self.PATH_INDEX) as db:
+                self.record_path_history(db, new_entries, first_seq, parent)
+
+            # Bring the working directory and the index to the last snapshot, with nothing staged
+            self.materialize_tree(changed)
+            for path in deleted:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.update_index({}, removed=deleted)
+
+        return [entry["commit_id"] for entry in new_entries]
+
+
+
+
+
+
+    def snapshot_directory(self, source, hash_cache):
+        """
+        Store every file under a directory and return its tree.
+        Args:
+            source (str): The snapshot directory.
+            hash_cache (dict): Hashes keyed by (device, inode, size, mtime_ns), shared across snapshots.
+        Returns:
+            dict: Hashes of the snapshot's files, keyed by path relative to `source`.
+        """
+        tree = {}
+        for root, dirs, files in os.walk(source):
+            dirs[:] = [d for d in dirs if d != ".mama"]
+            for file in files:
+                path = os.path.join(root, file)
+                st = os.stat(path)
+                key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+                file_hash = hash_cache.get(key)
+                if file_hash is None:
+                    file_hash = hash_cache[key] = self.hash_file(path)
+                self.store_object(path, file_hash)
+                tree[os.path.relpath(path, source)] = file_hash
+        return tree
+
+
+
+
+
+
+    def snapshot_tarball(self, source):
+        """
+        Stream every regular file of a tar archive into the object store and return its tree.
+        Args:
+            source (str): The tar archive; gzip, bzip2 and xz compression are detected.
+        Returns:
+            dict: Hashes of the archive's files, keyed by member path.
+        Raises:
+            ValueError: If a member is absolute or would land outside the repository.
+        """
+        tree = {}
+        with tarfile.open(source, "r|*") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                path = check_tree_path(member.name)
+                tree[path] = self.store_object_stream(archive.extractfile(member))
+        return tree
+
+
+
+
+
+
+
+    def import_fast_export(self, stream):
+        """
+        Build mama history from a `git fast-export` stream.
+
+        Blobs are hashed and written straight into the object store as they arrive,
+        marks are kept in a disk-backed table, and log entries are streamed to a
+        temporary log file, so memory stays bounded by the size of one tree rather
+        than by the length of the history. The stream must be linear, as produced by
+        `git fast-export --first-parent`; the repository must have no commits yet.
+        Args:
+            stream: A binary stream of fast-export commands.
+        Returns:
+            dict: The tree of the last imported commit, keyed by path.
+        Raises:
+            ValueError: If the repository already has history, the stream is not linear or
+                malformed, or a path would land outside the working directory.
+        """
+        if self.get_head():
+            raise ValueError("Git itihas shudhu khali repository te import kora jay, mama.")
+
+        marks = MarkTable()
+        reader = FastExportReader(stream, self.store_object_stream, marks)
+        tree = {}
+        parent = None
+        parent_mark = None
+        count = 0
+        tmp_log = f"{self.LOG_FILE}.{os.getpid()}.tmp"
+
+        try:
+            with open(tmp_log, 'w') as log_file, closing_connection(self.PATH_INDEX) as path_db:
+                log_file.write("[")
+                for commit in reader.commits():
+                    if commit.parent is not None and count and commit.parent != f":{parent_mark}":
+                        raise ValueError("Stream ta linear na. 'git fast-export --first-parent' diye banan, mama.")
+
+                    changed, deleted = self.apply_fast_export_changes(tree, commit.changes)
+                    for path in changed:
+                        check_tree_path(path)
+                    commit_id = self.make_commit_id(changed, parent, commit.message, commit.timestamp_ns)
+                    entry = self.make_log_entry(commit_id, commit.message, changed, parent, commit.timestamp_ns, deleted)
+                    log_file.write(("," if count else "") + "\n" + json.dumps(entry, indent=4))
+                    self.record_path_history(path_db, [entry], count, commit=False)
+
+                    if commit.mark is not None:
+                        marks[commit.mark] = commit_id
+                    parent, parent_mark = commit_id, commit.mark
+                    count += 1
+                    if count % 1000 == 0:
+                        print(f"{count} ta commit import holo...")
+                log_file.write("\n]\n")
+                log_file.flush()
+                os.fsync(log_file.fileno())
+
+                with self.lock():
+                    os.replace(tmp_log, self.LOG_FILE)
+                    self.write_head(parent)
+                    self.record_path_history(path_db, [], count, parent)
+        finally:
+            marks.close()
+            if os.path.exists(tmp_log):
+                os.remove(tmp_log)
+
+        print(f"{count} ta commit import korsi, mama.")
+        return tree
+
+
+
+
+
+
+    @staticmethod
+    def apply_fast_export_changes(tree, changes):
+        """
+        Apply one commit's fast-export file changes to a tree in place.
+        Args:
+            tree (dict): The parent tree, keyed by path; updated to the commit's tree.
+            changes (list): Change tuples from FastExportReader.
+        Returns:
+            tuple: (changed, deleted) - hashes of added or modified paths, and removed paths.
+        """
+        changed = {}
+        deleted = set()
+        directories = None  # Paths below each directory, built on the first directory-wide change
+
+        def ancestors(path):
+            parent = os.path.dirname(path)
+            while parent:
+                yield parent
+                parent = os.path.dirname(parent)
+
+        def below(path):
+            nonlocal directories
+            if path in tree:
+                return [path]
+            if directories is None:
+                directories = {}
+                for existing in tree:
+                    for parent in ancestors(existing):
+                        directories.setdefault(parent, set()).add(existing)
+            return list(directories.get(path, ()))
+
+        def remove(path):
+            for existing in below(path):
+                del tree[existing]
+                changed.pop(existing, None)
+                deleted.add(existing)
+                if directories is not None:
+                    for parent in ancestors(existing):
+                        directories[parent].discard(existing)
+
+        def put(path, file_hash):
+            if directories is not None and path not in tree:
+                for parent in ancestors(path):
+                    directories.setdefault(parent, set()).add(path)
+            tree[path] = changed[path] = file_hash
+            deleted.discard(path)
+
+        for change in changes:
+            if change[0] == "M":
+                put(change[1], change[2])
+            elif change[0] == "D":
+                remove(change[1])
+            elif change[0] in ("C", "R"):
+                source, destination = change[1], change[2]
+                moved = {destination + p[len(source):]: tree[p] for p in below(source)}
+                if change[0] == "R":
+                    remove(source)
+                for path, file_hash in moved.items():
+                    put(path, file_hash)
+            elif change[0] == "deleteall":
+                deleted.update(tree)
+                tree.clear()
+                changed.clear()
+                directories = {}
+
+        return changed, deleted
+
+
+
+
+
+
+    def materialize_tree(self, tree, patterns=None, base_tree=None):
+        """
+        Write the files of a tree from the object store into the working directory,
+        and record them in the index.
+
+        Only paths selected by `patterns` (the sparse checkout by default) are read and
+        written, and files whose index entry already has the right hash and unchanged
+        stat data are skipped, so the work follows the selected subset.
+        Args:
+            tree (dict): Hashes keyed by path.
+            patterns (list): Path patterns to write; None means the sparse checkout patterns.
+            base_tree (dict): If given, written files that differ from it are staged.
+        Returns:
+            int: The number of files written.
+        Raises:
+            ValueError: If a path in the tree would land outside the working directory;
+                nothing is written then.
+        """
+        for path in tree:
+            check_tree_path(path)
+        patterns = self.load_sparse_patterns() if patterns is None else patterns
+        updates = {}
+        with self.open_index() as index:
+            for path, file_hash in tree.items():
+                if patterns and not self.path_matches(path, patterns):
+                    continue
+                entry = index.find(path)
+                if entry is not None and entry.hash == file_hash and self.stat_matches(path, entry):
+                    continue
+                target_dir = os.path.dirname(path)
+                if target_dir:
+                    os.makedirs(target_dir, exist_ok=True)
+                self.copy_object(file_hash, path)
+                staged = base_tree is not None and base_tree.get(path) != file_hash
+                updates[path] = self.make_index_entry(path, file_hash, Index.STAGED if staged else 0)
+        self.update_index(updates)
+        return len(updates)
+
+
+
+
+
+
+    def use_common_dir(self):
+        """
+        Point a worktree at the repository it was created from.
+        The worktree keeps its own index, HEAD and log in its `.mama`; stored objects
+        and the caches derived from them live only in the common directory.
+        """
+        with open(self.COMMON_DIR_FILE, 'r') as f:
+            self.common_dir = f.read().strip()
+        if not os.path.isdir(self.common_dir):
+            raise Exception(f"Worktree er main repository {self.common_dir} khuija pailam na.")
+        self.OBJECTS_DIR = os.path.join(self.common_dir, "objects")
+        self.BLAME_DIR = os.path.join(self.common_dir, "blame")
+        self.TRIGRAM_INDEX = os.path.join(self.common_dir, "trigrams.db")
+        self.FORMAT_FILE = os.path.join(self.common_dir, "format.json")
+        self.DIFF_CACHE = os.path.join(self.common_dir, "diffcache.db")
+        self.COLD_PACK = os.path.join(self.common_dir, "cold.pack")
+        self.COLD_INDEX = os.path.join(self.common_dir, "cold.db")
+
+
+
+
+
+
+    def add_worktree(self, directory, commit_id):
+        """
+        Create another working directory checked out at a commit.
+
+        The new worktree gets its own index, HEAD and a copy of the log up to the commit,
+        so it can commit independently; its objects are read from and written to this
+        repository's object store, so no stored content is duplicated.
+        Args:
+            directory (str): Where to create the worktree; must be missing or empty.
+            commit_id (str): A full or abbreviated commit ID to check out.
+        Returns:
+            bool: True if the worktree was created.
+        """
+        commit_id = self.resolve_commit(commit_id)
+        if not commit_id:
+            return False
+        if os.path.exists(directory) and os.listdir(directory):
+            print(f"{directory} khali na mama, worktree banabo na.")
+            return False
+
+        log_data = self.load_commit_log()
+        ids = [entry["commit_id"] for entry in log_data]
+        if commit_id not in ids:
+            print("Archive kora commit theke worktree banano jay na, mama.")
+            return False
+        history = log_data[:ids.index(commit_id) + 1]
+        common_dir = os.path.abspath(self.common_dir)
+        worktree_meta = os.path.join(directory, ".mama")
+
+        os.makedirs(worktree_meta)
+        with open(os.path.join(directory, self.COMMON_DIR_FILE), 'w') as f:
+            f.write(common_dir + "\n")
+        self.write_json_atomic(os.path.join(directory, self.LOG_FILE), history)
+        if os.path.exists(self.ARCHIVE_BASE):
+            shutil.copyfile(self.ARCHIVE_BASE, os.path.join(directory, self.ARCHIVE_BASE))
+        with open(os.path.join(directory, self.HEAD_FILE), 'w') as f:
+            f.write(commit_id + "\n")
+        Index.write(os.path.join(directory, self.INDEX_FILE), [])
+
+        with self.lock():
+            worktrees_file = os.path.join(common_dir, self.WORKTREES_FILE)
+            worktrees = self.list_worktrees()
+            worktrees.append({"path": os.path.abspath(directory), "commit_id": commit_id})
+            self.write_json_atomic(worktrees_file, worktrees)
+
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            worktree = Repository()
+            written = worktree.materialize_tree(worktree.get_commit_tree(commit_id))
+            worktree.rebuild_path_index()  # Later commits there add to it without replaying the copied log
+        finally:
+            os.chdir(cwd)
+        print(f"Worktree {directory} toiri, {commit_id[:self.SHORT_ID_LENGTH]} theke {written} ta file.")
+        return True
+
+
+
+
+
+
+    def list_worktrees(self):
+        """Return the worktrees created from this repository that still exist, as path/commit_id dicts."""
+        worktrees_file = os.path.join(self.common_dir, self.WORKTREES_FILE)
+        if not os.path.exists(worktrees_file):
+            return []
+        with open(worktrees_file, 'r') as f:
+            worktrees = json.load(f)
+        return [w for w in worktrees if os.path.exists(os.path.join(w["path"], self.COMMON_DIR_FILE))]
+
+
+
+
+
+
+    def has_object(self, file_hash):
+        """Whether an object is stored, loose or in the cold pack, without unpacking it."""
+        if os.path.exists(os.path.join(self.OBJECTS_DIR, file_hash[:2], file_hash[2:])):
+            return True
+        if not self.has_cold_pack:
+            return False
+        with closing_connection(self.COLD_INDEX) as db:
+            return db.execute("SELECT 1 FROM objects WHERE hash = ?", (file_hash,)).fetchone() is not None
+
+
+
+
+
+
+    def send_history(self, conn):
+        """
+        Sending side of push and pull: offer the commits the other repository is missing
+        and stream the objects it asks for.
+
+        The receiver names its HEAD; everything after it in this log is offered, with
+        the hashes of the files those commits record. The receiver answers with the
+        hashes it does not have, and only those are streamed, in one bundle.
+        Args:
+            conn (Connection): Connection to the receiving repository.
+        Returns:
+            int: The number of commits sent.
+        """
+        request = conn.receive()
+        log_data = self.load_commit_log()
+        commit_ids = [entry["commit_id"] for entry in log_data]
+        if request["hash"] != self.hash_algorithm:
+            error = f"Duita repository r hash alada ({request['hash']} ar {self.hash_algorithm}). Age 'mama rehash' koren."
+        elif request["head"] is None and self.load_archive_base():
+            error = "Ei repository r purono itihas archive kora, khali repository te pathano jay na."
+        elif request["head"] is not None and request["head"] not in commit_ids:
+            error = f"Fast-forward hobe na mama: {request['head'][:self.SHORT_ID_LENGTH]} ei repository r itihashe nai."
+        else:
+            error = None
+        if error:
+            conn.send(error=error)
+            raise ValueError(error)
+
+        new_entries = log_data[commit_ids.index(request["head"]) + 1:] if request["head"] else log_data
+        objects = sorted({file_info["hash"] for entry in new_entries for file_info in entry["files"]})
+        conn.send(log=new_entries, objects=objects)
+        if not new_entries:
+            return 0
+
+        for file_hash in conn.receive()["want"]:
+            with self.open_object(file_hash) as f:
+                conn.send_object(file_hash, f, self.object_size(file_hash))
+        conn.send(end=True)
+        conn.receive()  # The receiver has applied the commits
+        return len(new_entries)
+
+
+
+
+
+
+    def receive_history(self, conn):
+        """
+        Receiving side of push and pull: fast-forward this repository to the other one's HEAD.
+
+        The offered commits must continue from this HEAD. Before anything is transferred,
+        the files they change are checked against the working directory, and the sync is
+        refused if one of them has local changes, anything is staged, or a path would
+        land outside the working directory. Missing objects are
+        then stored, each verified against its hash, and only after that are the commits
+        appended to the log and their files written, so an interrupted sync leaves at most
+        some unused objects behind.
+        Args:
+            conn (Connection): Connection to the sending repository.
+        Returns:
+            int: The number of commits received.
+        Raises:
+            ValueError: If the offer is refused, an object arrives damaged, or another
+                commit was made while the sync ran.
+        """
+        head = self.get_head()
+        conn.send(head=head, hash=self.hash_algorithm)
+        offer = conn.receive()
+        entries = offer["log"]
+        if not entries:
+            return 0
+
+        try:
+            if entries[0]["parent"] != head or any(b["parent"] != a["commit_id"] for a, b in zip(entries, entries[1:])):
+                raise ValueError("Pathano commit gula ei repository r HEAD theke shuru hoy na, mama.")
+            if self.get_staged_files():
+                raise ValueError("Age rakha file gula commit koren, tarpor sync korben mama.")
+            for entry in entries:
+                for file_info in entry["files"]:
+                    check_tree_path(file_info["file_name"])
+                for file_name in entry.get("deleted", []):
+                    check_tree_path(file_name)
+            old_tree = self.get_commit_tree(head) if head else {}
+            new_tree = dict(old_tree)
+            for entry in entries:
+                new_tree.update((file_info["file_name"], file_info["hash"]) for file_info in entry["files"])
+                for file_name in entry.get("deleted", []):
+                    new_tree.pop(file_name, None)
+            changed = {path: file_hash for path, file_hash in new_tree.items() if old_tree.get(path) != file_hash}
+            deleted = set(old_tree) - set(new_tree)
+            conflicts = self.locally_changed(sorted(set(changed) | deleted), old_tree, new_tree)
+            if conflicts:
+                raise ValueError("Ei file gulay local change ache, age commit koren mama:\n  - " + "\n  - ".join(conflicts))
+        except ValueError as exc:
+            conn.send(error=str(exc))
+            raise
+
+        wanted = [file_hash for file_hash in offer["objects"] if not self.has_object(file_hash)]
+        conn.send(want=wanted)
+        for _ in wanted:
+            header = conn.receive()
+            if self.store_object_stream(conn.object_reader(header["size"])) != header["object"]:
+                raise ValueError(f"Object {header['object'][:self.SHORT_ID_LENGTH]} pathanor somoy nosto hoye gese.")
+        conn.receive()  # End of the bundle
+
+        with self.lock():
+            if self.get_head() != head:
+                raise ValueError("Sync cholar somoy onno keu commit korse. Abar try koren mama.")
+            log_data = self.load_commit_log()
+            first_seq = len(log_data)
+            log_data.extend(entries)
+            self.write_json_atomic(self.LOG_FILE, log_data)
+            self.write_head(entries[-1]["commit_id"])
+            with closing_connection(self.PATH_INDEX) as db:
+                self.record_path_history(db, entries, first_seq, entries[-1]["commit_id"])
+
+            self.materialize_tree(changed)
+            for path in deleted:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.update_index({}, removed=deleted)
+        conn.send(done=entries[-1]["commit_id"])
+        print(f"{len(entries)} ta commit, {len(wanted)} ta notun object elo. HEAD ekhon {entries[-1]['commit_id'][:self.SHORT_ID_LENGTH]}.")
+        return len(entries)
+
+
+
+
+
+
+    def locally_changed(self, paths, old_tree, new_tree):
+        """
+        Paths whose working copy is neither their version in `old_tree` nor in `new_tree`,
+        so that replacing or removing them would lose local changes. Absent files are safe.
+        """
+        changed = []
+        with self.open_index() as index:
+            for path in paths:
+                if not os.path.lexists(path):
+                    continue
+                known = (old_tree.get(path), new_tree.get(path))
+                entry = index.find(path)
+                if entry is not None and entry.hash in known and self.stat_matches(path, entry):
+                    continue
+                if not os.path.isfile(path) or self.hash_file(path) not in known:
+                    changed.append(path)
+        return changed
+
+
+
+
+
+
+    @staticmethod
+    def stat_matches(path, entry):
+        """Check whether a file's size and modification time still match its index entry."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return st.st_mtime_ns == entry.mtime_ns and st.st_size == entry.size
+
+
+
+
+
+
+    @staticmethod
+    def path_matches(path, patterns):
+        """
+        Check whether a path is selected by any of the patterns.
+        A pattern selects the path itself, everything under it when it names a
+        directory, and anything it matches as a shell-style glob.
+        """
+        for pattern in patterns:
+            pattern = os.path.normpath(pattern)
+            if pattern == "." or path == pattern or path.startswith(pattern + os.sep):
+                return True
+            if fnmatch.fnmatchcase(path, pattern):
+                return True
+        return False
+
+
+
+
+
+
+    def restore_paths(self, commit_id, patterns):
+        """
+        Restore only the paths matching `patterns` to their state in a commit.
+
+        Only the selected files are read from the object store and written; history
+        and every other file are left alone. Restored files that differ from HEAD are
+        staged, so the next commit records the revert. Tracked files under the selection
+        that did not exist in the commit are removed.
+        Args:
+            commit_id (str): A full or abbreviated commit ID.
+            patterns (list): Files, directories or globs to restore.
+        Returns:
+            int or None: The number of files written, or None if the commit is unknown.
+        """
+        commit_id = self.resolve_commit(commit_id)
+        if not commit_id:
+            return None
+
+        tree = self.get_commit_tree(commit_id)
+        head = self.get_head()
+        head_tree = tree if head == commit_id else self.get_commit_tree(head)
+
+        with self.open_index() as index:
+            extra = [
+                entry.path for entry in index
+                if self.path_matches(entry.path, patterns) and entry.path not in tree
+            ]
+        for path in extra:
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"Deleted: {path}")
+        self.update_index({}, removed=extra)
+
+        written = self.materialize_tree(tree, patterns, head_tree)
+        print(f"{written} ta file {commit_id[:self.SHORT_ID_LENGTH]} theke ferot anlam, mama.")
+        return written
+
+
+
+
+
+
+    def load_sparse_patterns(self):
+        """Patterns of the sparse checkout; an empty list means everything is checked out."""
+        if not os.path.exists(self.SPARSE_FILE):
+            return []
+        with open(self.SPARSE_FILE, 'r') as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+
+
+
+
+    def set_sparse_patterns(self, patterns):
+        """
+        Change the sparse checkout and apply it to the working directory.
+        Newly selected tracked files missing from disk are written from HEAD; tracked files that fall outside the
+        selection are removed from disk unless they have local changes. The index keeps
+        tracking them, so nothing is recorded as deleted.
+        Args:
+            patterns (list): The new patterns; an empty list turns sparse checkout off.
+        """
+        with self.lock():
+            if patterns:
+                with open(self.SPARSE_FILE, 'w') as f:
+                    f.write("\n".join(patterns) + "\n")
+            elif os.path.exists(self.SPARSE_FILE):
+                os.remove(self.SPARSE_FILE)
+
+        head = self.get_head()
+        if not head:
+            return
+        # Only bring back tracked files that are missing on disk; files that are
+        # present are either current or carry local changes, and are left alone.
+        with self.open_index() as index:
+            tree = {
+                path: file_hash for path, file_hash in self.get_commit_tree(head).items()
+                if not os.path.exists(path) and path in index
+            }
+        written = self.materialize_tree(tree, patterns)
+
+        removed = 0
+        if patterns:
+            with self.open_index() as index:
+                for entry in index:
+                    if self.path_matches(entry.path, patterns) or not os.path.exists(entry.path):
+                        continue
+                    if entry.flags & Index.STAGED or not self.stat_matches(entry.path, entry):
+                        print(f"{entry.path} e local change ache, rekhe dilam.")
+                        continue
+                    os.remove(entry.path)
+                    removed += 1
+        print(f"Sparse checkout: {written} ta file likhlam, {removed} ta sorailam.")
+
+
+
+
+
+
+
+    def export_commit(self, commit_id, out, archive_format="tar", prefix=""):
+        """
+        Stream the full tree of a commit as an archive, straight from the object store.
+        Nothing is written to the working directory or to temporary files, and each
+        object is copied in fixed-size chunks, so memory use does not grow with the tree.
+        Args:
+            commit_id (str): A full or abbreviated commit ID.
+            out: A writable binary stream; it does not need to be seekable.
+            archive_format (str): One of EXPORT_FORMATS.
+            prefix (str): Directory name to put in front of every path in the archive.
+        Returns:
+            int: The number of files written, or None if the commit is unknown.
+        Raises:
+            ValueError: If the archive format is not supported.
+        """
+        if archive_format not in self.EXPORT_FORMATS:
+            raise ValueError(f"Format {archive_format} support kori na. {', '.join(self.EXPORT_FORMATS)} theke bechhe nin.")
+        commit_id = self.resolve_commit(commit_id)
+        if not commit_id:
+            return None
+
+        entry = self.get_commit_entry(commit_id)
+        mtime = entry.get("timestamp_ns", 0) / 1e9 or time.time()
+        tree = self.get_commit_tree(commit_id)
+        names = sorted(tree)
+
+        def archive_name(path):
+            return prefix + path.replace(os.sep, "/")
+
+        if archive_format == "zip":
+            date_time = time.localtime(max(mtime, 315532800))[:6]  # zip dates start in 1980
+            with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for path in names:
+                    info = zipfile.ZipInfo(archive_name(path), date_time)
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    info.external_attr = 0o644 << 16
+                    with self.open_object(tree[path]) as src, archive.open(info, 'w', force_zip64=True) as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+        else:
+            mode = "w|" + archive_format[4:]
+            with tarfile.open(fileobj=out, mode=mode) as archive:
+                for path in names:
+                    info = tarfile.TarInfo(archive_name(path))
+                    info.size = self.object_size(tree[path])
+                    info.mtime = int(mtime)
+                    info.mode = 0o644
+                    with self.open_object(tree[path]) as src:
+                        archive.addfile(info, src)
+
+        return len(names)
+
+
+
+
+
+
+
+    def file_versions(self, filename, commit_id=None):
+        """
+        List the versions of a file up to a commit, oldest first.
+        A deletion ends the history: a file re-added later starts from scratch.
+        Args:
+            filename (str): The path of the file.
+            commit_id (str): The last commit to consider; defaults to HEAD.
+        Returns:
+            list: (commit_id, hash) pairs for every commit that changed the file.
+        """
+        # Archived history only matters if the file still existed at the archive base
+        base = self.load_archive_base()
+        log_data = self.load_commit_log()
+        if base and (filename in base["tree"]
+                     or commit_id is not None and not any(entry["commit_id"] == commit_id for entry in log_data)):
+            log_data = self.cold_entries_before(log_data) + log_data
+        versions = []
+        for entry in log_data:
+            if filename in entry.get("deleted", ()):
+                versions = []
+            for file_info in entry["files"]:
+                if file_info["file_name"] == filename:
+                    versions.append((entry["commit_id"], file_info["hash"]))
+            if entry["commit_id"] == commit_id:
+                break
+        return versions
+
+
+
+
+
+
+    def blame_cache_path(self, filename, commit_id):
+        """Path of the cached line origins of `filename` as introduced by `commit_id`."""
+        key = hashlib.sha256(f"{commit_id}\0{filename}".encode("utf-8")).hexdigest()
+        return os.path.join(self.BLAME_DIR, key[:2], key[2:] + ".json")
+
+
+
+
+
+
+    def read_object_lines(self, file_hash):
+        """Read a stored object as a list of text lines."""
+        with io.TextIOWrapper(self.open_object(file_hash), encoding="utf-8", errors="replace") as f:
+            return f.readlines()
+
+
+
+
+
+
+    def blame(self, filename, commit_id=None):
+        """
+        Attribute each line of a file to the commit that last changed it.
+
+        Line origins of every version are cached on disk as run-length lists of
+        [commit_id, line_count]. A request starts from the newest cached version and
+        only diffs the versions after it, so a new commit costs one diff of its change.
+        Args:
+            filename (str): The path of the file.
+            commit_id (str): A full or abbreviated commit ID; defaults to HEAD.
+        Returns:
+            list or None: (origin_commit_id, line) pairs, or None if the file has no history.
+        """
+        if commit_id:
+            commit_id = self.resolve_commit(commit_id)
+            if not commit_id:
+                return None
+        versions = self.file_versions(filename, commit_id)
+        if not versions:
+            print(f"{filename} er kono itihas nai, mama.")
+            return None
+
+        # Find the newest version whose line origins are already cached
+        start = 0
+        origins = []
+        for i in range(len(versions) - 1, -1, -1):
+            cache_path = self.blame_cache_path(filename, versions[i][0])
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r') as f:
+                    for origin, count in json.load(f):
+                        origins.extend([origin] * count)
+                start = i + 1
+                break
+
+        previous_lines = self.read_object_lines(versions[start - 1][1]) if start else []
+        for version_commit, file_hash in versions[start:]:
+            lines = self.read_object_lines(file_hash)
+            matcher = difflib.SequenceMatcher(None, previous_lines, lines, autojunk=False)
+            new_origins = []
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag == "equal":
+                    new_origins.extend(origins[i1:i2])
+                else:
+                    new_origins.extend([version_commit] * (j2 - j1))
+            origins, previous_lines = new_origins, lines
+            self.write_blame_cache(filename, version_commit, origins)
+
+        return list(zip(origins, previous_lines))
+
+
+
+
+
+
+    def write_blame_cache(self, filename, commit_id, origins):
+        """Store line origins as a run-length list of [commit_id, count]."""
+        runs = []
+        for origin in origins:
+            if runs and runs[-1][0] == origin:
+                runs[-1][1] += 1
+            else:
+                runs.append([origin, 1])
+        cache_path = self.blame_cache_path(filename, commit_id)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self.write_json_atomic(cache_path, runs)
+
+
+
+
+
+
+    def show_blame(self, filename, commit_id=None):
+        """Print each line of a file with the commit that last changed it."""
+        result = self.blame(filename, commit_id)
+        if result is None:
+            return
+        # Only the commits that own a line are looked up; archived ones one by one, so the
+        # rest of the cold pack is never decompressed
+        origins = {origin for origin, _ in result}
+        dates = {entry["commit_id"]: entry["timestamp"] for entry in self.load_commit_log() if entry["commit_id"] in origins}
+        if self.has_cold_pack:
+            for entry in map(self.cold_commit_entry, origins - set(dates)):
+                if entry is not None:
+                    dates[entry["commit_id"]] = entry["timestamp"]
+        width = len(str(len(result)))
+        for number, (origin, line) in enumerate(result, 1):
+            print(
+                Fore.YELLOW + origin[:self.SHORT_ID_LENGTH] + Fore.CYAN + f" ({dates.get(origin, '?')} "
+                f"{number:>{width}}) " + Style.RESET_ALL + line.rstrip("\n")
+            )
+
+
+
+
+
+
+
+    def blob_occurrences(self, entries=None):
+        """
+        Map every stored blob to where it entered history, archived commits included.
+        Args:
+            entries (list): Result of history_entries(), if the caller already has it.
+        Returns:
+            dict: Lists of (commit_id, path) keyed by blob hash, in history order.
+        """
+        occurrences = {}
+        for entry in entries if entries is not None else self.history_entries():
+            for file_info in entry["files"]:
+                occurrences.setdefault(file_info["hash"], []).append((entry["commit_id"], file_info["file_name"]))
+        return occurrences
+
+
+
+
+
+
+    def search_history(self, pattern, ignore_case=False, jobs=None):
+        """
+        Search every distinct stored file version for a regular expression.
+
+        Each blob is searched once, whatever the number of commits that contain it,
+        on a pool of worker processes. If a trigram index exists it is brought up to
+        date and used to drop blobs that cannot match before any file is read.
+        Args:
+            pattern (str): The regular expression to look for, matched line by line.
+            ignore_case (bool): Match without regard to case.
+            jobs (int): Number of worker processes; defaults to the number of CPUs.
+        Returns:
+            list: (commit_id, path, line_number, line) for every match, in history order.
+        """
+        flags = re.IGNORECASE if ignore_case else 0
+        re.compile(pattern, flags)  # Fail early on a bad pattern
+        entries = self.history_entries()
+        occurrences = self.blob_occurrences(entries)
+        candidates = list(occurrences)
+
+        if os.path.exists(self.TRIGRAM_INDEX):
+            self.update_trigram_index(occurrences)
+            required = self.required_trigrams(pattern, ignore_case)
+            if required:
+                candidates = self.trigram_candidates(required, candidates)
+
+        tasks = [(location, pattern, flags) for location in self.object_locations(candidates)]
+        if len(tasks) < 32 or jobs == 1:
+            found = map(_search_object, tasks)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                found = list(pool.map(_search_object, tasks, chunksize=16))
+
+        matches = {}
+        for blob, lines in zip(candidates, found):
+            if lines:
+                matches[blob] = lines
+
+        results = []
+        for blob, places in occurrences.items():
+            for commit_id, path in places:
+                for number, line in matches.get(blob, ()):
+                    results.append((commit_id, path, number, line))
+        order = {entry["commit_id"]: i for i, entry in enumerate(entries)}
+        results.sort(key=lambda r: (order.get(r[0], -1), r[1], r[2]))
+        return results
+
+
+
+
+
+
+    @staticmethod
+    def trigrams(data):
+        """Return the set of lowercase byte trigrams of `data` as integers."""
+        data = data.lower()
+        return {int.from_bytes(data[i:i + 3], "big") for i in range(len(data) - 2)}
+
+
+
+
+
+
+    def update_trigram_index(self, occurrences=None):
+        """
+        Bring the trigram index up to date by adding every blob it has not seen yet.
+        Blobs larger than TRIGRAM_MAX_BLOB are recorded as unindexed and always searched.
+        Args:
+            occurrences (dict): Result of blob_occurrences(), if the caller already has it.
+        Returns:
+            int: The number of blobs added.
+        """
+        occurrences = occurrences if occurrences is not None else self.blob_occurrences()
+        with closing_connection(self.TRIGRAM_INDEX) as db:
+            db.execute("CREATE TABLE IF NOT EXISTS blobs (id INTEGER PRIMARY KEY, hash TEXT UNIQUE, indexed INTEGER)")
+            db.execute("CREATE TABLE IF NOT EXISTS postings (trigram INTEGER, blob INTEGER)")
+            db.execute("CREATE INDEX IF NOT EXISTS postings_trigram ON postings (trigram)")
+            known = {row[0] for row in db.execute("SELECT hash FROM blobs")}
+            added = 0
+            for blob in occurrences:
+                if blob in known:
+                    continue
+                try:
+                    indexed = self.object_size(blob) <= self.TRIGRAM_MAX_BLOB
+                except OSError:
+                    indexed = False
+                blob_id = db.execute("INSERT INTO blobs (hash, indexed) VALUES (?, ?)", (blob, int(indexed))).lastrowid
+                if indexed:
+                    with self.open_object(blob) as f:
+                        db.executemany(
+                            "INSERT INTO postings (trigram, blob) VALUES (?, ?)",
+                            ((trigram, blob_id) for trigram in self.trigrams(f.read())),
+                        )
+                added += 1
+            db.commit()
+        return added
+
+
+
+
+
+
+    @staticmethod
+    def required_trigrams(pattern, ignore_case=False):
+        """
+        Collect trigrams that every match of the pattern must contain.
+        Only literal runs at the top level of the pattern are used; anything that
+        cannot be reasoned about simply contributes nothing.
+        Returns:
+            set: Lowercase trigrams as integers; empty if no filtering is possible.
+        """
+        try:
+            parsed = re._parser.parse(pattern, re.IGNORECASE if ignore_case else 0)
+        except (AttributeError, re.error):
+            return set()
+
+        required = set()
+        run = []
+        for op, value in list(parsed) + [(None, None)]:
+            if op == re._constants.LITERAL and value < 128:
+                run.append(value)
+                continue
+            if len(run) >= 3:
+                required |= Repository.trigrams(bytes(run))
+            run = []
+        return required
+
+
+
+
+
+
+    def trigram_candidates(self, required, blobs):
+        """Keep the blobs that contain every required trigram or are not indexed."""
+        with closing_connection(self.TRIGRAM_INDEX) as db:
+            ids = None
+            for trigram in required:
+                rows = {row[0] for row in db.execute("SELECT blob FROM postings WHERE trigram = ?", (trigram,))}
+                ids = rows if ids is None else ids & rows
+                if not ids:
+                    break
+            ids = ids or set()
+            keep = set()
+            for blob_id, blob, indexed in db.execute("SELECT id, hash, indexed FROM blobs"):
+                if blob_id in ids or not indexed:
+                    keep.add(blob)
+        return [blob for blob in blobs if blob in keep]
+
+
+
+
+
+
+    @staticmethod
+    def open_path_index(db):
+        """Create the tables of the path -> commits index if they do not exist yet."""
+        db.execute("CREATE TABLE IF NOT EXISTS commits (seq INTEGER PRIMARY KEY, commit_id TEXT, message TEXT, timestamp TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS touches (path TEXT, seq INTEGER, change TEXT)")
+        db.execute("CREATE INDEX IF NOT EXISTS touches_path ON touches (path, seq)")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+
+
+
+
+
+    def record_path_history(self, db, entries, first_seq, head=None, commit=True):
+        """
+        Add log entries to the path -> commits index.
+        The index remembers the HEAD it was last brought up to; a query that finds a
+        different HEAD rebuilds the index from the log instead of trusting it.
+        Args:
+            db: An open connection to PATH_INDEX.
+            entries (list): Log entries, in history order.
+            first_seq (int): Position of the first entry in log.json; archived entries come
+                before the log, at negative positions.
+            head (str): HEAD after these entries; the recorded HEAD is left alone if None.
+            commit (bool): Commit the transaction when done.
+        """
+        self.open_path_index(db)
+        for seq, entry in enumerate(entries, first_seq):
+            db.execute(
+                "INSERT OR REPLACE INTO commits (seq, commit_id, message, timestamp) VALUES (?, ?, ?, ?)",
+                (seq, entry["commit_id"], entry["message"], entry["timestamp"]),
+            )
+            db.executemany(
+                "INSERT INTO touches (path, seq, change) VALUES (?, ?, ?)",
+                [(file_info["file_name"], seq, "M") for file_info in entry["files"]]
+                + [(file_name, seq, "D") for file_name in entry.get("deleted", [])],
+            )
+        if head is not None:
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('head', ?)", (head,))
+        if commit:
+            db.commit()
+
+
+
+
+
+
+    def rebuild_path_index(self):
+        """Rebuild the path -> commits index from the archived entries and log.json."""
+        with self.lock():
+            tmp_path = f"{self.PATH_INDEX}.{os.getpid()}.tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with closing_connection(tmp_path) as db:
+                log_data = self.load_commit_log()
+                cold = self.cold_entries_before(log_data)
+                self.record_path_history(db, cold, -len(cold), commit=False)
+                self.record_path_history(db, log_data, 0, self.get_head() or "")
+            os.replace(tmp_path, self.PATH_INDEX)
+
+
+
+
+
+
+    def path_history(self, path):
+        """
+        Find every commit that touched a path, or any file under it if it is a directory.
+        Answers come from the index through a range scan on the path, so the cost grows
+        with the number of matches rather than with the length of the history.
+        Args:
+            path (str): A file path or directory prefix.
+        Returns:
+            list: (commit_id, message, timestamp, [(path, change), ...]) in history order,
+            where change is "M" for added or modified and "D" for deleted.
+        """
+        path = os.path.normpath(path).rstrip(os.sep)
+        prefix = "" if path == "." else path + os.sep
+
+        with closing_connection(self.PATH_INDEX) as db:
+            self.open_path_index(db)
+            row = db.execute("SELECT value FROM meta WHERE key = 'head'").fetchone()
+        if row is None or row[0] != (self.get_head() or ""):
+            self.rebuild_path_index()
+
+        upper = prefix[:-1] + chr(ord(os.sep) + 1) if prefix else "\U0010ffff"
+        history = []
+        with closing_connection(self.PATH_INDEX) as db:
+            rows = db.execute(
+                "SELECT c.commit_id, c.message, c.timestamp, t.path, t.change FROM touches t "
+                "JOIN commits c ON c.seq = t.seq "
+                "WHERE t.path = ? OR (t.path >= ? AND t.path < ?) ORDER BY t.seq, t.path",
+                (path, prefix, upper),
+            )
+            for commit_id, message, timestamp, file_name, change in rows:
+                if not history or history[-1][0] != commit_id:
+                    history.append((commit_id, message, timestamp, []))
+                history[-1][3].append((file_name, change))
+        return history
+
+
+
+
+
+
+    def show_path_history(self, path):
+        """Print the commits that touched a path, with the matching files."""
+        history = self.path_history(path)
+        if not history:
+            print(Fore.RED + f"{path} kono commit e chhoa hoy nai, mama." + Style.RESET_ALL)
+            return
+
+        print(Fore.CYAN + f"\n========== {path} er Itihas ==========\n")
+        for commit_id, message, timestamp, files in history:
+            print(Fore.GREEN + f"Commit ID   : {Fore.WHITE}{commit_id}")
+            print(Fore.GREEN + f"Message     : {Fore.WHITE}{message}")
+            print(Fore.GREEN + f"Date & Time : {Fore.WHITE}{timestamp}")
+            for file_name, change in files:
+                color = Fore.RED if change == "D" else Fore.WHITE
+                print(color + f"  {change} {file_name}")
+            print(Fore.YELLOW + "-" * 30)
+        print(Style.RESET_ALL)
+
+
+
+
+
+
+    def show_search(self, pattern, ignore_case=False, jobs=None):
+        """Print every line in history that matches the pattern."""
+        results = self.search_history(pattern, ignore_case, jobs)
+        if not results:
+            print(f"'{pattern}' kothao pai nai, mama.")
+            return
+        for commit_id, path, number, line in results:
+            print(
+                Fore.YELLOW + commit_id[:self.SHORT_ID_LENGTH] + " " + Fore.GREEN + f"{path}:{number}: "
+                + Style.RESET_ALL + line
+            )
+
+
+
+
+
+
+
+
+    def show_log(self, stat=False):
+        """
+        Displays the commit history from log.json in a colorful and clean format.
+        If there are no commits, it will notify the user.
+        Args:
+            stat (bool): Also show the change statistics stored with each commit.
+        """
+        log_data = self.load_commit_log()
+
+        if not log_data:
+            print(Fore.RED + "Kono commit nai mama. Kichu commit korun agey!")
+            return
+
+        print(Fore.CYAN + "\n========== Mama Itihas ==========\n")
+        
+        for entry in log_data:
+            print(Fore.GREEN + f"Commit ID   : {Fore.WHITE}{entry['commit_id']}")
+            print(Fore.GREEN + f"Message     : {Fore.WHITE}{entry['message']}")
+            print(Fore.GREEN + f"Date & Time : {Fore.WHITE}{entry['timestamp']}")
+            if stat:
+                self.show_commit_summary(entry, per_file=True)
+            print(Fore.YELLOW + "-" * 30)
+
+        print(Style.RESET_ALL + Fore.WHITE + "\nEi hoilo apnar repository er itihas.\n")
+
+
+
+
+
+    def show_commit_details(self, commit_id):
+        """
+        Displays detailed information for a specific commit based on the given ID.
+        """
+        commit_id = self.resolve_commit(commit_id)
+        if not commit_id:
+            return
+        # Find the specific commit, in the log or in the cold pack
+        commit = self.get_commit_entry(commit_id)
+        if not commit:
+            print(Fore.RED + f"Commit ID '{commit_id}' pawa jai nai!")
+            return
+
+        # Display the details of the specific commit
+        print(Fore.CYAN + "\n========== Commit Details ==========\n")
+        print(Fore.GREEN + f"Commit ID   : {Fore.WHITE}{commit['commit_id']}")
+        print(Fore.GREEN + f"Message     : {Fore.WHITE}{commit['message']}")
+        print(Fore.GREEN + f"Date & Time : {Fore.WHITE}{commit['timestamp']}")
+        print(Fore.GREEN + "Files:")
+        for file in commit["files"]:
+            print(Fore.WHITE + f"  - {file['file_name']}")
+        print(Fore.GREEN + "Changes:")
+        self.show_commit_summary(commit, per_file=True)
+        print(Style.RESET_ALL)
+
+
+
+
+
+    def status(self):
+        """
+        Displays the status of the repository by checking the staged entries in INDEX_FILE.
+        If nothing is staged, it prints a message indicating that there are no staged files.
+        Otherwise, it prints the list of staged files and the total count of these files.
+        Messages are printed in Bengali language.
+        Returns:
+            None
+        """
+
+        staged_files = self.get_staged_files()
+
+        if self.interrupted_commits():
+            print("Ekta 'rakho' majhpothe theme gese mama; abar chalale jekhane thamse sekhan theke cholbe.")
+
+        if not staged_files:
+            print("Age kichu rakhte bolen nai to mama")
+            return
+
+        print("Ei hoilo apnar repository mama ki obostha:")
+        for file in staged_files:
+            print(f"  {file} (rakha ache)")
+        print(f"Total {len(staged_files)} ta file rakha ache mama repository te.")
+
+
+
+
+
+
+
+
+
+    def rollback(self, commit_id, verbose=False):
+        """
+        Rollback to a specific commit by restoring files and removing commit history.
+        Args:
+            commit_id (str): The commit to roll back to.
+            verbose (bool): Print every deleted and restored file instead of a progress counter and summary.
+        """
+        commit_id = self.resolve_commit(commit_id)
+        if not commit_id:
+            return
+        if commit_id not in self.get_commit_ids():
+            print("Archive kora commit e fire jawa jay na mama; 'restore' diye file ferot anen.")
+            return
+
+        # History is rewritten, so the whole rollback runs under the write lock
+        with self.lock():
+            # Step 1: Delete files created after the target commit
+            self.delete_files_after_commit(commit_id, verbose)
+
+            # Step 2: Restore files to their correct paths from relevant commits,
+            # verifying every file against its hash as it is written
+            self.restore_files_to_commit(commit_id, verbose)
+
+            # Step 3: Delete commit history after the target commit
+            self.delete_commit_history_after(commit_id)
+
+            # Step 4: Log rollback information
+            self.log_rollback(commit_id)
 
         print(f"Successfully rolled back to commit {commit_id}.")
 
@@ -656,26 +3361,31 @@ class Repository:
 
 
 
-    def delete_files_after_commit(self, commit_id):
+    def delete_files_after_commit(self, commit_id, verbose=False):
         """Delete files created after the target commit."""
-        all_commits = sorted(os.listdir(self.COMMITS_DIR))
-        commits_to_check = all_commits[all_commits.index(commit_id) + 1:]
+        log_data = self.load_commit_log()
+        all_commits = [entry["commit_id"] for entry in log_data]
+        entries_to_check = log_data[all_commits.index(commit_id) + 1:]
 
         files_to_delete = set()
-        for commit in commits_to_check:
-            commit_folder = os.path.join(self.COMMITS_DIR, commit)
-            files_to_delete.update(os.listdir(commit_folder))
+        for entry in entries_to_check:
+            files_to_delete.update(file_info["file_name"] for file_info in entry["files"])
 
+        patterns = self.load_sparse_patterns()
+        deleted = 0
         for file in files_to_delete:
+            if patterns and not self.path_matches(file, patterns):
+                continue  # Outside the sparse checkout
             if os.path.exists(file):
                 os.remove(file)
-                print(f"Deleted: {file}")
+                deleted += 1
+                if verbose:
+                    print(f"Deleted: {file}")
+        if deleted and not verbose:
+            print(f"Deleted {deleted} files.")
 
-        # Remove these files from track.json
-        tracked_files = self.load_tracked_files()
-        for file in files_to_delete:
-            tracked_files.pop(file, None)
-        self.save_tracked_files(tracked_files)
+        # Remove these files from the index
+        self.update_index({}, removed=files_to_delete)
 
 
 
@@ -685,55 +3395,228 @@ class Repository:
 
 
 
-    def restore_files_to_commit(self, commit_id):
-        """Restore files to their original paths based on log.json for the specified commit."""
-        all_commits = sorted(os.listdir(self.COMMITS_DIR))
-        relevant_commits = all_commits[: all_commits.index(commit_id) + 1]
+    def restore_files_to_commit(self, commit_id, verbose=False):
+        """
+        Restore files to their original paths based on log.json for the specified commit.
 
-        # Load log data to map files to their correct paths
+        The directories are created first, one makedirs per deepest directory. The stored
+        contents are then copied through the copy pipeline, so several files are read,
+        verified and written at once by a bounded pool of threads (sized by the
+        pipeline.* config); each file is written to a temporary name and renamed into
+        place only once its contents match the hash it was stored under.
+        Args:
+            commit_id (str): The commit to restore.
+            verbose (bool): Print every restored file instead of a progress counter and a summary.
+        """
         log_data = self.load_commit_log()
+        position = next(i for i, entry in enumerate(log_data) if entry["commit_id"] == commit_id)
         restored_files = {}
+        deleted_files = set()
+        patterns = self.load_sparse_patterns()
 
-        # Iterate over relevant commits in reverse to restore the latest version <= commit_id
-        for commit in reversed(relevant_commits):
-            commit_entry = next((entry for entry in log_data if entry["commit_id"] == commit), None)
-            if not commit_entry:
-                continue  # Skip if no matching log entry found
-
+        # Walk back from commit_id so the latest version <= commit_id of each file wins
+        for commit_entry in reversed(log_data[:position + 1]):
+            commit = commit_entry["commit_id"]
             for file_info in commit_entry["files"]:
                 file_name = file_info["file_name"]  # This includes the original path
-                commit_folder = os.path.join(self.COMMITS_DIR, commit)
-                source_path = os.path.join(commit_folder, os.path.basename(file_name))  # File is stored without structure
+                if file_name in deleted_files or file_name in restored_files:
+                    continue  # Removed by a later commit, or a later version was already chosen
+                if patterns and not self.path_matches(file_name, patterns):
+                    continue  # Outside the sparse checkout
+                restored_files[file_name] = (file_info["hash"], f"from commit {commit}")
+
+            deleted_files.update(set(commit_entry.get("deleted", [])) - set(restored_files))
+
+        # Files last changed before the archive cutoff come from the archive base
+        base = self.load_archive_base()
+        for file_name, file_hash in (base["tree"].items() if base else ()):
+            if file_name in restored_files or file_name in deleted_files:
+                continue
+            if patterns and not self.path_matches(file_name, patterns):
+                continue
+            restored_files[file_name] = (file_hash, "from the archive base")
+
+        # makedirs creates the parents too, so only the deepest directories need a call
+        directories = {os.path.dirname(file_name) for file_name in restored_files} - {""}
+        created = set()
+        for directory in sorted(directories, key=len, reverse=True):
+            if directory in created:
+                continue
+            os.makedirs(directory, exist_ok=True)
+            while directory and directory not in created:
+                created.add(directory)
+                directory = os.path.dirname(directory)
+
+        # Archived objects are streamed out of the cold pack; the rest go through the pipeline
+        locations = self.object_locations([file_hash for file_hash, _ in restored_files.values()])
+        jobs = [(location, f"{file_name}.{os.getpid()}.tmp") for file_name, location in zip(restored_files, locations)]
+        loose = [job for job in jobs if isinstance(job[0], str)]
+        digests = iter(self.copy_pipeline().run(loose, None if verbose else self.progress_printer("Restoring", len(loose))))
+        results = []
+        for location, tmp_path in jobs:
+            if isinstance(location, str):
+                results.append(next(digests))
+                continue
+            digest = HASH_ALGORITHMS[self.hash_algorithm]()
+            try:
+                with open_stored(location) as src, open(tmp_path, 'wb') as dst:
+                    while chunk := src.read(1024 * 1024):
+                        digest.update(chunk)
+                        dst.write(chunk)
+            except (OSError, zlib.error) as exc:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                results.append(OSError(str(exc)))
+                continue
+            results.append(digest.hexdigest())
+        failed = 0
+        for (file_name, (file_hash, origin)), (_, tmp_path), digest in zip(restored_files.items(), jobs, results):
+            if digest == file_hash:
+                os.replace(tmp_path, file_name)
+                if verbose:
+                    print(f"Restored: {file_name} {origin}")
+                continue
+            if not isinstance(digest, OSError):
+                os.remove(tmp_path)
+            failed += 1
+            print(f"{Fore.RED}Could not restore {file_name}: stored object {file_hash[:12]} is missing or corrupt.{Style.RESET_ALL}")
+        if not verbose:
+            print(f"Restored {len(jobs) - failed} files.")
+
+
 
-                # Ensure the original path is recreated
-                target_path = os.path.join(".", file_name)  # Restore to the original path from log.json
-                target_dir = os.path.dirname(target_path)
-                os.makedirs(target_dir, exist_ok=True)
 
-                # Copy the file only if it hasn't been restored yet
-                if file_name not in restored_files:
-                    shutil.copy2(source_path, target_path)
-                    restored_files[file_name] = True
-                    print(f"Restored: {file_name} to {target_path} from commit {commit}")
 
 
 
 
 
+    @staticmethod
+    def progress_printer(label, total):
+        """
+        Return a callback that keeps one terminal line updated with "label: done/total",
+        redrawn at most ten times a second, or None when stdout is not a terminal.
+        """
+        if not sys.stdout.isatty():
+            return None
+        last_shown = 0.0
+
+        def show(done):
+            nonlocal last_shown
+            now = time.monotonic()
+            if done == total or now - last_shown >= 0.1:
+                last_shown = now
+                print(f"\r{label}: {done}/{total}", end="\n" if done == total else "", flush=True)
+        return show
+
+
+
 
 
 
 
 
-    def verify_restored_files(self):
-        """Ensure all restored files match their expected hashes."""
-        tracked_files = self.load_tracked_files()
-        for file, expected_hash in tracked_files.items():
-            if os.path.exists(file):
-                current_hash = self.hash_file(file)
-                if current_hash != expected_hash:
-                    print(f"Hash mismatch for {file}! Expected: {expected_hash}, Found: {current_hash}")
 
+    def fsck(self, quick=None, jobs=None, restart=False):
+        """
+        Verify every stored object against the hash recorded for it in the log.
+
+        Objects are checked in hash order on a pool of worker processes, one batch at a
+        time. After each batch the last verified hash and the problems found so far are
+        written to FSCK_CHECKPOINT, so an interrupted run picks up where it stopped.
+        The checkpoint also names the newest commit the run started from: objects never
+        change once stored, so everything up to that commit below the cursor is done,
+        while objects added by later commits are checked whatever their hash, and listed
+        in the checkpoint once verified. If that commit is no longer in history, the run
+        starts over. The checkpoint is removed when a full run completes.
+        Args:
+            quick (int): Check only a random sample of this many objects, without a checkpoint.
+            jobs (int): Number of worker processes; defaults to the number of CPUs.
+            restart (bool): Ignore an existing checkpoint and start from the beginning.
+        Returns:
+            dict: "checked" count, and "missing" and "corrupt" lists of object hashes.
+        """
+        entries = self.history_entries()
+        blobs = sorted(self.blob_occurrences(entries))
+        result = {"checked": 0, "missing": [], "corrupt": []}
+        last_verified = None
+        last_commit = entries[-1]["commit_id"] if entries else None
+        covered = set(blobs)  # Objects the cursor accounts for
+        also_verified = set()  # Objects added after last_commit, already checked
+
+        if quick:
+            blobs = sorted(random.sample(blobs, min(quick, len(blobs))))
+        elif not restart and os.path.exists(self.FSCK_CHECKPOINT):
+            with open(self.FSCK_CHECKPOINT, 'r') as f:
+                checkpoint = json.load(f)
+            ids = [entry["commit_id"] for entry in entries]
+            if checkpoint.get("last_commit") in ids:
+                last_commit = checkpoint["last_commit"]
+                covered = {file_info["hash"] for entry in entries[:ids.index(last_commit) + 1]
+                           for file_info in entry["files"]}
+                also_verified = set(checkpoint.get("also_verified", []))
+                last_verified = checkpoint["last_verified"]
+                result = checkpoint["result"]
+                print(f"Ager fsck {result['checked']} ta object er por theke cholbe, mama.")
+            else:
+                print("Ager fsck er por history bodle gese, notun kore shuru korchi, mama.")
+
+        pending = [
+            blob for blob in blobs
+            if (last_verified is None or blob > last_verified or blob not in covered) and blob not in also_verified
+        ]
+        total = result["checked"] + len(pending)
+        pool = None if len(pending) < 32 or jobs == 1 else ProcessPoolExecutor(max_workers=jobs)
+        try:
+            for start in range(0, len(pending), self.FSCK_BATCH):
+                batch = pending[start:start + self.FSCK_BATCH]
+                tasks = [(location, blob, self.hash_algorithm) for location, blob in zip(self.object_locations(batch), batch)]
+                statuses = pool.map(_verify_object, tasks, chunksize=16) if pool else map(_verify_object, tasks)
+                for blob, status in zip(batch, statuses):
+                    if status != "ok":
+                        result[status].append(blob)
+                result["checked"] += len(batch)
+                if not quick:
+                    also_verified.update(blob for blob in batch if blob not in covered)
+                    if last_verified is None or batch[-1] > last_verified:
+                        last_verified = batch[-1]
+                    self.write_json_atomic(self.FSCK_CHECKPOINT, {
+                        "last_commit": last_commit,
+                        "last_verified": last_verified,
+                        "also_verified": sorted(also_verified),
+                        "result": result,
+                    })
+                print(f"\rfsck: {result['checked']}/{total} objects", end="", flush=True)
+        finally:
+            if pool:
+                pool.shutdown()
+        print()
+
+        if not quick and os.path.exists(self.FSCK_CHECKPOINT):
+            os.remove(self.FSCK_CHECKPOINT)
+        return result
+
+
+
+
+
+
+    def show_fsck(self, quick=None, jobs=None, restart=False):
+        """Run fsck and report every missing or corrupt object with the commits and paths that use it."""
+        result = self.fsck(quick, jobs, restart)
+        problems = [(blob, "missing") for blob in result["missing"]] + [(blob, "corrupt") for blob in result["corrupt"]]
+        if not problems:
+            print(Fore.GREEN + f"{result['checked']} ta object thik ache, mama." + Style.RESET_ALL)
+            return
+        occurrences = self.blob_occurrences()
+        for blob, status in problems:
+            print(Fore.RED + f"{status}: {blob}" + Style.RESET_ALL)
+            places = occurrences.get(blob, [])
+            for commit_id, path in places[:3]:
+                print(f"  {commit_id[:self.SHORT_ID_LENGTH]}  {path}")
+            if len(places) > 3:
+                print(f"  ... aro {len(places) - 3} jaygay")
+        print(Fore.RED + f"{len(problems)} ta object e jhamela, {result['checked']} ta check korlam." + Style.RESET_ALL)
 
 
 
@@ -742,18 +3625,26 @@ class Repository:
 
     def delete_commit_history_after(self, commit_id):
         """Delete commit history beyond the target commit."""
-        all_commits = sorted(os.listdir(self.COMMITS_DIR))
+        all_commits = self.get_commit_ids()
         commits_to_delete = all_commits[all_commits.index(commit_id) + 1:]
 
         for commit in commits_to_delete:
-            shutil.rmtree(os.path.join(self.COMMITS_DIR, commit))
+            commit_folder = os.path.join(self.COMMITS_DIR, commit)
+            if os.path.exists(commit_folder):
+                shutil.rmtree(commit_folder)
             print(f"Deleted commit history: {commit}")
 
         # Update log.json to reflect the rollback
-        log_data = self.load_commit_log()
-        updated_log = [entry for entry in log_data if entry["commit_id"] <= commit_id]
-        with open(self.LOG_FILE, 'w') as f:
-            json.dump(updated_log, f, indent=4)
+        with self.lock():
+            log_data = self.load_commit_log()
+            keep = all_commits.index(commit_id) + 1
+            self.write_json_atomic(self.LOG_FILE, log_data[:keep])
+            self.write_head(commit_id)
+            with closing_connection(self.PATH_INDEX) as db:
+                self.open_path_index(db)
+                db.execute("DELETE FROM touches WHERE seq >= ?", (keep,))
+                db.execute("DELETE FROM commits WHERE seq >= ?", (keep,))
+                self.record_path_history(db, [], keep, commit_id)
 
 
 
@@ -769,8 +3660,7 @@ class Repository:
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
 
-        with open(".mama/rollback.json", 'w') as f:
-            json.dump(rollback_data, f, indent=4)
+        self.write_json_atomic(".mama/rollback.json", rollback_data)
 
 
 
@@ -782,15 +3672,15 @@ class Repository:
     def rollback_to_previous(self):
         """
         Rollback the repository to the previous commit.
-        This method retrieves the list of commits in the repository, sorted in reverse order
-        (latest commit first). If there are fewer than two commits, it prints a message indicating
+        This method retrieves the list of commits in the repository from the log, in reverse
+        order (latest commit first). If there are fewer than two commits, it prints a message indicating
         that there are no previous commits to rollback to. Otherwise, it identifies the second
         latest commit and rolls back the repository to that commit.
         Prints:
             A message indicating whether the rollback was successful or if there are no previous commits.
         """
 
-        commits = sorted(os.listdir(self.COMMITS_DIR), reverse=True)
+        commits = self.get_commit_ids()[::-1]
         if len(commits) < 2:
             print("Pechone jawar commit nai mama.")
             return
@@ -806,30 +3696,74 @@ class Repository:
 
 
 
-    def compare_with_commit(self, commit_id):
+    def compare_with_commit(self, commit_id=None, paths=None, mode="patch"):
         """
-        Compare the current state of files with a specified commit.
+        Compare the working directory with a commit.
+
+        Every path of the commit's full tree is compared with the file at the same path.
+        A file whose index entry records the committed hash and whose stat data is
+        unchanged is skipped without being read; others are hashed, and only files whose
+        hash differs are diffed. Files on disk that the commit does not have are
+        reported as added. Paths outside the sparse checkout are not compared.
         Args:
-            commit_id (str): The ID of the commit to compare against.
-        Returns:
-            None
-        Prints:
-            - A message if the specified commit does not exist.
-            - The differences between the current files and the files in the specified commit.
-            - A message if a file from the commit does not exist in the current state.
+            commit_id (str): The commit to compare against; HEAD if None.
+            paths (list): Files, directories or globs to limit the comparison to.
+            mode (str): "patch" for diffs of modified files, or "name-only" / "name-status".
         """
-
-        commit_folder = os.path.join(self.COMMITS_DIR, commit_id)
-        if not os.path.exists(commit_folder):
-            print(f"Commit {commit_id} nai mama.")
+        commit_id = self.resolve_commit(commit_id) if commit_id else self.get_head()
+        if not commit_id:
+            print("Compare korar moto kono commit nai mama.")
+            return
+        tree = self.get_commit_tree(commit_id)
+        sparse = self.load_sparse_patterns()
+
+        def selected(path):
+            if sparse and not self.path_matches(path, sparse):
+                return False
+            return not paths or self.path_matches(path, paths)
+
+        working = {path for path in self.scan_working_tree() if selected(path)}
+        added = sorted(working - set(tree))
+        removed, modified = [], []
+        with self.open_index() as index:
+            for path, file_hash in tree.items():
+                if not selected(path):
+                    continue
+                if path not in working:
+                    removed.append(path)
+                    continue
+                entry = index.find(path)
+                if entry is not None and entry.hash == file_hash and self.stat_matches(path, entry):
+                    continue
+                if self.hash_file(path) != file_hash:
+                    modified.append(path)
+        removed.sort()
+        modified.sort()
+
+        if mode != "patch":
+            changes = [("A", path) for path in added] + [("D", path) for path in removed] + [("M", path) for path in modified]
+            for change in sorted(changes, key=lambda change: change[1]):
+                print("\t".join(change) if mode == "name-status" else change[1])
             return
 
-        for filename in os.listdir(commit_folder):
-            commit_file = os.path.join(commit_folder, filename)
-            if os.path.exists(filename):
-                self.print_diff(commit_file, filename)
-            else:
-                print(f"{filename} er itihas nai.")
+        print(Fore.CYAN + "\nNew Files Added:")
+        for path in added:
+            print(Fore.GREEN + f"  - {path}")
+
+        print(Fore.CYAN + "\nFiles Deleted:")
+        for path in removed:
+            print(Fore.RED + f"  - {path}")
+
+        print(Fore.CYAN + "\nModified Files:")
+        for path in modified:
+            print(Fore.YELLOW + f"\nChanges in {path}:" + Style.RESET_ALL)
+            with open(path, 'r', encoding="utf-8", errors="replace") as f:
+                diff = difflib.unified_diff(self.read_object_lines(tree[path]), f.readlines(),
+                                            fromfile=f"{commit_id[:self.SHORT_ID_LENGTH]}/{path}", tofile=path)
+                print(''.join(diff))
+
+        print(Style.RESET_ALL)
+
 
 
 
@@ -841,15 +3775,15 @@ class Repository:
     def compare_latest_with_previous(self):
         """
         Compare the latest and previous commits.
-        This method retrieves the list of commits from the COMMITS_DIR directory,
-        sorts them in reverse order (latest first), and compares the two most recent commits.
+        This method retrieves the list of commits from the log in reverse order
+        (latest first), and compares the two most recent commits.
         If there are fewer than two commits, it prints a message indicating that 
         there are not enough commits to compare.
         Returns:
             None
         """
 
-        commits = sorted(os.listdir(self.COMMITS_DIR), reverse=True)
+        commits = self.get_commit_ids()[::-1]
         if len(commits) < 2:
             print("Compare korar jonno komse mama.")
             return
@@ -863,12 +3797,13 @@ class Repository:
 
 
 
-    def print_diff(self, file1, file2):
-        """Print the line-by-line diff between two files."""
-        with open(file1, 'r') as f1, open(file2, 'r') as f2:
+    def print_diff(self, file1, file2, label1=None, label2=None):
+        """Print the line-by-line diff between two files, optionally labelled with other names."""
+        with open(file1, 'r', encoding="utf-8", errors="replace") as f1, \
+                open(file2, 'r', encoding="utf-8", errors="replace") as f2:
             diff = difflib.unified_diff(
                 f1.readlines(), f2.readlines(),
-                fromfile=file1, tofile=file2
+                fromfile=label1 or file1, tofile=label2 or file2
             )
             print(''.join(diff))
 
@@ -880,44 +3815,229 @@ class Repository:
 
 
 
-    def compare_commits(self, commit1, commit2):
+    def open_diff_cache(self):
+        """
+        Open the diff cache, creating its tables on first use.
+
+        Diffs between stored objects are content-addressed: the same pair of hashes and
+        options always gives the same hunks, so entries never go stale and are only
+        dropped to respect DIFF_CACHE_MAX_BYTES. The caller closes the connection,
+        usually with a `with` block.
+
+        The connection is in autocommit mode, so no transaction is held while objects
+        are read and diffed: lookups are single reads, each new diff is one short insert,
+        and the last-used times and counters of a whole comparison are written together
+        by evict_diff_cache. A cache that stays busy for DIFF_CACHE_TIMEOUT seconds is
+        treated as a miss rather than an error, so concurrent comparisons never fail.
+        """
+        db = sqlite3.connect(self.DIFF_CACHE, timeout=self.DIFF_CACHE_TIMEOUT, isolation_level=None)
+        self._diff_cache_pending = {"used": {}, "hits": 0, "misses": 0}
+        try:
+            db.execute("CREATE TABLE IF NOT EXISTS diffs (key TEXT PRIMARY KEY, body BLOB, size INTEGER, last_used INTEGER)")
+            db.execute("CREATE INDEX IF NOT EXISTS diffs_last_used ON diffs (last_used)")
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+        except sqlite3.OperationalError:
+            pass  # Busy; every lookup below then misses
+        return closing(db)
+
+
+
+
+
+
+    def blob_diff(self, db, hash1, hash2):
+        """
+        Return the unified diff hunks between two stored objects.
+        The file header is not part of the result, so one entry serves every pair of
+        commits and paths with these contents; a cache hit does not read either object.
+        Args:
+            db: Connection from open_diff_cache.
+            hash1 (str): The old version.
+            hash2 (str): The new version.
+        Returns:
+            str: The hunks, empty if the contents have no line differences.
+        """
+        key = f"{hash1}:{hash2}:u{self.DIFF_CONTEXT_LINES}"
+        pending = self._diff_cache_pending
+        try:
+            row = db.execute("SELECT body FROM diffs WHERE key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError:
+            row = None  # Busy or not created yet; diff without the cache
+        if row is not None:
+            pending["used"][key] = time.time_ns()
+            pending["hits"] += 1
+            return zlib.decompress(row[0]).decode("utf-8")
+
+        lines = list(difflib.unified_diff(self.read_object_lines(hash1), self.read_object_lines(hash2),
+                                          n=self.DIFF_CONTEXT_LINES))
+        hunks = "".join(lines[2:])  # Drop the ---/+++ header
+        body = zlib.compress(hunks.encode("utf-8"))
+        pending["misses"] += 1
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO diffs (key, body, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, body, len(body), time.time_ns()),
+            )
+        except sqlite3.OperationalError:
+            pass  # Another comparison is writing; this diff is simply not cached
+        return hunks
+
+
+
+
+
+
+    def print_blob_diff(self, db, hash1, hash2, label1, label2):
+        """Print the diff between two stored objects under the given file labels."""
+        hunks = self.blob_diff(db, hash1, hash2)
+        if hunks:
+            print(f"--- {label1}\n+++ {label2}\n{hunks}")
+        else:
+            print()
+
+
+
+
+
+
+    def evict_diff_cache(self, db):
+        """
+        Record the last-used times and hit/miss counts of this comparison, and drop the
+        least recently used diffs until the cache fits DIFF_CACHE_MAX_BYTES, in one short
+        transaction. If the cache stays busy, the bookkeeping is skipped.
+        """
+        pending = self._diff_cache_pending
+        self._diff_cache_pending = {"used": {}, "hits": 0, "misses": 0}
+        try:
+            db.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            return
+        try:
+            db.executemany("UPDATE diffs SET last_used = ? WHERE key = ?",
+                           [(used, key) for key, used in pending["used"].items()])
+            counts = {"hits": pending["hits"], "misses": pending["misses"], "evictions": 0}
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM diffs").fetchone()[0]
+            if total > self.DIFF_CACHE_MAX_BYTES:
+                for key, size in db.execute("SELECT key, size FROM diffs ORDER BY last_used").fetchall():
+                    if total <= self.DIFF_CACHE_MAX_BYTES:
+                        break
+                    db.execute("DELETE FROM diffs WHERE key = ?", (key,))
+                    total -= size
+                    counts["evictions"] += 1
+            for name, count in counts.items():
+                if count:
+                    db.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", (name,))
+                    db.execute("UPDATE counters SET value = value + ? WHERE name = ?", (count, name))
+            db.execute("COMMIT")
+        except sqlite3.OperationalError:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+
+
+
+
+
+
+    def diff_cache_stats(self):
+        """
+        Return the diff cache counters.
+        Returns:
+            dict: hits, misses, evictions, entries and bytes.
+        """
+        stats = {"hits": 0, "misses": 0, "evictions": 0}
+        if not os.path.exists(self.DIFF_CACHE):
+            return {**stats, "entries": 0, "bytes": 0}
+        with self.open_diff_cache() as db:
+            stats.update(db.execute("SELECT name, value FROM counters"))
+            stats["entries"], stats["bytes"] = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM diffs").fetchone()
+        return stats
+
+
+
+
+
+
+    def compare_commits(self, commit1, commit2, rename_threshold=None, rename_limit=None, mode="patch"):
         """
         Compare files between two commits and display detailed differences.
         Args:
             commit1 (str): The identifier for the first commit.
             commit2 (str): The identifier for the second commit.
+            rename_threshold (float): Minimum similarity (0-1) for a near-rename; defaults to RENAME_THRESHOLD.
+            rename_limit (int): Maximum number of near-rename candidate pairs to score; defaults to RENAME_PAIR_LIMIT.
+            mode (str): "patch" for full diffs, or one of the summaries "name-only", "name-status"
+                and "stat". The name modes read no file contents; only exact renames are found.
         """
-        commit_folder1 = os.path.join(self.COMMITS_DIR, commit1)
-        commit_folder2 = os.path.join(self.COMMITS_DIR, commit2)
-
-        if not os.path.exists(commit_folder1) or not os.path.exists(commit_folder2):
-            print(f"Commit {commit1} or {commit2} er information nai, mama.")
+        commit1 = self.resolve_commit(commit1)
+        commit2 = self.resolve_commit(commit2)
+        if not commit1 or not commit2:
             return
 
-        files1 = set(os.listdir(commit_folder1))
-        files2 = set(os.listdir(commit_folder2))
+        tree1 = self.get_commit_tree(commit1)
+        tree2 = self.get_commit_tree(commit2)
+        files1 = set(tree1)
+        files2 = set(tree2)
 
         # Identify new, deleted, and modified files
         new_files = files2 - files1
-        deleted_files = {f for f in files1 - files2 if not os.path.exists(f)}
+        deleted_files = files1 - files2
         common_files = files1 & files2
 
+        # Pair up renames and copies before reporting plain additions and deletions
+        if mode in ("name-only", "name-status"):
+            rename_limit = 0  # Exact renames come from the hashes alone
+        renames, copies = self.detect_renames(
+            tree1, tree2, new_files, deleted_files,
+            self.RENAME_THRESHOLD if rename_threshold is None else rename_threshold,
+            self.RENAME_PAIR_LIMIT if rename_limit is None else rename_limit,
+        )
+        new_files -= {new for _, new, _ in renames + copies}
+        deleted_files -= {old for old, _, _ in renames}
+        modified_files = sorted(file for file in common_files if tree1[file] != tree2[file])
+
+        if mode != "patch":
+            changes = (
+                [("A", file) for file in new_files]
+                + [("D", file) for file in deleted_files]
+                + [("M", file) for file in modified_files]
+                + [(f"R{similarity * 100:03.0f}", old, new) for old, new, similarity in renames]
+                + [(f"C{similarity * 100:03.0f}", old, new) for old, new, similarity in copies]
+            )
+            changes.sort(key=lambda change: change[-1])
+            if mode == "stat":
+                self.show_diff_stat(commit1, commit2, tree1, tree2, changes)
+            else:
+                for change in changes:
+                    print("\t".join(change) if mode == "name-status" else change[-1])
+            return
+
         print(Fore.CYAN + "\nNew Files Added:")
-        for file in new_files:
+        for file in sorted(new_files):
             print(Fore.GREEN + f"  - {file}")
 
         print(Fore.CYAN + "\nFiles Deleted:")
-        for file in deleted_files:
+        for file in sorted(deleted_files):
             print(Fore.RED + f"  - {file}")
 
-        print(Fore.CYAN + "\nModified Files:")
-        for file in common_files:
-            file1 = os.path.join(commit_folder1, file)
-            file2 = os.path.join(commit_folder2, file)
-
-            if not self.files_are_equal(file1, file2):
+        with self.open_diff_cache() as db:
+            for title, pairs in (("Renamed Files:", renames), ("Copied Files:", copies)):
+                print(Fore.CYAN + f"\n{title}")
+                for old, new, similarity in pairs:
+                    print(Fore.BLUE + f"  - {old} -> {new} ({similarity:.0%})")
+                    if tree1[old] != tree2[new]:
+                        self.print_blob_diff(
+                            db, tree1[old], tree2[new],
+                            f"{commit1[:self.SHORT_ID_LENGTH]}/{old}", f"{commit2[:self.SHORT_ID_LENGTH]}/{new}"
+                        )
+
+            print(Fore.CYAN + "\nModified Files:")
+            for file in modified_files:
                 print(Fore.YELLOW + f"\nChanges in {file}:")
-                self.print_diff(file1, file2)
+                self.print_blob_diff(
+                    db, tree1[file], tree2[file],
+                    f"{commit1[:self.SHORT_ID_LENGTH]}/{file}", f"{commit2[:self.SHORT_ID_LENGTH]}/{file}"
+                )
+            self.evict_diff_cache(db)
 
         print(Style.RESET_ALL)
 
@@ -925,12 +4045,403 @@ class Repository:
 
 
 
+    def show_diff_stat(self, commit1, commit2, tree1, tree2, changes):
+        """
+        Print lines added and removed per changed file, without building any hunks.
+
+        When commit2 is a direct child of commit1, the statistics recorded by `rakho`
+        are used and no file is read. Otherwise added and deleted files are counted
+        by streaming their newlines, and only modified files are compared line by line.
+        Args:
+            commit1 (str): The old commit ID.
+            commit2 (str): The new commit ID.
+            tree1 (dict): The old tree.
+            tree2 (dict): The new tree.
+            changes (list): (status, path) or (status, old_path, new_path) tuples.
+        """
+        entry = self.get_commit_entry(commit2)
+        recorded = {}
+        if entry and entry.get("parent") == commit1 and "stats" in entry:
+            recorded = entry["stats"]["files"]
+
+        total_added = total_removed = 0
+        for change in changes:
+            status, path = change[0], change[-1]
+            old_path = change[1]
+            if path in recorded and status in ("A", "D", "M"):
+                added, removed = recorded[path][:2]
+            elif status == "A":
+                added, removed = self.count_lines(tree2[path]), 0
+            elif status == "D":
+                added, removed = 0, self.count_lines(tree1[path])
+            elif tree1[old_path] == tree2[path]:
+                added = removed = 0
+            else:
+                added, removed = self.change_stats(tree1[old_path], tree2[path])[:2]
+
+            name = path if len(change) == 2 else f"{old_path} => {path}"
+            if added is None or removed is None:
+                print(f" {name} | Bin")
+                continue
+            total_added += added
+            total_removed += removed
+            print(f" {name} | {added + removed} {Fore.GREEN}{'+' * min(added, 40)}{Fore.RED}{'-' * min(removed, 40)}{Style.RESET_ALL}")
+        print(f" {len(changes)} files changed, {total_added} insertions(+), {total_removed} deletions(-)")
+
+
+
+
+
+
+    def count_lines(self, file_hash):
+        """
+        Count the lines of a stored object by streaming it, or return None for a binary object.
+        A last line without a trailing newline still counts.
+        """
+        lines = 0
+        last = b"\n"
+        with self.open_object(file_hash) as f:
+            first = True
+            while chunk := f.read(1024 * 1024):
+                if first and b"\0" in chunk[:8192]:
+                    return None
+                first = False
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
+        return lines + (last != b"\n")
+
+
+
+
+
+
+    def detect_renames(self, tree1, tree2, new_files, deleted_files,
+                       threshold=RENAME_THRESHOLD, max_pairs=RENAME_PAIR_LIMIT):
+        """
+        Pair added files with the files they were renamed or copied from.
+
+        Exact renames and copies are found from the recorded hashes alone. For the
+        rest, every added and deleted blob gets a bottom-k sketch of its line hashes;
+        candidate pairs come from an inverted index of sketch values, so only pairs
+        that share lines are ever looked at, and pairs whose sizes differ by more than
+        the threshold allows are pruned before scoring. Sketch values held by more than
+        RENAME_COMMON_LINE_FILES deleted files (blank lines, license headers, common
+        imports) say nothing about which file is which and are left out of the index,
+        and each added file keeps only its RENAME_CANDIDATES_PER_FILE best-sharing
+        candidates, so at most `max_pairs` candidates are ever built or scored.
+        Args:
+            tree1 (dict): Hashes of the old tree, keyed by path.
+            tree2 (dict): Hashes of the new tree, keyed by path.
+            new_files (set): Paths only in tree2.
+            deleted_files (set): Paths only in tree1.
+            threshold (float): Minimum estimated similarity for a near-rename.
+            max_pairs (int): Cap on near-rename candidate pairs to score.
+        Returns:
+            tuple: (renames, copies), lists of (old_path, new_path, similarity).
+        """
+        renames, copies = [], []
+
+        # Exact matches: a deleted file with the same hash is a rename, any other
+        # file of the old tree with the same hash is a copy
+        deleted_by_hash = {}
+        for path in sorted(deleted_files):
+            deleted_by_hash.setdefault(tree1[path], []).append(path)
+        old_by_hash = {}
+        for path, file_hash in tree1.items():
+            old_by_hash.setdefault(file_hash, path)
+
+        remaining_new = []
+        for path in sorted(new_files):
+            sources = deleted_by_hash.get(tree2[path])
+            if sources:
+                renames.append((sources.pop(0), path, 1.0))
+            elif tree2[path] in old_by_hash:
+                copies.append((old_by_hash[tree2[path]], path, 1.0))
+            else:
+                remaining_new.append(path)
+        remaining_deleted = [path for paths in deleted_by_hash.values() for path in paths]
+        if not remaining_new or not remaining_deleted or max_pairs <= 0:
+            return renames, copies
+
+        # Near matches: sketch the remaining blobs and index deleted sketches by value
+        sizes = {}
+        sketches = {}
+        for path, tree in [(p, tree1) for p in remaining_deleted] + [(p, tree2) for p in remaining_new]:
+            sizes[path] = self.object_size(tree[path])
+            sketches[path] = self.line_sketch(tree[path])
+
+        holders = {}
+        for path in remaining_deleted:
+            for value in sketches[path]:
+                holders.setdefault(value, []).append(path)
+        holders = {value: paths for value, paths in holders.items() if len(paths) <= self.RENAME_COMMON_LINE_FILES}
+
+        per_file = max(1, min(self.RENAME_CANDIDATES_PER_FILE, max_pairs // len(remaining_new)))
+        candidates = []
+        for new in remaining_new:
+            if len(candidates) >= max_pairs:
+                break
+            shared = {}
+            for value in sketches[new]:
+                for old in holders.get(value, ()):
+                    shared[old] = shared.get(old, 0) + 1
+            best = []
+            for old, count in shared.items():
+                small, large = sorted((sizes[old], sizes[new]))
+                if large and small / large < threshold:
+                    continue  # Size bucket pruning: too different in size to be similar enough
+                best.append((count, old, new))
+            candidates.extend(heapq.nlargest(per_file, best))
+
+        scored = []
+        for count, old, new in heapq.nlargest(max_pairs, candidates):
+            similarity = self.sketch_similarity(sketches[old], sketches[new])
+            if similarity >= threshold:
+                scored.append((similarity, old, new))
+
+        used_old, used_new = set(), set()
+        for similarity, old, new in sorted(scored, reverse=True):
+            if old in used_old or new in used_new:
+                continue
+            used_old.add(old)
+            used_new.add(new)
+            renames.append((old, new, similarity))
+
+        return renames, copies
+
+
+
+
+
+
+    def line_sketch(self, file_hash):
+        """
+        Bottom-k sketch of a stored object: the SKETCH_SIZE smallest hashes of its distinct lines.
+        Returns:
+            frozenset: The sketch values.
+        """
+        with self.open_object(file_hash) as f:
+            line_hashes = {hash(line.strip()) for line in f}
+        return frozenset(heapq.nsmallest(self.SKETCH_SIZE, line_hashes))
+
+
+
+
+
+
+    def sketch_similarity(self, sketch1, sketch2):
+        """Estimate the Jaccard similarity of two files from their bottom-k sketches."""
+        if not sketch1 and not sketch2:
+            return 1.0
+        union_bottom = heapq.nsmallest(self.SKETCH_SIZE, sketch1 | sketch2)
+        both = sketch1 & sketch2
+        return sum(1 for value in union_bottom if value in both) / len(union_bottom)
+
+
+
+
+
+
     def files_are_equal(self, file1, file2):
         """Check if two files are identical by comparing their hashes."""
         return self.hash_file(file1) == self.hash_file(file2)
-    
-    
-    
-    
-    
-    
\ No newline at end of file
+
+
+
+
+
+# Content hashes, by the name recorded in the format file. Every digest is 32 bytes,
+# the width of a hash in the index and in fast-export mark tables.
+HASH_ALGORITHMS = {
+    "sha256": hashlib.sha256,
+    "blake2b": lambda: hashlib.blake2b(digest_size=32),
+}
+
+
+
+
+
+
+def file_digest(path, algorithm="sha256"):
+    """Hash a file's contents with one of HASH_ALGORITHMS and return the hex digest."""
+    return digest_file(path, HASH_ALGORITHMS[algorithm]())
+
+
+
+
+
+
+def pid_alive(pid):
+    """Whether a process with this pid is running on this machine."""
+    if pid <= 0:
+        return False
+    if os.name == "nt":
+        import ctypes  # os.kill would terminate the process on Windows
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Running, as another user
+    return True
+
+
+
+
+
+
+def check_tree_path(path):
+    """
+    Normalize a path that came from a commit, an archive or another repository, and make
+    sure writing it stays inside the working directory.
+    Args:
+        path (str): A path relative to the repository root.
+    Returns:
+        str: The normalized path.
+    Raises:
+        ValueError: If the path is empty, absolute, has a ".." component or points into .mama.
+    """
+    normalized = os.path.normpath(path) if path else ""
+    parts = re.split(r"[\\/]", normalized)
+    if (not path or os.path.isabs(normalized) or os.path.splitdrive(normalized)[0]
+            or normalized == "." or ".." in parts or parts[0] == ".mama" or not parts[0]):
+        raise ValueError(f"'{path}' repository r baire likhte chay, mama. Eta nibo na.")
+    return normalized
+
+
+
+
+
+
+@contextmanager
+def closing_connection(path):
+    """Open a SQLite database and close it when the block ends."""
+    db = sqlite3.connect(path)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+
+
+
+
+class PackedObject(io.RawIOBase):
+    """Read-only stream over one object in the cold pack, decompressed as it is read."""
+
+    def __init__(self, pack_path, offset, length):
+        """
+        Args:
+            pack_path (str): The cold pack.
+            offset (int): Where the object's compressed record starts.
+            length (int): Size of the compressed record.
+        """
+        self.pack = open(pack_path, 'rb')
+        self.pack.seek(offset)
+        self.remaining = length
+        self.decompressor = zlib.decompressobj()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.decompressor.eof:
+            data = self.decompressor.unconsumed_tail
+            if not data and self.remaining > 0:
+                data = self.pack.read(min(self.remaining, 1024 * 1024))
+                self.remaining -= len(data)
+            if not data:
+                break  # Truncated record; the caller sees a short object
+            chunk = self.decompressor.decompress(data, len(buffer))
+            if chunk:
+                buffer[:len(chunk)] = chunk
+                return len(chunk)
+        return 0
+
+    def close(self):
+        self.pack.close()
+        super().close()
+
+
+
+
+
+
+def open_stored(location):
+    """
+    Open a stored object for reading in binary mode.
+    Args:
+        location (str or tuple): A loose object path, or (pack path, offset, length) in the
+            cold pack, as returned by Repository.object_locations.
+    """
+    if isinstance(location, str):
+        return open(location, 'rb')
+    return io.BufferedReader(PackedObject(*location), 1024 * 1024)
+
+
+
+
+
+
+def _search_object(task):
+    """
+    Search one stored object line by line. Runs in a worker process.
+    The contents are decoded and matched with the same str pattern that search_history
+    validated, so Unicode classes and non-ASCII literals behave as the user expects.
+    Args:
+        task (tuple): (object location, pattern, regex flags).
+    Returns:
+        list: (line_number, line) pairs of the matching lines.
+    """
+    location, pattern, flags = task
+    regex = re.compile(pattern, flags)
+    try:
+        with open_stored(location) as f:
+            text = f.read().decode("utf-8", "replace")
+    except OSError:
+        return []
+    if not re.search(pattern, text, flags | re.MULTILINE):
+        return []
+    return [
+        (number, line.rstrip("\r"))
+        for number, line in enumerate(text.split("\n"), 1)
+        if regex.search(line)
+    ]
+
+
+
+
+
+
+def _verify_object(task):
+    """
+    Rehash one stored object. Runs in a worker process.
+    Args:
+        task (tuple): (object location, expected hash, hash algorithm).
+    Returns:
+        str: "ok", "missing" or "corrupt".
+    """
+    location, expected, algorithm = task
+    try:
+        if isinstance(location, str):
+            digest = file_digest(location, algorithm)
+        else:
+            hasher = HASH_ALGORITHMS[algorithm]()
+            with open_stored(location) as f:
+                while chunk := f.read(1024 * 1024):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+    except OSError:
+        return "missing"
+    except zlib.error:
+        return "corrupt"
+    return "ok" if digest == expected else "corrupt"
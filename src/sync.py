@@ -0,0 +1,171 @@
+# sync.py
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+
+
+PROTOCOL_VERSION = 1
+
+
+class Connection:
+    """
+    A two-way byte stream to another mama repository, carrying the push/pull protocol.
+
+    Every message is one line of JSON. Object contents are sent as raw bytes right
+    after an {"object", "size"} message, so a bundle of objects is streamed without
+    being encoded or held in memory. A message with an "error" key aborts the
+    exchange on both sides.
+    """
+
+    def __init__(self, reader, writer, close=None):
+        """
+        Args:
+            reader: Binary stream the other side writes to.
+            writer: Binary stream the other side reads from.
+            close (callable): Releases the transport once both streams are closed.
+        """
+        self.reader = reader
+        self.writer = writer
+        self._close = close
+
+    def send(self, **message):
+        """Queue one message; it is flushed before the next receive."""
+        self.writer.write(json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n")
+
+    def receive(self):
+        """
+        Flush everything sent so far and wait for the next message.
+        Raises:
+            ValueError: If the other side reported an error.
+            ConnectionError: If the other side hung up.
+        """
+        self.writer.flush()
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Onno repository connection kete dise, mama.")
+        message = json.loads(line)
+        if "error" in message:
+            raise ValueError(message["error"])
+        return message
+
+    def send_object(self, file_hash, source, size):
+        """
+        Stream a stored object: its header, then its contents.
+        Args:
+            file_hash (str): The object's hash.
+            source: Binary stream over the object's contents.
+            size (int): Size of the contents in bytes.
+        """
+        self.send(object=file_hash, size=size)
+        shutil.copyfileobj(source, self.writer, 1024 * 1024)
+
+    def object_reader(self, size):
+        """Reader over the next `size` raw bytes, for the contents that follow an object header."""
+        return _ObjectReader(self.reader, size)
+
+    def close(self):
+        for stream in (self.writer, self.reader):
+            try:
+                stream.close()
+            except OSError:
+                pass  # The other side is already gone
+        if self._close is not None:
+            self._close()
+
+
+
+
+
+
+class _ObjectReader:
+    """File-like view of the next `size` bytes of the connection."""
+
+    def __init__(self, stream, size):
+        self.stream = stream
+        self.remaining = size
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        chunk = self.stream.read(size)
+        if not chunk:
+            raise ConnectionError("Object pathanor majhe connection kete gese, mama.")
+        self.remaining -= len(chunk)
+        return chunk
+
+
+
+
+
+
+def connect(remote):
+    """
+    Open a connection to another repository.
+    Args:
+        remote (str): "unix:<socket>" for a `mama serve --socket` server, or the path
+            of a repository, which is served by a `mama serve` child over its stdio.
+    Returns:
+        Connection: The open connection.
+    """
+    if remote.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(remote[5:])
+        return Connection(sock.makefile('rb'), sock.makefile('wb'), sock.close)
+
+    if not os.path.isdir(os.path.join(remote, ".mama")):
+        raise ValueError(f"{remote} e kono mama repository nai.")
+    process = subprocess.Popen(mama_command() + ["serve"], cwd=remote, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    return Connection(process.stdout, process.stdin, process.wait)
+
+
+def stdio_connection():
+    """
+    Connection over this process's stdin and stdout, for `mama serve`.
+    Anything else printed goes to stderr from now on, so it cannot corrupt the protocol.
+    """
+    reader, writer = sys.stdin.buffer, sys.stdout.buffer
+    sys.stdout = sys.stderr
+    return Connection(reader, writer)
+
+
+def serve_socket(path, handle):
+    """
+    Listen on a Unix socket and pass each connection to `handle`, one at a time, until interrupted.
+    Args:
+        path (str): Socket path; a stale socket file left there is replaced.
+        handle (callable): Takes a Connection.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(path)
+        server.listen()
+        print(f"mama {path} e ache, thamate Ctrl+C.")
+        while True:
+            sock, _ = server.accept()
+            conn = Connection(sock.makefile('rb'), sock.makefile('wb'), sock.close)
+            try:
+                handle(conn)
+            except Exception as exc:
+                print(exc)  # Keep serving; the client was told too
+            finally:
+                conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(path)
+
+
+def mama_command():
+    """The command line that starts mama, whether it runs from source or as a frozen executable."""
+    if getattr(sys, "frozen", False):
+        return [sys.executable]
+    return [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mama.py")]